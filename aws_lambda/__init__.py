@@ -3,15 +3,33 @@ __author__ = "Nick Ficano"
 __email__ = "nficano@gmail.com"
 __version__ = "11.8.0"
 
-from .aws_lambda import (
-    deploy,
-    deploy_s3,
-    invoke,
-    init,
-    build,
-    upload,
-    cleanup_old_versions,
-)
+# The commands are imported on first use (PEP 562), so `import aws_lambda`
+# stays cheap for the CLI and for code that only needs a submodule.
+__all__ = [
+    "deploy",
+    "deploy_s3",
+    "invoke",
+    "init",
+    "build",
+    "upload",
+    "cleanup_old_versions",
+    "prune_artifacts",
+    "watch",
+    "batch",
+    "bench",
+    "stats",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import aws_lambda
+
+        return getattr(aws_lambda, name)
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
+
 
 # Set default logging handler to avoid "No handler found" warnings.
 import logging
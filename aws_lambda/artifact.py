@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Invoke the handler from a built bundle instead of the project directory.
+
+The bundle is extracted to a fresh directory, the way Lambda unpacks it
+into ``/var/task``, and the handler runs in a separate interpreter started
+with ``-I -S``: no site-packages, no user site, no ``PYTHON*`` variables and
+nothing but the bundle, the packages the Lambda runtime provides (boto3 and
+its dependencies) and the standard library on ``sys.path``, in that order. A
+missing dependency fails here just like it would after a deploy.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from tempfile import mkdtemp
+
+from .helpers import LambdaTimeoutError
+
+# Lambda allows this long for the init phase (importing the handler).
+INIT_TIMEOUT = 10
+# Extra time before a runner that didn't stop at its deadline is killed.
+KILL_GRACE = 5
+RESULT_MARKER = "__python_lambda_result__:"
+
+RUNNER_SCRIPT = """\
+import importlib
+import json
+import signal
+import sys
+import time
+import traceback
+
+task_root, handler, function_name, timeout, init_timeout = sys.argv[1:6]
+sys.path[0:0] = [task_root] + sys.argv[6:]
+
+
+class LambdaContext:
+    function_name = function_name
+    function_version = "$LATEST"
+    invoked_function_arn = None
+    memory_limit_in_mb = None
+    aws_request_id = "00000000-0000-0000-0000-000000000000"
+    log_group_name = None
+    log_stream_name = None
+    identity = None
+    client_context = None
+
+    def __init__(self, timeout):
+        self.deadline = time.time() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.time()) * 1000))
+
+
+# A BaseException, so handlers catching Exception can't swallow it.
+class TimedOut(BaseException):
+    pass
+
+
+def on_alarm(signum, frame):
+    raise TimedOut()
+
+
+def limited(seconds, fn, *args):
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def emit(**result):
+    sys.stdout.flush()
+    print(%(marker)r + json.dumps(result, default=str))
+
+
+signal.signal(signal.SIGALRM, on_alarm)
+event = json.load(sys.stdin)
+module_name, function = handler.rsplit(".", 1)
+timings = {}
+stage, limit = "import", float(init_timeout)
+try:
+    start = time.perf_counter()
+    module = limited(limit, importlib.import_module, module_name)
+    fn = getattr(module, function)
+    timings["import_time"] = time.perf_counter() - start
+    stage, limit = "handler", float(timeout)
+    context = LambdaContext(limit)
+    start = time.perf_counter()
+    result = limited(limit, fn, event, context)
+    timings["handler_time"] = time.perf_counter() - start
+except TimedOut:
+    message = "{} timed out after {:.2f} seconds".format(
+        "Init" if stage == "import" else "Task", limit
+    )
+    emit(error={"stage": stage, "type": "timeout", "message": message},
+         **timings)
+    sys.exit(1)
+except Exception as e:
+    traceback.print_exc()
+    emit(error={"stage": stage, "type": type(e).__name__, "message": str(e)},
+         **timings)
+    sys.exit(1)
+emit(result=result, **timings)
+""" % {
+    "marker": RESULT_MARKER
+}
+
+
+class InvocationFailed(Exception):
+    pass
+
+
+def find_latest_bundle(path_to_dist, function_name):
+    """The most recent ``<timestamp>-<function_name>.zip`` `build` wrote."""
+    pattern = re.compile(
+        r"^\d{4}-\d{2}-\d{2}-\d{6}-" + re.escape(function_name) + r"\.zip$"
+    )
+    bundles = []
+    if os.path.isdir(path_to_dist):
+        bundles = sorted(
+            f for f in os.listdir(path_to_dist) if pattern.match(f)
+        )
+    if not bundles:
+        raise ValueError(
+            "No bundle for {} in {}; run `lambda build` first".format(
+                function_name, path_to_dist
+            )
+        )
+    return os.path.join(path_to_dist, bundles[-1])
+
+
+def extract_bundle(path_to_zip_file, task_root):
+    """Unpack a bundle, keeping file modes; returns the number of files."""
+    files = 0
+    with zipfile.ZipFile(path_to_zip_file) as zfh:
+        for info in zfh.infolist():
+            path = zfh.extract(info, task_root)
+            if info.is_dir():
+                continue
+            files += 1
+            mode = info.external_attr >> 16
+            if mode:
+                os.chmod(path, mode & 0o777)
+    return files
+
+
+def get_environment(cfg, task_root, extra=None):
+    """A minimal environment resembling the Lambda runtime's.
+
+    AWS credentials and settings are passed through so handlers can still
+    call AWS; everything else is left out.
+    """
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith("AWS_") or key in ("PATH", "HOME", "LANG", "TZ")
+    }
+    env.update(
+        LAMBDA_TASK_ROOT=task_root,
+        AWS_LAMBDA_FUNCTION_NAME=str(cfg.get("function_name")),
+        AWS_LAMBDA_FUNCTION_VERSION="$LATEST",
+        AWS_LAMBDA_FUNCTION_MEMORY_SIZE=str(cfg.get("memory_size", 512)),
+    )
+    if cfg.get("region"):
+        env.setdefault("AWS_REGION", cfg.get("region"))
+    env.update(extra or {})
+    return env
+
+
+def invoke_bundle(
+    path_to_zip_file,
+    handler,
+    event,
+    cfg,
+    timeout,
+    env=None,
+    python=sys.executable,
+    runtime_path=None,
+):
+    """Extract `path_to_zip_file` and invoke `handler` from it.
+
+    :param dict env:
+        Extra environment variables, e.g. the config's.
+    :param str runtime_path:
+        A directory with the packages the runtime provides, searched after
+        the bundle (see :func:`aws_lambda.closure.runtime_provided_path`).
+    :returns:
+        A dict with the handler's ``result``, its ``output`` (what it wrote
+        to stdout), the bundle's ``files`` and the ``extract_time``,
+        ``import_time`` and ``handler_time`` in seconds.
+    :raises InvocationFailed:
+        When importing or running the handler raised.
+    :raises LambdaTimeoutError:
+        When the handler ran past `timeout` seconds, or importing it took
+        longer than ``INIT_TIMEOUT``.
+    """
+    task_root = mkdtemp(prefix="aws-lambda-task")
+    try:
+        start = time.perf_counter()
+        files = extract_bundle(path_to_zip_file, task_root)
+        extract_time = time.perf_counter() - start
+
+        module_name, _ = handler.rsplit(".", 1)
+        try:
+            completed = subprocess.run(
+                [
+                    python,
+                    "-I",
+                    "-S",
+                    "-c",
+                    RUNNER_SCRIPT,
+                    task_root,
+                    handler,
+                    str(cfg.get("function_name")),
+                    str(timeout),
+                    str(INIT_TIMEOUT),
+                ]
+                + ([runtime_path] if runtime_path else []),
+                input=json.dumps(event).encode("utf-8"),
+                stdout=subprocess.PIPE,
+                cwd=task_root,
+                env=get_environment(cfg, task_root, env),
+                # The runner enforces both deadlines itself; this only
+                # catches one stuck where the alarm can't interrupt it.
+                timeout=INIT_TIMEOUT + timeout + KILL_GRACE,
+            )
+        except subprocess.TimeoutExpired:
+            raise LambdaTimeoutError(
+                "Task timed out after {:.2f} seconds".format(timeout)
+            )
+    finally:
+        shutil.rmtree(task_root, ignore_errors=True)
+
+    output = []
+    outcome = None
+    for line in completed.stdout.decode("utf-8", "replace").splitlines():
+        if line.startswith(RESULT_MARKER):
+            outcome = json.loads(line.partition(RESULT_MARKER)[2])
+        else:
+            output.append(line)
+    if outcome is None:
+        raise InvocationFailed(
+            "The handler process exited with status {} before returning"
+            "".format(completed.returncode)
+        )
+    if "error" in outcome:
+        error = outcome["error"]
+        if error["type"] == "timeout":
+            raise LambdaTimeoutError(error["message"])
+        raise InvocationFailed(
+            "{} failed: {}: {}".format(
+                "Importing {}".format(module_name)
+                if error["stage"] == "import"
+                else handler,
+                error["type"],
+                error["message"],
+            )
+        )
+    outcome.update(
+        output="\n".join(output), files=files, extract_time=extract_time
+    )
+    return outcome
+
+
+def format_timings(path_to_zip_file, outcome):
+    return (
+        "bundle: {} ({} files)\n"
+        "extract: {:.3f}s  import: {:.3f}s  handler: {:.3f}s".format(
+            path_to_zip_file,
+            outcome["files"],
+            outcome["extract_time"],
+            outcome["import_time"],
+            outcome["handler_time"],
+        )
+    )
@@ -1,29 +1,83 @@
+import base64
+import functools
 import hashlib
 import json
 import logging
 import os
+import re
 import subprocess
 import sys
+import threading
 import time
 from collections import defaultdict
 
 from shutil import copy
 from shutil import copyfile
 from shutil import copystat
-from shutil import copytree
 from tempfile import mkdtemp
 
-import boto3
-import botocore
-import yaml
 import sys
 
+from . import runtime
+from .artifact import find_latest_bundle
+from .artifact import format_timings
+from .artifact import invoke_bundle
+from .batching import emulate
+from .batching import format_results
+from .batching import read_records
+from .benchmark import bench_local
+from .benchmark import bench_remote
+from .benchmark import dumps
+from .benchmark import format_bench
+from .budget import bundle_report
+from .budget import check_budgets
+from .budget import format_report
+from .budget import format_size
+from .budget import get_budgets
+from .budget import load_last_report
+from .budget import measure_import_time
+from .budget import save_report
+from .closure import CLOSURE_REQUIREMENTS_FILENAME
+from .closure import declared_dependencies
+from .closure import DependencyClosure
+from .closure import format_closure
+from .closure import get_closure_settings
+from .closure import requirement_sources
+from .closure import RUNTIME_PROVIDED
+from .closure import runtime_provided_path
 from .helpers import archive
+from .helpers import enforce_timeout
+from .helpers import get_bucket_name
 from .helpers import get_environment_variable_value
+from .helpers import get_function_name
 from .helpers import LambdaContext
 from .helpers import mkdir
 from .helpers import read
 from .helpers import timestamp
+from .image import build_image
+from .image import format_image
+from .image import get_image_settings
+from .logstats import collect_stats
+from .logstats import format_stats
+from .packing import BOOTSTRAP_MODULE
+from .packing import format_comparison
+from .packing import get_deployed_handler
+from .packing import get_zipimport_settings
+from .packing import pack_dependencies
+from .packing import tree_size
+from .release import format_release
+from .release import get_release_settings
+from .release import release
+from .sources import collect_sources
+from .sources import IgnoreMatcher
+from .targets import DeployFailed
+from .targets import format_targets
+from .targets import get_targets
+from .targets import OK as TARGET_OK
+from .targets import run_targets
+from .watcher import IncrementalBundle
+from .watcher import unload_project_modules
+from .watcher import watch as run_watcher
 
 
 ARN_PREFIXES = {
@@ -32,8 +86,17 @@ ARN_PREFIXES = {
     "us-gov-west-1": "aws-us-gov",
 }
 
+# Enough connections for the concurrent invocations of `bench --remote`.
+MAX_POOL_CONNECTIONS = 50
+
+# Where Lambda extracts the bundle; compiled dependencies point here.
+LAMBDA_TASK_ROOT = "/var/task"
+
 log = logging.getLogger(__name__)
 
+_clients = {}
+_clients_lock = threading.Lock()
+
 
 def load_source(module_name, module_path):
     """Loads a python module from the path of the corresponding file."""
@@ -82,7 +145,7 @@ def cleanup_old_versions(
         )
 
         response = client.list_versions_by_function(
-            FunctionName=cfg.get("function_name"),
+            FunctionName=get_function_name(cfg),
         )
         versions = response.get("Versions")
         if len(response.get("Versions")) < keep_last_versions:
@@ -94,10 +157,10 @@ def cleanup_old_versions(
             for version_number in version_numbers:
                 try:
                     client.delete_function(
-                        FunctionName=cfg.get("function_name"),
+                        FunctionName=get_function_name(cfg),
                         Qualifier=version_number,
                     )
-                except botocore.exceptions.ClientError as e:
+                except client.exceptions.ClientError as e:
                     print(f"Skipping Version {version_number}: {e}")
 
 
@@ -108,6 +171,7 @@ def deploy(
     config_file="config.yaml",
     profile_name=None,
     preserve_vpc=False,
+    targets=None,
 ):
     """Deploys a new function to AWS Lambda.
 
@@ -117,10 +181,14 @@ def deploy(
     :param str local_package:
         The path to a local package with should be included in the deploy as
         well (and/or is not available on PyPi)
+    :param list targets:
+        Only deploy to these of the config's `targets`; the bundle is built
+        once and deployed to every target concurrently.
     """
     # Load and parse the config file.
     path_to_config_file = os.path.join(src, config_file)
     cfg = read_cfg(path_to_config_file, profile_name)
+    check_release_settings(cfg, targets)
 
     # Copy all the pip dependencies required to run your code into a temporary
     # folder then add the handler file in the root of this directory.
@@ -133,13 +201,11 @@ def deploy(
         local_package=local_package,
     )
 
-    existing_config = get_function_config(cfg)
-    if existing_config:
-        update_function(
-            cfg, path_to_zip_file, existing_config, preserve_vpc=preserve_vpc
+    if cfg.get("targets") or targets:
+        return deploy_to_targets(
+            cfg, path_to_zip_file, names=targets, preserve_vpc=preserve_vpc
         )
-    else:
-        create_function(cfg, path_to_zip_file)
+    deploy_function(cfg, path_to_zip_file, preserve_vpc=preserve_vpc)
 
 
 def deploy_s3(
@@ -149,6 +215,7 @@ def deploy_s3(
     config_file="config.yaml",
     profile_name=None,
     preserve_vpc=False,
+    targets=None,
 ):
     """Deploys a new function via AWS S3.
 
@@ -158,10 +225,14 @@ def deploy_s3(
     :param str local_package:
         The path to a local package with should be included in the deploy as
         well (and/or is not available on PyPi)
+    :param list targets:
+        Only deploy to these of the config's `targets`; the bundle is built
+        once and deployed to every target concurrently.
     """
     # Load and parse the config file.
     path_to_config_file = os.path.join(src, config_file)
     cfg = read_cfg(path_to_config_file, profile_name)
+    check_release_settings(cfg, targets)
 
     # Copy all the pip dependencies required to run your code into a temporary
     # folder then add the handler file in the root of this directory.
@@ -174,11 +245,59 @@ def deploy_s3(
         local_package=local_package,
     )
 
-    use_s3 = True
-    s3_file = upload_s3(cfg, path_to_zip_file, use_s3)
+    if cfg.get("targets") or targets:
+        return deploy_to_targets(
+            cfg,
+            path_to_zip_file,
+            names=targets,
+            use_s3=True,
+            preserve_vpc=preserve_vpc,
+        )
+    started = time.time()
+    s3_file = upload_s3(cfg, path_to_zip_file, True)
+    deploy_function(
+        cfg,
+        path_to_zip_file,
+        use_s3=True,
+        s3_file=s3_file,
+        preserve_vpc=preserve_vpc,
+        started=started,
+    )
+
+
+def check_release_settings(cfg, targets=None):
+    """Read the release settings of everything a deploy will release.
+
+    Called before building, so an invalid ``alias``, ``canary`` or
+    ``provisioned_concurrency`` setting fails before anything is uploaded.
+
+    :raises ValueError:
+        When the release settings of the config or a target are invalid.
+    """
+    if cfg.get("targets") or targets:
+        for _, target_cfg in get_targets(cfg, targets):
+            get_release_settings(target_cfg)
+    else:
+        get_release_settings(cfg)
+
+
+def deploy_function(
+    cfg,
+    path_to_zip_file,
+    use_s3=False,
+    s3_file=None,
+    preserve_vpc=False,
+    started=None,
+):
+    """Create or update the function described by `cfg` and release it.
+
+    :param float started:
+        When the deploy started; release timings are relative to it.
+    """
+    started = time.time() if started is None else started
     existing_config = get_function_config(cfg)
     if existing_config:
-        update_function(
+        version = update_function(
             cfg,
             path_to_zip_file,
             existing_config,
@@ -187,7 +306,103 @@ def deploy_s3(
             preserve_vpc=preserve_vpc,
         )
     else:
-        create_function(cfg, path_to_zip_file, use_s3=use_s3, s3_file=s3_file)
+        version = create_function(
+            cfg, path_to_zip_file, use_s3=use_s3, s3_file=s3_file
+        )
+    release_version(cfg, version, started)
+    return version
+
+
+def deploy_to_targets(
+    cfg, path_to_zip_file, names=None, use_s3=False, preserve_vpc=False
+):
+    """Deploy one bundle to every target in the config, concurrently.
+
+    With `use_s3`, the bundle is uploaded to the first target's bucket and
+    copied from there to the other targets' buckets inside S3.
+
+    :param list names:
+        Only deploy to the targets with these names.
+    :raises DeployFailed:
+        When any target failed; the others are deployed regardless.
+    """
+    targets = get_targets(cfg, names)
+    s3_files = {}
+    bucket_locks = {}
+    if use_s3:
+        source_cfg = targets[0][1]
+        source_bucket = get_bucket_name(source_cfg)
+        upload_s3(source_cfg, path_to_zip_file, True)
+        byte_stream = read(path_to_zip_file, binary_file=True)
+        for name, target_cfg in targets:
+            s3_files[name] = get_artifact_key(target_cfg, byte_stream)
+            bucket_locks.setdefault(
+                get_bucket_name(target_cfg), threading.Lock()
+            )
+        source_key = get_artifact_key(source_cfg, byte_stream)
+
+    def deploy_target(name, target_cfg):
+        started = time.time()
+        if use_s3:
+            bucket = get_bucket_name(target_cfg)
+            key = s3_files[name]
+            # Targets sharing a bucket copy the artifact once.
+            with bucket_locks[bucket]:
+                if (bucket, key) != (source_bucket, source_key):
+                    stage_artifact(
+                        target_cfg, source_bucket, source_key, bucket, key
+                    )
+        deploy_function(
+            target_cfg,
+            path_to_zip_file,
+            use_s3=use_s3,
+            s3_file=s3_files.get(name),
+            preserve_vpc=preserve_vpc,
+            started=started,
+        )
+
+    print(
+        "Deploying {} to {} targets: {}".format(
+            os.path.basename(path_to_zip_file),
+            len(targets),
+            ", ".join(name for name, _ in targets),
+        )
+    )
+    results = run_targets(targets, deploy_target)
+    print(format_targets(results))
+    failed = [r["name"] for r in results if r["status"] != TARGET_OK]
+    if failed:
+        raise DeployFailed(
+            "Deploy failed for {} of {} targets: {}".format(
+                len(failed), len(results), ", ".join(failed)
+            )
+        )
+    return results
+
+
+def stage_artifact(cfg, source_bucket, source_key, bucket, key):
+    """Copy an artifact to a target's bucket unless it's already there.
+
+    The copy happens inside S3 (`cfg` is the target's, so the client talks
+    to the destination region), which beats uploading the bundle from the
+    build machine once per bucket.
+    """
+    client = get_client(
+        "s3",
+        cfg.get("profile"),
+        cfg.get("aws_access_key_id"),
+        cfg.get("aws_secret_access_key"),
+        cfg.get("region"),
+    )
+    if s3_object_exists(client, bucket, key):
+        return False
+    client.copy_object(
+        Bucket=bucket,
+        Key=key,
+        CopySource={"Bucket": source_bucket, "Key": source_key},
+    )
+    print("Copied {} to S3 bucket {}".format(key, bucket))
+    return True
 
 
 def upload(
@@ -224,12 +439,97 @@ def upload(
     upload_s3(cfg, path_to_zip_file)
 
 
+def watch(
+    src,
+    requirements=None,
+    local_package=None,
+    config_file="config.yaml",
+    profile_name=None,
+    event_file="event.json",
+    deploy=False,
+    polling=False,
+    debounce=0.3,
+):
+    """Rebuilds the bundle on every change and re-invokes or redeploys it.
+
+    Dependencies are installed once and cached; they're only reinstalled when
+    the requirements file changes. With ``dependencies: closure``, the closure
+    is resolved again whenever a file it was resolved from changes.
+
+    :param str src:
+        The path to your Lambda ready project (folder must contain a valid
+        config.yaml and handler module (e.g.: service.py).
+    :param str event_file:
+        The event file passed to the local invoke.
+    :param bool deploy:
+        Push a code-only update to AWS Lambda instead of invoking locally.
+    :param bool polling:
+        Poll for changes even where inotify is available.
+    :param float debounce:
+        Seconds without further changes before rebuilding.
+    """
+    path_to_config_file = os.path.join(src, config_file)
+    cfg = read_cfg(path_to_config_file, profile_name)
+
+    dist_directory = cfg.get("dist_directory", "dist")
+    path_to_zip_file = os.path.join(
+        src, dist_directory, "{0}-watch.zip".format(cfg.get("function_name")),
+    )
+    closure = get_closure_settings(cfg)["enabled"]
+    bundle = IncrementalBundle(
+        src,
+        cfg,
+        path_to_zip_file,
+        collect=lambda: collect_project_sources(src, cfg, config_file),
+        install=install_dependencies,
+        requirements=requirements,
+        local_package=local_package,
+        resolve=functools.partial(
+            resolve_requirements,
+            src,
+            cfg,
+            requirements,
+            os.path.join(src, dist_directory),
+        )
+        if closure
+        else None,
+        requirement_sources=functools.partial(
+            requirement_sources, src, requirements
+        )
+        if closure
+        else None,
+    )
+
+    def on_change(path_to_zip_file):
+        start = time.time()
+        if deploy:
+            update_function_code(cfg, path_to_zip_file)
+            print("Code updated in {:.2f}s".format(time.time() - start))
+        else:
+            unload_project_modules(src)
+            try:
+                invoke(
+                    src,
+                    event_file=event_file,
+                    config_file=config_file,
+                    profile_name=profile_name,
+                    verbose=True,
+                )
+            except Exception as e:
+                log.exception(e)
+                print("Invocation failed: {!r}".format(e))
+
+    run_watcher(bundle, on_change, polling=polling, debounce=debounce)
+
+
 def invoke(
     src,
     event_file="event.json",
     config_file="config.yaml",
     profile_name=None,
     verbose=False,
+    from_dist=False,
+    bundle=None,
 ):
     """Simulates a call to your function.
 
@@ -240,11 +540,260 @@ def invoke(
         An optional argument to override which event file to use.
     :param bool verbose:
         Whether to print out verbose details.
+    :param bool from_dist:
+        Invoke the handler from the latest bundle in the dist directory,
+        in a separate interpreter that only sees the bundle, instead of
+        importing it from `src`.
+    :param str bundle:
+        The zip file to invoke from; implies `from_dist`.
+    :raises InvocationFailed:
+        When invoking from the bundle and the handler failed to import or
+        raised.
     """
     # Load and parse the config file.
     path_to_config_file = os.path.join(src, config_file)
     cfg = read_cfg(path_to_config_file, profile_name)
 
+    if from_dist or bundle:
+        return invoke_from_dist(
+            src, cfg, event_file, bundle, profile_name, verbose
+        )
+
+    fn = load_handler(src, cfg, profile_name)
+
+    # Load and parse event file.
+    path_to_event_file = os.path.join(src, event_file)
+    event = read(path_to_event_file, loader=json.loads)
+
+    context = make_context(cfg)
+
+    # Stop the handler when it runs out of time, as Lambda would.
+    start = time.time()
+    with enforce_timeout(get_timeout(cfg)):
+        results = fn(event, context)
+    end = time.time()
+
+    print("{0}".format(results))
+    if verbose:
+        print(
+            "\nexecution time: {:.8f}s\nfunction execution "
+            "timeout: {:2}s".format(end - start, get_timeout(cfg))
+        )
+        if runtime.is_active():
+            print("runtime: {}".format(json.dumps(runtime.stats())))
+
+
+def invoke_from_dist(
+    src, cfg, event_file, bundle=None, profile_name=None, verbose=False
+):
+    """Invokes the handler from a built bundle, as it would run on Lambda.
+
+    The bundle is extracted to a fresh directory standing in for
+    ``/var/task`` and the handler runs in a separate interpreter whose
+    ``sys.path`` holds only the bundle, the packages the runtime provides
+    and the standard library.
+    """
+    if bundle is None:
+        path_to_dist = os.path.join(src, cfg.get("dist_directory", "dist"))
+        bundle = find_latest_bundle(path_to_dist, cfg.get("function_name"))
+
+    path_to_event_file = os.path.join(src, event_file)
+    event = read(path_to_event_file, loader=json.loads)
+
+    env = {
+        key: str(get_environment_variable_value(value))
+        for key, value in (cfg.get("environment_variables") or {}).items()
+    }
+    if profile_name:
+        env["AWS_PROFILE"] = profile_name
+
+    with runtime_provided_path(
+        get_closure_settings(cfg)["runtime_provided"]
+    ) as runtime_path:
+        outcome = invoke_bundle(
+            bundle,
+            get_deployed_handler(cfg),
+            event,
+            cfg,
+            get_timeout(cfg),
+            env=env,
+            runtime_path=runtime_path,
+        )
+    if outcome["output"]:
+        print(outcome["output"])
+    print("{0}".format(outcome["result"]))
+    print(format_timings(os.path.relpath(bundle, src), outcome))
+    if verbose:
+        print("function execution timeout: {:2}s".format(get_timeout(cfg)))
+    return outcome
+
+
+def batch(
+    src,
+    records_file,
+    event_source="sqs",
+    batch_sizes=(1, 10, 100),
+    window=0,
+    rate=None,
+    max_retries=2,
+    config_file="config.yaml",
+    profile_name=None,
+    verbose=False,
+):
+    """Drives your function locally with SQS, Kinesis or DynamoDB batches.
+
+    :param str src:
+        The path to your Lambda ready project (folder must contain a valid
+        config.yaml and handler module (e.g.: service.py).
+    :param str records_file:
+        A JSON lines file with one record payload per line.
+    :param str event_source:
+        The shape of the batch events: ``sqs``, ``kinesis`` or ``dynamodb``.
+    :param list batch_sizes:
+        The batch sizes to compare.
+    :param float window:
+        The maximum batching window in seconds.
+    :param float rate:
+        Simulated record arrival rate per second (all records are available
+        up front if not set).
+    :param int max_retries:
+        How often a failed record is redelivered before it's dropped.
+    """
+    path_to_config_file = os.path.join(src, config_file)
+    cfg = read_cfg(path_to_config_file, profile_name)
+
+    fn = load_handler(src, cfg, profile_name)
+    records = read_records(os.path.join(src, records_file))
+
+    results = []
+    for batch_size in batch_sizes:
+        results.append(
+            emulate(
+                fn,
+                records,
+                event_source=event_source,
+                batch_size=batch_size,
+                window=window,
+                rate=rate,
+                max_retries=max_retries,
+                make_context=lambda: make_context(cfg),
+            )
+        )
+    print(
+        "{} {} records from {}".format(
+            len(records), event_source, records_file,
+        )
+    )
+    print(format_results(results))
+    if verbose:
+        print(json.dumps(results, indent=2))
+    return results
+
+
+def bench(
+    src,
+    event_file="event.json",
+    config_file="config.yaml",
+    profile_name=None,
+    remote=False,
+    qualifier=None,
+    invocations=20,
+    concurrency=1,
+    as_json=False,
+):
+    """Invokes your function repeatedly and reports latency percentiles.
+
+    :param str src:
+        The path to your Lambda ready project (folder must contain a valid
+        config.yaml and handler module (e.g.: service.py).
+    :param str event_file:
+        The event to invoke the function with.
+    :param bool remote:
+        Invoke the deployed function instead of the local handler. The
+        server-side REPORT lines are parsed to tell cold from warm starts.
+    :param str qualifier:
+        The version or alias to invoke remotely.
+    :param int invocations:
+        The number of invocations.
+    :param int concurrency:
+        How many remote invocations are in flight at once.
+    :param bool as_json:
+        Print the results as JSON instead of a table.
+    """
+    path_to_config_file = os.path.join(src, config_file)
+    cfg = read_cfg(path_to_config_file, profile_name)
+
+    path_to_event_file = os.path.join(src, event_file)
+    if remote:
+        client = get_client(
+            "lambda",
+            cfg.get("profile"),
+            cfg.get("aws_access_key_id"),
+            cfg.get("aws_secret_access_key"),
+            cfg.get("region"),
+        )
+        result = bench_remote(
+            client,
+            get_function_name(cfg),
+            read(path_to_event_file, binary_file=True),
+            invocations=invocations,
+            concurrency=min(concurrency, MAX_POOL_CONNECTIONS),
+            qualifier=qualifier,
+        )
+    else:
+        fn = load_handler(src, cfg, profile_name)
+        event = read(path_to_event_file, loader=json.loads)
+        result = bench_local(
+            fn, event, lambda: make_context(cfg), invocations=invocations,
+        )
+        if runtime.is_active():
+            result["runtime"] = runtime.stats()
+
+    print(dumps(result) if as_json else format_bench(result))
+    return result
+
+
+def stats(
+    src,
+    config_file="config.yaml",
+    profile_name=None,
+    window="1h",
+    as_json=False,
+):
+    """Reports how the deployed function performs, from its REPORT lines.
+
+    :param str src:
+        The path to your Lambda ready project (folder must contain a valid
+        config.yaml and handler module (e.g.: service.py).
+    :param str window:
+        How far back to look, e.g. ``30m``, ``6h`` or ``2d``.
+    :param bool as_json:
+        Print the results as JSON instead of a table.
+    """
+    path_to_config_file = os.path.join(src, config_file)
+    cfg = read_cfg(path_to_config_file, profile_name)
+    client = get_client(
+        "logs",
+        cfg.get("profile"),
+        cfg.get("aws_access_key_id"),
+        cfg.get("aws_secret_access_key"),
+        cfg.get("region"),
+    )
+    result = collect_stats(client, cfg, window=window)
+    print(dumps(result) if as_json else format_stats(result))
+    return result
+
+
+def load_handler(src, cfg, profile_name=None):
+    """Prepares the local environment and returns the handler function.
+
+    :param str src:
+        The path to your Lambda ready project.
+    :param dict cfg:
+        The parsed config file.
+    :param str profile_name:
+        The AWS profile the handler should use.
+    """
     # Set AWS_PROFILE environment variable based on `--profile` option.
     if profile_name:
         os.environ["AWS_PROFILE"] = profile_name
@@ -256,10 +805,6 @@ def invoke(
         for key, value in env_vars.items():
             os.environ[key] = get_environment_variable_value(value)
 
-    # Load and parse event file.
-    path_to_event_file = os.path.join(src, event_file)
-    event = read(path_to_event_file, loader=json.loads)
-
     # Tweak to allow module to import local modules
     try:
         sys.path.index(src)
@@ -269,24 +814,17 @@ def invoke(
     handler = cfg.get("handler")
     # Inspect the handler string (<module>.<function name>) and translate it
     # into a function we can execute.
-    fn = get_callable_handler_function(src, handler)
+    return get_callable_handler_function(src, handler)
 
-    timeout = cfg.get("timeout")
-    if timeout:
-        context = LambdaContext(cfg.get("function_name"), timeout)
-    else:
-        context = LambdaContext(cfg.get("function_name"))
 
-    start = time.time()
-    results = fn(event, context)
-    end = time.time()
+def make_context(cfg):
+    """Returns a fresh `LambdaContext` honoring the configured timeout."""
+    return LambdaContext(cfg.get("function_name"), get_timeout(cfg))
 
-    print("{0}".format(results))
-    if verbose:
-        print(
-            "\nexecution time: {:.8f}s\nfunction execution "
-            "timeout: {:2}s".format(end - start, cfg.get("timeout", 15))
-        )
+
+def get_timeout(cfg):
+    """The function timeout in seconds, defaulting like `create_function`."""
+    return cfg.get("timeout", 15)
 
 
 def init(src, minimal=False):
@@ -316,6 +854,7 @@ def build(
     local_package=None,
     config_file="config.yaml",
     profile_name=None,
+    output_format="zip",
 ):
     """Builds the file bundle.
 
@@ -325,10 +864,17 @@ def build(
     :param str local_package:
         The path to a local package with should be included in the deploy as
         well (and/or is not available on PyPi)
+    :param str output_format:
+        ``zip`` for a zip bundle, ``image`` for an OCI image layout (written
+        to ``<dist_directory>/<function_name>-image``, which is returned
+        instead of the zip file).
+    :raises BudgetExceeded:
+        If the bundle is over one of the budgets set under `build: budget:`.
     """
     # Load and parse the config file.
     path_to_config_file = os.path.join(src, config_file)
     cfg = read_cfg(path_to_config_file, profile_name)
+    budgets = get_budgets(cfg)
 
     # Get the absolute path to the output directory and create it if it doesn't
     # already exist.
@@ -341,28 +887,200 @@ def build(
     function_name = cfg.get("function_name")
     output_filename = "{0}-{1}.zip".format(timestamp(), function_name)
 
+    requirements, no_deps = resolve_requirements(
+        src, cfg, requirements, path_to_dist
+    )
     path_to_temp = mkdtemp(prefix="aws-lambda")
+    install_dependencies(
+        path_to_temp,
+        requirements=requirements,
+        local_package=local_package,
+        no_deps=no_deps,
+    )
+    dependencies = os.listdir(path_to_temp)
+
+    # Gracefully handle whether ".zip" was included in the filename or not.
+    output_filename = (
+        "{0}.zip".format(output_filename)
+        if not output_filename.endswith(".zip")
+        else output_filename
+    )
+
+    sources = collect_project_sources(src, cfg, config_file)
+    for _, filename in sources.files:
+        if "/" not in filename:
+            print("Bundling: %r" % filename)
+    for dirname in sources.directories:
+        print("Bundling directory: %r" % dirname)
+    print(sources.summary())
+
+    if output_format == "image":
+        path_to_image = os.path.join(
+            path_to_dist, "{}-image".format(function_name)
+        )
+        result = build_image(
+            path_to_image,
+            path_to_temp,
+            sources.files,
+            cfg.get("handler"),
+            get_image_settings(cfg),
+        )
+        print(format_image(path_to_image, result))
+        return path_to_image
+
+    # "cd" into `temp_path` directory.
+    os.chdir(path_to_temp)
+    for f, filename in sources.files:
+        # Copy handler file into root of the packages folder and source
+        # directory contents to the same relative path.
+        destination = os.path.join(path_to_temp, filename)
+        mkdir(os.path.dirname(destination))
+        copyfile(f, destination)
+        copystat(f, destination)
+
+    zipimport_settings = get_zipimport_settings(cfg)
+    if zipimport_settings["enabled"]:
+        sources_top_level = set(
+            filename.split("/", 1)[0] for _, filename in sources.files
+        )
+        zipimport_result = pack_dependencies_for_zipimport(
+            path_to_temp,
+            [name for name in dependencies if name not in sources_top_level],
+            cfg.get("handler"),
+            zipimport_settings["exclude"],
+            get_closure_settings(cfg)["runtime_provided"],
+        )
+
+    # Zip them together into a single file.
+    # TODO: Delete temp directory created once the archive has been compiled.
+    path_to_zip_file = archive("./", path_to_dist, output_filename)
+
+    # Report what ended up in the bundle and hold it to its budgets. Only
+    # builds within budget are recorded, so a failing build is always
+    # compared against the last good one.
+    report = bundle_report(path_to_zip_file)
+    if zipimport_settings["enabled"]:
+        report["zipimport"] = zipimport_result
+        report["import_time"] = zipimport_result["import_time_after"]
+    elif budgets["import_time"] is not None:
+        module_name, _ = cfg.get("handler").split(".")
+        with runtime_provided_path(
+            get_closure_settings(cfg)["runtime_provided"]
+        ) as runtime_path:
+            report["import_time"] = measure_import_time(
+                path_to_temp, module_name, runtime_path=runtime_path
+            )
+    previous_report = load_last_report(path_to_dist)
+    print(format_report(report, previous_report))
+    if zipimport_settings["enabled"]:
+        print(format_comparison(zipimport_result))
+    check_budgets(report, budgets, previous_report)
+    save_report(path_to_dist, report)
+    return path_to_zip_file
+
+
+def pack_dependencies_for_zipimport(
+    path, dependencies, handler, exclude=(), runtime_provided=RUNTIME_PROVIDED
+):
+    """Moves pure-Python dependencies into an archive loaded by zipimport.
+
+    Records the unzipped footprint and the handler's import time before and
+    after, so the build report can compare them. Both imports can use the
+    `runtime_provided` packages, as they could on Lambda.
+    """
+    module_name, _ = handler.split(".")
+    size_before = tree_size(path)
+    with runtime_provided_path(runtime_provided) as runtime_path:
+        import_time_before = measure_import_time(
+            path, module_name, runtime_path=runtime_path
+        )
+        result = pack_dependencies(path, dependencies, handler, exclude)
+        import_time_after = measure_import_time(
+            path, BOOTSTRAP_MODULE, runtime_path=runtime_path
+        )
+    result.update(
+        size_before=size_before,
+        size_after=tree_size(path),
+        import_time_before=import_time_before,
+        import_time_after=import_time_after,
+    )
+    return result
+
+
+def resolve_requirements(src, cfg, requirements, path_to_dist):
+    """Pin the runtime dependency closure for ``dependencies: closure``.
+
+    The closure starts from `requirements`, or the dependencies declared in
+    the project, and is written to a requirements file in `path_to_dist`.
+
+    :returns:
+        The requirements file to install and whether pip may skip resolving
+        dependencies (everything is already pinned).
+    """
+    settings = get_closure_settings(cfg)
+    if not settings["enabled"]:
+        return requirements, False
+
+    source, declared = declared_dependencies(src, requirements)
+    closure = DependencyClosure(
+        declared, runtime_provided=settings["runtime_provided"]
+    )
+    print(format_closure(closure, source))
+
+    mkdir(path_to_dist)
+    path_to_pins = os.path.join(path_to_dist, CLOSURE_REQUIREMENTS_FILENAME)
+    with open(path_to_pins, "w") as fh:
+        fh.write("".join(line + "\n" for line in closure.pins()))
+    # Requirements that aren't installed locally still need pip to resolve
+    # their dependencies.
+    return path_to_pins, not closure.missing
+
+
+def install_dependencies(
+    path, requirements=None, local_package=None, no_deps=False
+):
+    """Install the bundle's dependencies into `path`.
+
+    :param str path:
+        Path to install the dependencies to.
+    :param str requirements:
+        If set, only the packages in the supplied requirements file are
+        installed.
+    :param str local_package:
+        The path to a local package with should be included in the deploy as
+        well (and/or is not available on PyPi)
+    :param bool no_deps:
+        Install the requirements without their dependencies, for requirement
+        files that already pin every dependency.
+    """
     pip_install_to_target(
-        path_to_temp, requirements=requirements, local_package=local_package,
+        path,
+        requirements=requirements,
+        local_package=local_package,
+        no_deps=no_deps,
     )
 
     # Hack for Zope.
-    if "zope" in os.listdir(path_to_temp):
+    if "zope" in os.listdir(path):
         print(
             "Zope packages detected; fixing Zope package paths to "
             "make them importable.",
         )
         # Touch.
-        with open(os.path.join(path_to_temp, "zope/__init__.py"), "wb"):
+        with open(os.path.join(path, "zope/__init__.py"), "wb"):
             pass
 
-    # Gracefully handle whether ".zip" was included in the filename or not.
-    output_filename = (
-        "{0}.zip".format(output_filename)
-        if not output_filename.endswith(".zip")
-        else output_filename
-    )
 
+def collect_project_sources(src, cfg, config_file="config.yaml"):
+    """Select the project files to bundle according to the `build` config.
+
+    :param str src:
+        The path to your Lambda ready project.
+    :param dict cfg:
+        The parsed config file.
+    :param str config_file:
+        The config file name, which is never bundled.
+    """
     # Allow definition of source code directories we want to build into our
     # zipped package.
     build_config = defaultdict(**cfg.get("build", {}))
@@ -376,39 +1094,24 @@ def build(
         d.strip() for d in build_source_directories.split(",")
     ]
 
-    files = []
-    for filename in os.listdir(src):
-        if os.path.isfile(filename):
-            if filename == ".DS_Store":
-                continue
-            if filename == config_file:
-                continue
-            print("Bundling: %r" % filename)
-            files.append(os.path.join(src, filename))
-        elif os.path.isdir(filename) and filename in source_directories:
-            print("Bundling directory: %r" % filename)
-            files.append(os.path.join(src, filename))
-
-    # "cd" into `temp_path` directory.
-    os.chdir(path_to_temp)
-    for f in files:
-        if os.path.isfile(f):
-            _, filename = os.path.split(f)
-
-            # Copy handler file into root of the packages folder.
-            copyfile(f, os.path.join(path_to_temp, filename))
-            copystat(f, os.path.join(path_to_temp, filename))
-        elif os.path.isdir(f):
-            src_path_length = len(src) + 1
-            destination_folder = os.path.join(
-                path_to_temp, f[src_path_length:]
-            )
-            copytree(f, destination_folder)
+    # Patterns from `.lambdaignore` and `build: ignore` keep caches, VCS
+    # metadata and other junk out of the bundle.
+    ignore_patterns = build_config.get("ignore") or []
+    if isinstance(ignore_patterns, str):
+        ignore_patterns = [p.strip() for p in ignore_patterns.split(",")]
+    collection = collect_sources(
+        src,
+        source_directories,
+        matcher=IgnoreMatcher.from_project(src, ignore_patterns),
+        exclude=[os.path.basename(config_file)],
+    )
 
-    # Zip them together into a single file.
-    # TODO: Delete temp directory created once the archive has been compiled.
-    path_to_zip_file = archive("./", path_to_dist, output_filename)
-    return path_to_zip_file
+    # Ship `aws_lambda.runtime` on its own; without an `__init__.py` the
+    # bundled `aws_lambda` directory is a namespace package, so none of the
+    # build-time dependencies are needed in the function.
+    if build_config.get("include_runtime"):
+        collection.files.append((runtime.__file__, "aws_lambda/runtime.py"))
+    return collection
 
 
 def get_callable_handler_function(src, handler):
@@ -442,7 +1145,7 @@ def get_handler_filename(handler):
     return "{0}.py".format(module_name)
 
 
-def _install_packages(path, packages):
+def _install_packages(path, packages, no_deps=False, local_packages=()):
     """Install all packages listed to the target directory.
 
     Ignores any package that includes Python itself and python-lambda as well
@@ -452,30 +1155,61 @@ def _install_packages(path, packages):
         Path to copy installed pip packages to.
     :param list packages:
         A list of packages to be installed via pip.
+    :param bool no_deps:
+        Don't install the packages' dependencies.
+    :param list local_packages:
+        Local packages to install with their dependencies, even with
+        `no_deps`: those dependencies aren't pinned anywhere else.
     """
 
     def _filter_blacklist(package):
         blacklist = ["-i", "#", "Python==", "python-lambda=="]
         return all(package.startswith(entry) is False for entry in blacklist)
 
-    filtered_packages = filter(_filter_blacklist, packages)
-    for package in filtered_packages:
+    filtered_packages = [
+        (package, no_deps)
+        for package in packages
+        if _filter_blacklist(package)
+    ]
+    filtered_packages.extend((package, False) for package in local_packages)
+    for package, package_no_deps in filtered_packages:
         if package.startswith("-e "):
             package = package.replace("-e ", "")
 
         print("Installing {package}".format(package=package))
-        subprocess.check_call(
-            [
-                sys.executable,
-                "-m",
-                "pip",
-                "install",
-                package,
-                "-t",
-                path,
-                "--ignore-installed",
-            ]
-        )
+        command = [
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            package,
+            "-t",
+            path,
+            "--ignore-installed",
+            "--no-compile",
+        ]
+        if package_no_deps:
+            command.append("--no-deps")
+        subprocess.check_call(command)
+    # pip's bytecode embeds the temporary install path and each file's
+    # install time, so no two builds would match; compile it here with
+    # hash-based invalidation and the path the code runs from on Lambda.
+    # Like pip, it runs in its own process so the code objects it creates
+    # don't stay in this one's memory, and a module that doesn't compile
+    # is shipped without bytecode rather than failing the build.
+    subprocess.call(
+        [
+            sys.executable,
+            "-m",
+            "compileall",
+            "-q",
+            "-d",
+            LAMBDA_TASK_ROOT,
+            "--invalidation-mode",
+            "checked-hash",
+            path,
+        ]
+    )
     print(
         "Install directory contents are now: {directory}".format(
             directory=os.listdir(path)
@@ -483,7 +1217,9 @@ def _install_packages(path, packages):
     )
 
 
-def pip_install_to_target(path, requirements=None, local_package=None):
+def pip_install_to_target(
+    path, requirements=None, local_package=None, no_deps=False
+):
     """For a given active virtualenv, gather all installed pip packages then
     copy (re-install) them to the path provided.
 
@@ -496,6 +1232,9 @@ def pip_install_to_target(path, requirements=None, local_package=None):
     :param str local_package:
         The path to a local package with should be included in the deploy as
         well (and/or is not available on PyPi)
+    :param bool no_deps:
+        Don't install the requirements' dependencies. Local packages are
+        always installed with theirs.
     """
     packages = []
     if not requirements:
@@ -513,12 +1252,14 @@ def pip_install_to_target(path, requirements=None, local_package=None):
     if not packages:
         print("No dependency packages installed!")
 
+    local_packages = []
     if local_package is not None:
         if not isinstance(local_package, (list, tuple)):
             local_package = [local_package]
-        for l_package in local_package:
-            packages.append(l_package)
-    _install_packages(path, packages)
+        local_packages.extend(local_package)
+    _install_packages(
+        path, packages, no_deps=no_deps, local_packages=local_packages
+    )
 
 
 def get_role_name(region, account_id, role):
@@ -544,19 +1285,46 @@ def get_client(
     aws_secret_access_key,
     region=None,
 ):
-    """Shortcut for getting an initialized instance of the boto3 client."""
+    """Shortcut for getting an initialized instance of the boto3 client.
 
-    boto3.setup_default_session(
-        profile_name=profile_name,
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name=region,
+    Clients are cached per service, credentials and region: creating a
+    session and client costs far more than most API calls, and the cached
+    clients are safe to share between threads.
+    """
+    key = (
+        client,
+        profile_name,
+        aws_access_key_id,
+        aws_secret_access_key,
+        region,
     )
-    return boto3.client(client)
+    with _clients_lock:
+        if key not in _clients:
+            # boto3 takes longer to import than most commands take to run,
+            # so only the ones talking to AWS pay for it.
+            import boto3.session
+            import botocore.config
+
+            session = boto3.session.Session(
+                profile_name=profile_name,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region,
+            )
+            _clients[key] = session.client(
+                client,
+                config=botocore.config.Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                ),
+            )
+        return _clients[key]
 
 
 def create_function(cfg, path_to_zip_file, use_s3=False, s3_file=None):
-    """Register and upload a function to AWS Lambda."""
+    """Register and upload a function to AWS Lambda.
+
+    Returns the published version.
+    """
 
     print("Creating your new Lambda function")
     byte_stream = read(path_to_zip_file, binary_file=True)
@@ -584,11 +1352,8 @@ def create_function(cfg, path_to_zip_file, use_s3=False, s3_file=None):
         cfg.get("region"),
     )
 
-    # Do we prefer development variable over config?
-    buck_name = os.environ.get("S3_BUCKET_NAME") or cfg.get("bucket_name")
-    func_name = os.environ.get("LAMBDA_FUNCTION_NAME") or cfg.get(
-        "function_name"
-    )
+    buck_name = get_bucket_name(cfg)
+    func_name = get_function_name(cfg)
     print("Creating lambda function with name: {}".format(func_name))
 
     if use_s3:
@@ -596,7 +1361,7 @@ def create_function(cfg, path_to_zip_file, use_s3=False, s3_file=None):
             "FunctionName": func_name,
             "Runtime": cfg.get("runtime", "python2.7"),
             "Role": role,
-            "Handler": cfg.get("handler"),
+            "Handler": get_deployed_handler(cfg),
             "Code": {
                 "S3Bucket": "{}".format(buck_name),
                 "S3Key": "{}".format(s3_file),
@@ -615,7 +1380,7 @@ def create_function(cfg, path_to_zip_file, use_s3=False, s3_file=None):
             "FunctionName": func_name,
             "Runtime": cfg.get("runtime", "python2.7"),
             "Role": role,
-            "Handler": cfg.get("handler"),
+            "Handler": get_deployed_handler(cfg),
             "Code": {"ZipFile": byte_stream},
             "Description": cfg.get("description", ""),
             "Timeout": cfg.get("timeout", 15),
@@ -642,13 +1407,36 @@ def create_function(cfg, path_to_zip_file, use_s3=False, s3_file=None):
             },
         )
 
-    client.create_function(**kwargs)
+    response = client.create_function(**kwargs)
 
     concurrency = get_concurrency(cfg)
     if concurrency > 0:
         client.put_function_concurrency(
             FunctionName=func_name, ReservedConcurrentExecutions=concurrency
         )
+    return response.get("Version")
+
+
+def update_function_code(cfg, path_to_zip_file):
+    """Replace the code of an existing Lambda function, nothing else.
+
+    Skips publishing a version and updating the configuration, so it's the
+    quickest way to get new code running while developing.
+    """
+    print("Updating the code of your Lambda function")
+    client = get_client(
+        "lambda",
+        cfg.get("profile"),
+        cfg.get("aws_access_key_id"),
+        cfg.get("aws_secret_access_key"),
+        cfg.get("region"),
+    )
+    client.update_function_code(
+        FunctionName=get_function_name(cfg),
+        ZipFile=read(path_to_zip_file, binary_file=True),
+    )
+    waiter = client.get_waiter("function_updated")
+    waiter.wait(FunctionName=get_function_name(cfg))
 
 
 def update_function(
@@ -659,7 +1447,12 @@ def update_function(
     s3_file=None,
     preserve_vpc=False,
 ):
-    """Updates the code of an existing Lambda function"""
+    """Updates the code and configuration of an existing Lambda function
+
+    The version is only published once both are in place, so it carries the
+    new handler, timeout, memory size and environment. Returns the published
+    version.
+    """
 
     print("Updating your Lambda function")
     byte_stream = read(path_to_zip_file, binary_file=True)
@@ -687,32 +1480,28 @@ def update_function(
         cfg.get("region"),
     )
 
-    # Do we prefer development variable over config?
-    buck_name = os.environ.get("S3_BUCKET_NAME") or cfg.get("bucket_name")
+    buck_name = get_bucket_name(cfg)
 
     if use_s3:
         client.update_function_code(
-            FunctionName=cfg.get("function_name"),
+            FunctionName=get_function_name(cfg),
             S3Bucket="{}".format(buck_name),
             S3Key="{}".format(s3_file),
-            Publish=True,
         )
     else:
         client.update_function_code(
-            FunctionName=cfg.get("function_name"),
-            ZipFile=byte_stream,
-            Publish=True,
+            FunctionName=get_function_name(cfg), ZipFile=byte_stream,
         )
 
     # Wait for function to be updated
     waiter = client.get_waiter('function_updated')
-    waiter.wait(FunctionName=cfg.get("function_name"))
+    waiter.wait(FunctionName=get_function_name(cfg))
 
     kwargs = {
-        "FunctionName": cfg.get("function_name"),
+        "FunctionName": get_function_name(cfg),
         "Role": role,
         "Runtime": cfg.get("runtime"),
-        "Handler": cfg.get("handler"),
+        "Handler": get_deployed_handler(cfg),
         "Description": cfg.get("description", ""),
         "Timeout": cfg.get("timeout", 15),
         "MemorySize": cfg.get("memory_size", 512),
@@ -746,16 +1535,17 @@ def update_function(
         )
 
     ret = client.update_function_configuration(**kwargs)
+    waiter.wait(FunctionName=get_function_name(cfg))
 
     concurrency = get_concurrency(cfg)
     if concurrency > 0:
         client.put_function_concurrency(
-            FunctionName=cfg.get("function_name"),
+            FunctionName=get_function_name(cfg),
             ReservedConcurrentExecutions=concurrency,
         )
     elif "Concurrency" in existing_cfg:
         client.delete_function_concurrency(
-            FunctionName=cfg.get("function_name")
+            FunctionName=get_function_name(cfg)
         )
 
     if "tags" in cfg:
@@ -768,9 +1558,66 @@ def update_function(
                 )
             client.tag_resource(Resource=ret["FunctionArn"], Tags=tags)
 
+    response = client.publish_version(FunctionName=get_function_name(cfg))
+    return response.get("Version")
+
+
+def release_version(cfg, version, started=None):
+    """Prewarm a published version and move the configured alias to it.
+
+    Waits for the alias' provisioned concurrency when the config sets
+    ``provisioned_concurrency``, then prints how long the version took to
+    become ready. With ``canary`` set, the alias is shifted in steps and
+    rolled back when the new version regresses. Does nothing unless
+    ``alias`` or ``prewarm`` is set.
+
+    :raises CanaryFailed:
+        When the canary rolled the alias back.
+    """
+    settings = get_release_settings(cfg)
+    if not (settings["alias"] or settings["prewarm"]):
+        return None
+    client = get_client(
+        "lambda",
+        cfg.get("profile"),
+        cfg.get("aws_access_key_id"),
+        cfg.get("aws_secret_access_key"),
+        cfg.get("region"),
+    )
+    function_name = get_function_name(cfg)
+    if settings["prewarm"]:
+        print(
+            "Prewarming version {} with {} invocations".format(
+                version, settings["prewarm"]
+            )
+        )
+    cloudwatch = None
+    if settings["canary"]:
+        cloudwatch = get_client(
+            "cloudwatch",
+            cfg.get("profile"),
+            cfg.get("aws_access_key_id"),
+            cfg.get("aws_secret_access_key"),
+            cfg.get("region"),
+        )
+    timings = release(
+        client,
+        function_name,
+        version,
+        settings,
+        started,
+        cloudwatch=cloudwatch,
+    )
+    print(format_release(function_name, version, settings, timings))
+    return timings
+
 
 def upload_s3(cfg, path_to_zip_file, *use_s3):
-    """Upload a function to AWS S3."""
+    """Upload a function to AWS S3.
+
+    The object key is derived from the SHA-256 of the bundle, so an artifact
+    that is already in the bucket isn't uploaded again.
+    """
 
     print("Uploading your new Lambda function")
     profile_name = cfg.get("profile")
@@ -786,18 +1633,18 @@ def upload_s3(cfg, path_to_zip_file, *use_s3):
     byte_stream = b""
     with open(path_to_zip_file, mode="rb") as fh:
         byte_stream = fh.read()
-    s3_key_prefix = cfg.get("s3_key_prefix", "/dist")
-    checksum = hashlib.new("md5", byte_stream).hexdigest()
-    timestamp = str(time.time())
-    filename = "{prefix}{checksum}-{ts}.zip".format(
-        prefix=s3_key_prefix, checksum=checksum, ts=timestamp,
-    )
+    filename = get_artifact_key(cfg, byte_stream)
+
+    buck_name = get_bucket_name(cfg)
+    func_name = get_function_name(cfg)
+    if s3_object_exists(client, buck_name, filename):
+        print(
+            "{} is already in S3 bucket {}, skipping upload".format(
+                filename, buck_name
+            )
+        )
+        return filename
 
-    # Do we prefer development variable over config?
-    buck_name = os.environ.get("S3_BUCKET_NAME") or cfg.get("bucket_name")
-    func_name = os.environ.get("LAMBDA_FUNCTION_NAME") or cfg.get(
-        "function_name"
-    )
     kwargs = {
         "Bucket": "{}".format(buck_name),
         "Key": "{}".format(filename),
@@ -806,14 +1653,154 @@ def upload_s3(cfg, path_to_zip_file, *use_s3):
 
     client.put_object(**kwargs)
     print("Finished uploading {} to S3 bucket {}".format(func_name, buck_name))
-    if use_s3:
-        return filename
+    return filename
+
+
+def get_artifact_key(cfg, byte_stream):
+    """Return the content-addressed S3 key for a bundle."""
+    s3_key_prefix = cfg.get("s3_key_prefix", "/dist")
+    checksum = hashlib.sha256(byte_stream).hexdigest()
+    return "{prefix}{checksum}.zip".format(
+        prefix=s3_key_prefix, checksum=checksum,
+    )
+
+
+def s3_object_exists(client, bucket, key):
+    """Check whether an S3 object exists with a HEAD request.
+
+    Without ``s3:ListBucket``, S3 answers 403 instead of 404 for a missing
+    key; the object is then treated as missing, so it gets uploaded.
+    """
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+    except client.exceptions.ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("404", "NoSuchKey", "403", "Forbidden", "AccessDenied"):
+            return False
+        raise
+    return True
+
+
+def prune_artifacts(
+    src,
+    config_file="config.yaml",
+    profile_name=None,
+    function_names=None,
+    dry_run=False,
+):
+    """Deletes S3 artifacts that no published version of the function uses.
+
+    Only content-addressed artifacts (``{s3_key_prefix}{sha256}.zip``) are
+    considered; anything else under the prefix is left alone.
+
+    :param str src:
+        The path to your Lambda ready project (folder must contain a valid
+        config.yaml and handler module (e.g.: service.py).
+    :param list function_names:
+        Other functions deployed from the same bucket and prefix whose
+        versions must keep their artifacts too.
+    :param bool dry_run:
+        Only print what would be deleted.
+    """
+    path_to_config_file = os.path.join(src, config_file)
+    cfg = read_cfg(path_to_config_file, profile_name)
+
+    profile_name = cfg.get("profile")
+    aws_access_key_id = cfg.get("aws_access_key_id")
+    aws_secret_access_key = cfg.get("aws_secret_access_key")
+    lambda_client = get_client(
+        "lambda",
+        profile_name,
+        aws_access_key_id,
+        aws_secret_access_key,
+        cfg.get("region"),
+    )
+    s3_client = get_client(
+        "s3",
+        profile_name,
+        aws_access_key_id,
+        aws_secret_access_key,
+        cfg.get("region"),
+    )
+
+    func_name = get_function_name(cfg)
+    referenced = set()
+    for name in [func_name] + list(function_names or []):
+        referenced.update(get_code_checksums(lambda_client, name))
+
+    buck_name = get_bucket_name(cfg)
+    s3_key_prefix = cfg.get("s3_key_prefix", "/dist")
+    artifact_key = re.compile(
+        re.escape(s3_key_prefix) + r"(?P<checksum>[0-9a-f]{64})\.zip$"
+    )
+
+    stale = []
+    kept = 0
+    kwargs = {"Bucket": buck_name, "Prefix": s3_key_prefix}
+    while True:
+        response = s3_client.list_objects_v2(**kwargs)
+        for obj in response.get("Contents", []):
+            match = artifact_key.match(obj["Key"])
+            if match is None:
+                continue
+            if match.group("checksum") in referenced:
+                kept += 1
+            else:
+                stale.append(obj)
+        if not response.get("IsTruncated"):
+            break
+        kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+    stale_bytes = sum(obj.get("Size", 0) for obj in stale)
+    for obj in stale:
+        print(
+            "{} s3://{}/{}".format(
+                "Would delete" if dry_run else "Deleting",
+                buck_name,
+                obj["Key"],
+            )
+        )
+    if not dry_run:
+        # DeleteObjects takes up to 1000 keys per request.
+        for start in range(0, len(stale), 1000):
+            stop = start + 1000
+            s3_client.delete_objects(
+                Bucket=buck_name,
+                Delete={
+                    "Objects": [
+                        {"Key": obj["Key"]} for obj in stale[start:stop]
+                    ],
+                    "Quiet": True,
+                },
+            )
+    print(
+        "{} artifacts in use, {} unreferenced ({})".format(
+            kept, len(stale), format_size(stale_bytes)
+        )
+    )
+    return [obj["Key"] for obj in stale]
+
+
+def get_code_checksums(client, function_name):
+    """Return the hex SHA-256 of the code of every version of a function."""
+    checksums = set()
+    kwargs = {"FunctionName": function_name}
+    while True:
+        try:
+            response = client.list_versions_by_function(**kwargs)
+        except client.exceptions.ResourceNotFoundException:
+            return checksums
+        for version in response.get("Versions", []):
+            checksums.add(base64.b64decode(version["CodeSha256"]).hex())
+        if not response.get("NextMarker"):
+            return checksums
+        kwargs["Marker"] = response["NextMarker"]
 
 
 def get_function_config(cfg):
     """Check whether a function exists or not and return its config"""
 
-    function_name = cfg.get("function_name")
+    function_name = get_function_name(cfg)
     profile_name = cfg.get("profile")
     aws_access_key_id = cfg.get("aws_access_key_id")
     aws_secret_access_key = cfg.get("aws_secret_access_key")
@@ -839,6 +1826,8 @@ def get_concurrency(cfg):
 
 
 def read_cfg(path_to_config_file, profile_name):
+    import yaml
+
     cfg = read(path_to_config_file, loader=yaml.full_load)
     if profile_name is not None:
         cfg["profile"] = profile_name
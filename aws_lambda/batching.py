@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""Emulate SQS, Kinesis and DynamoDB Streams batches against a handler.
+
+Records are read from a JSON lines file, grouped into events shaped like the
+ones the Lambda event source mappings deliver, and fed to the handler one
+batch at a time, the way a single poller (one queue poller or one shard)
+would. Partial batch responses (``batchItemFailures``) are honored, so the
+retry behaviour and its cost show up in the numbers.
+"""
+import base64
+import hashlib
+import json
+import time
+from collections import deque
+from decimal import Decimal
+
+from .helpers import percentile
+
+REGION = "us-east-1"
+ACCOUNT_ID = "123456789012"
+
+
+def read_records(path):
+    """Read one record per line from a JSON lines file."""
+    records = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def _as_text(payload):
+    if isinstance(payload, str):
+        return payload
+    return json.dumps(payload)
+
+
+def sqs_record(payload, index, attempt):
+    body = _as_text(payload)
+    message_id = "00000000-0000-0000-0000-{:012d}".format(index)
+    return {
+        "messageId": message_id,
+        "receiptHandle": "{}-{}".format(message_id, attempt),
+        "body": body,
+        "attributes": {
+            "ApproximateReceiveCount": str(attempt),
+            "SentTimestamp": str(1600000000000 + index),
+            "SenderId": ACCOUNT_ID,
+            "ApproximateFirstReceiveTimestamp": str(1600000000000 + index),
+        },
+        "messageAttributes": {},
+        "md5OfBody": hashlib.md5(body.encode("utf-8")).hexdigest(),
+        "eventSource": "aws:sqs",
+        "eventSourceARN": "arn:aws:sqs:{}:{}:emulated-queue".format(
+            REGION, ACCOUNT_ID,
+        ),
+        "awsRegion": REGION,
+    }
+
+
+def _sequence_number(index):
+    return "{:056d}".format(index)
+
+
+def kinesis_record(payload, index, attempt):
+    data = _as_text(payload).encode("utf-8")
+    sequence_number = _sequence_number(index)
+    return {
+        "kinesis": {
+            "kinesisSchemaVersion": "1.0",
+            "partitionKey": str(index),
+            "sequenceNumber": sequence_number,
+            "data": base64.b64encode(data).decode("ascii"),
+            "approximateArrivalTimestamp": 1600000000 + index / 1000.0,
+        },
+        "eventSource": "aws:kinesis",
+        "eventVersion": "1.0",
+        "eventID": "shardId-000000000000:{}".format(sequence_number),
+        "eventName": "aws:kinesis:record",
+        "invokeIdentityArn": "arn:aws:iam::{}:role/emulated".format(
+            ACCOUNT_ID,
+        ),
+        "awsRegion": REGION,
+        "eventSourceARN": "arn:aws:kinesis:{}:{}:stream/emulated".format(
+            REGION, ACCOUNT_ID,
+        ),
+    }
+
+
+def to_dynamodb(value):
+    """Convert a JSON value to the DynamoDB attribute value format."""
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": str(value)}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, list):
+        return {"L": [to_dynamodb(v) for v in value]}
+    if isinstance(value, dict):
+        return {"M": {k: to_dynamodb(v) for k, v in value.items()}}
+    raise TypeError("Unsupported type: {!r}".format(type(value)))
+
+
+def dynamodb_record(payload, index, attempt):
+    if not isinstance(payload, dict):
+        payload = {"value": payload}
+    image = to_dynamodb(payload)["M"]
+    keys = {"id": image.get("id", {"N": str(index)})}
+    return {
+        "eventID": hashlib.md5(str(index).encode("ascii")).hexdigest(),
+        "eventName": "INSERT",
+        "eventVersion": "1.1",
+        "eventSource": "aws:dynamodb",
+        "awsRegion": REGION,
+        "dynamodb": {
+            "ApproximateCreationDateTime": 1600000000 + index,
+            "Keys": keys,
+            "NewImage": image,
+            "SequenceNumber": _sequence_number(index),
+            "SizeBytes": len(json.dumps(payload)),
+            "StreamViewType": "NEW_AND_OLD_IMAGES",
+        },
+        "eventSourceARN": (
+            "arn:aws:dynamodb:{}:{}:table/emulated/stream/2020-01-01T00:00"
+            ":00.000".format(REGION, ACCOUNT_ID)
+        ),
+    }
+
+
+# event source -> (record builder, item identifier, failures retry order)
+EVENT_SOURCES = {
+    "sqs": (sqs_record, lambda r: r["messageId"], "requeue"),
+    "kinesis": (
+        kinesis_record,
+        lambda r: r["kinesis"]["sequenceNumber"],
+        "checkpoint",
+    ),
+    "dynamodb": (
+        dynamodb_record,
+        lambda r: r["dynamodb"]["SequenceNumber"],
+        "checkpoint",
+    ),
+}
+
+
+class Pending:
+    """A record waiting to be delivered."""
+
+    def __init__(self, index, payload, arrival):
+        self.index = index
+        self.payload = payload
+        self.arrival = arrival
+        self.attempts = 0
+
+
+def next_batch(queue, batch_size, window, now):
+    """Take the next batch off `queue` and return it with its close time.
+
+    A batch closes when it holds `batch_size` records or when `window`
+    seconds have passed since its first record became available, whichever
+    comes first; records that haven't arrived by then wait for the next one.
+    """
+    first = queue[0]
+    opened = max(now, first.arrival)
+    closes = opened + window
+    batch = [queue.popleft()]
+    while queue and len(batch) < batch_size:
+        if queue[0].arrival > closes:
+            break
+        batch.append(queue.popleft())
+    if len(batch) == batch_size:
+        closes = max(opened, batch[-1].arrival)
+    return batch, closes
+
+
+def failed_identifiers(response, identifiers):
+    """Return the identifiers a partial batch response reports as failed.
+
+    Per the Lambda docs, an empty or unknown identifier fails the whole
+    batch.
+    """
+    if not isinstance(response, dict):
+        return set()
+    failures = response.get("batchItemFailures") or []
+    failed = set()
+    for failure in failures:
+        identifier = (failure or {}).get("itemIdentifier")
+        if not identifier or identifier not in identifiers:
+            return set(identifiers)
+        failed.add(identifier)
+    return failed
+
+
+def emulate(
+    fn,
+    records,
+    event_source="sqs",
+    batch_size=10,
+    window=0,
+    rate=None,
+    max_retries=2,
+    make_context=None,
+    clock=None,
+):
+    """Drive `fn` with batches of `records` and measure it.
+
+    :param callable fn:
+        The handler.
+    :param list records:
+        The record payloads.
+    :param str event_source:
+        One of ``sqs``, ``kinesis`` or ``dynamodb``.
+    :param int batch_size:
+        The maximum number of records per batch.
+    :param float window:
+        The maximum batching window in seconds.
+    :param float rate:
+        Simulated arrival rate in records per second. ``None`` means all
+        records are available up front.
+    :param int max_retries:
+        How often a failed record is redelivered before it's dropped.
+    :param callable make_context:
+        Returns the context object for each invocation.
+    :param callable clock:
+        Returns the current time in seconds, for timing the handler.
+    """
+    clock = clock or time.perf_counter
+    build_record, identify, retry_mode = EVENT_SOURCES[event_source]
+    queue = deque(
+        Pending(i, payload, i / float(rate) if rate else 0.0)
+        for i, payload in enumerate(records)
+    )
+
+    now = 0.0
+    handler_time = 0.0
+    invocations = 0
+    errors = 0
+    retried = 0
+    dropped = 0
+    succeeded = 0
+    latencies = []
+    batch_sizes = []
+
+    while queue:
+        batch, closes = next_batch(queue, batch_size, window, now)
+        now = max(now, closes)
+        for pending in batch:
+            pending.attempts += 1
+        event_records = [
+            build_record(p.payload, p.index, p.attempts) for p in batch
+        ]
+        identifiers = [identify(r) for r in event_records]
+        context = make_context() if make_context else None
+
+        start = clock()
+        try:
+            response = fn({"Records": event_records}, context)
+        except Exception:
+            response = None
+            failed = set(identifiers)
+            errors += 1
+        else:
+            failed = failed_identifiers(response, identifiers)
+        duration = clock() - start
+
+        invocations += 1
+        handler_time += duration
+        batch_sizes.append(len(batch))
+        now += duration
+
+        if retry_mode == "checkpoint" and failed:
+            # Streams resume from the first failure: everything after it in
+            # the batch is delivered again too.
+            first = min(identifiers.index(i) for i in failed)
+            failed = set(identifiers[first:])
+
+        retry = []
+        for pending, identifier in zip(batch, identifiers):
+            if identifier not in failed:
+                succeeded += 1
+                latencies.append(now - pending.arrival)
+            elif pending.attempts > max_retries:
+                dropped += 1
+            else:
+                retried += 1
+                retry.append(pending)
+        if retry_mode == "checkpoint":
+            queue.extendleft(reversed(retry))
+        else:
+            queue.extend(retry)
+
+    return {
+        "event_source": event_source,
+        "batch_size": batch_size,
+        "window": window,
+        "records": len(records),
+        "succeeded": succeeded,
+        "retried": retried,
+        "dropped": dropped,
+        "invocations": invocations,
+        "errors": errors,
+        "mean_batch_size": (
+            sum(batch_sizes) / float(len(batch_sizes)) if batch_sizes else 0
+        ),
+        "handler_seconds": handler_time,
+        "records_per_second": (
+            succeeded / handler_time if handler_time else None
+        ),
+        "ms_per_record": (
+            handler_time * 1000.0 / sum(batch_sizes) if batch_sizes else None
+        ),
+        "latency_p50_ms": _ms(percentile(latencies, 50)),
+        "latency_p99_ms": _ms(percentile(latencies, 99)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000.0
+
+
+def _fmt(value, spec="{:.2f}"):
+    return "-" if value is None else spec.format(value)
+
+
+def format_results(results):
+    """Render emulation results as a table, one row per batch size."""
+    lines = [
+        "{:>6} {:>8} {:>9} {:>11} {:>10} {:>9} {:>9} {:>8} {:>8}".format(
+            "batch",
+            "window",
+            "invokes",
+            "records/s",
+            "ms/record",
+            "p50 ms",
+            "p99 ms",
+            "retried",
+            "dropped",
+        )
+    ]
+    for result in results:
+        lines.append(
+            "{:>6} {:>8} {:>9} {:>11} {:>10} {:>9} {:>9} {:>8} {:>8}".format(
+                result["batch_size"],
+                _fmt(result["window"], "{:g}s"),
+                result["invocations"],
+                _fmt(result["records_per_second"], "{:.1f}"),
+                _fmt(result["ms_per_record"], "{:.3f}"),
+                _fmt(result["latency_p50_ms"], "{:.1f}"),
+                _fmt(result["latency_p99_ms"], "{:.1f}"),
+                result["retried"],
+                result["dropped"],
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Measure a function by invoking it repeatedly, locally or in AWS Lambda."""
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .reports import find_report
+from .reports import format_summaries
+from .reports import summarize
+
+
+def invoke_remote(client, function_name, payload, qualifier=None):
+    """Invoke a deployed function once with its log tail.
+
+    :returns:
+        A dict with the client-side ``latency`` (ms), the parsed ``REPORT``
+        line (or None), the ``executed_version`` and any ``error``.
+    """
+    kwargs = {
+        "FunctionName": function_name,
+        "InvocationType": "RequestResponse",
+        "LogType": "Tail",
+        "Payload": payload,
+    }
+    if qualifier:
+        kwargs["Qualifier"] = qualifier
+    start = time.perf_counter()
+    response = client.invoke(**kwargs)
+    body = response["Payload"].read()
+    latency = (time.perf_counter() - start) * 1000.0
+
+    log_tail = base64.b64decode(response.get("LogResult", "")).decode(
+        "utf-8", "replace"
+    )
+    error = response.get("FunctionError")
+    if error:
+        error = "{}: {}".format(error, body.decode("utf-8", "replace")[:200])
+    return {
+        "latency": latency,
+        "report": find_report(log_tail),
+        "executed_version": response.get("ExecutedVersion"),
+        "error": error,
+    }
+
+
+def bench_remote(
+    client,
+    function_name,
+    payload,
+    invocations=20,
+    concurrency=1,
+    qualifier=None,
+):
+    """Invoke a deployed function `invocations` times, `concurrency` at once.
+
+    Each invocation requests the log tail so the server side ``REPORT`` line
+    can be compared with the latency the client observed. An invocation the
+    API rejects (a throttle, say) is recorded as an error, without a
+    latency, and doesn't stop the others.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+
+    def invoke():
+        try:
+            return invoke_remote(client, function_name, payload, qualifier)
+        except Exception as e:
+            return {
+                "latency": None,
+                "report": None,
+                "executed_version": None,
+                "error": repr(e),
+            }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(invoke) for _ in range(invocations)]
+        results = [future.result() for future in futures]
+    return aggregate(results)
+
+
+def bench_local(fn, event, make_context, invocations=20):
+    """Call a handler `invocations` times in this process.
+
+    The first call pays for module level initialization done lazily by the
+    handler, so it's reported separately as the cold invocation.
+    """
+    results = []
+    for _ in range(invocations):
+        context = make_context()
+        start = time.perf_counter()
+        error = None
+        try:
+            fn(event, context)
+        except Exception as e:
+            error = repr(e)
+        latency = (time.perf_counter() - start) * 1000.0
+        results.append(
+            {
+                "latency": latency,
+                "report": None,
+                "executed_version": None,
+                "error": error,
+            }
+        )
+    aggregated = aggregate(results)
+    aggregated["cold_latency"] = results[0]["latency"] if results else None
+    aggregated["warm_latency"] = summarize(
+        [r["latency"] for r in results[1:]]
+    )
+    return aggregated
+
+
+def aggregate(results):
+    """Combine per-invocation results into cold/warm and percentile stats."""
+    reports = [r["report"] for r in results if r["report"] is not None]
+    cold = [r for r in reports if r.get("init_duration") is not None]
+    warm = [r for r in reports if r.get("init_duration") is None]
+    return {
+        "invocations": len(results),
+        "errors": [r["error"] for r in results if r["error"]],
+        "versions": sorted(
+            set(
+                r["executed_version"]
+                for r in results
+                if r["executed_version"]
+            )
+        ),
+        "cold_starts": len(cold),
+        "client_latency": summarize([r["latency"] for r in results]),
+        "duration": summarize([r.get("duration") for r in reports]),
+        "cold_duration": summarize([r.get("duration") for r in cold]),
+        "warm_duration": summarize([r.get("duration") for r in warm]),
+        "init_duration": summarize([r.get("init_duration") for r in cold]),
+        "billed_duration": summarize(
+            [r.get("billed_duration") for r in reports]
+        ),
+        "max_memory_used": summarize(
+            [r.get("max_memory_used") for r in reports]
+        ),
+    }
+
+
+def format_bench(result):
+    """Render a bench result for the terminal."""
+    summary = "{} invocations, {} errors".format(
+        result["invocations"], len(result["errors"]),
+    )
+    if "warm_latency" not in result:
+        summary += ", {} cold starts".format(result["cold_starts"])
+    if result["versions"]:
+        summary += ", executed versions: {}".format(
+            ", ".join(result["versions"])
+        )
+    lines = [summary]
+    rows = [("client latency (ms)", result["client_latency"])]
+    if "warm_latency" in result:
+        rows.append(("warm latency (ms)", result["warm_latency"]))
+        lines.append(
+            "cold invocation: {:.1f}ms".format(result["cold_latency"])
+        )
+    for label, key in (
+        ("duration (ms)", "duration"),
+        ("warm duration (ms)", "warm_duration"),
+        ("cold duration (ms)", "cold_duration"),
+        ("init duration (ms)", "init_duration"),
+        ("billed duration (ms)", "billed_duration"),
+        ("max memory used (MB)", "max_memory_used"),
+    ):
+        if result[key]["count"]:
+            rows.append((label, result[key]))
+    lines.append(format_summaries(rows))
+    if "runtime" in result:
+        lines.append(format_runtime_stats(result["runtime"]))
+    for error in result["errors"][:5]:
+        lines.append("error: {}".format(error))
+    return "\n".join(lines)
+
+
+def format_runtime_stats(stats):
+    """Summarize `aws_lambda.runtime.stats()` output."""
+    lines = [
+        "clients: {created} created, {reused} reused".format(
+            **stats["clients"]
+        )
+    ]
+    for name, cache in sorted(stats["caches"].items()):
+        lines.append(
+            "cache {}: {} hits, {} misses, {} expired, {} evicted".format(
+                name,
+                cache["hits"],
+                cache["misses"],
+                cache["expired"],
+                cache["evicted"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def dumps(result):
+    return json.dumps(result, indent=2, sort_keys=True)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Bundle size and cold-start budgets for ``build``."""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import zipfile
+from collections import defaultdict
+
+REPORT_FILENAME = ".build-report.json"
+
+SIZE_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "KIB": 1024,
+    "MIB": 1024**2,
+    "GIB": 1024**3,
+}
+
+BUDGET_KEYS = (
+    "compressed_size",
+    "uncompressed_size",
+    "file_count",
+    "import_time",
+)
+
+IMPORT_TIME_SCRIPT = """\
+import importlib
+import sys
+import time
+sys.path[0:0] = [sys.argv[1]] + sys.argv[3:]
+start = time.perf_counter()
+importlib.import_module(sys.argv[2])
+print(time.perf_counter() - start)
+"""
+
+
+class BudgetExceeded(Exception):
+    """Raised when a built bundle is over one of its configured budgets."""
+
+
+def parse_size(value):
+    """Convert a size such as ``50MB``, ``1.5 GiB`` or ``1024`` to bytes."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    match = re.match(r"^\s*([\d.]+)\s*([a-zA-Z]*)\s*$", str(value))
+    if match is None or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError("Invalid size: {!r}".format(value))
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+def format_size(num_bytes):
+    """Render a byte count for humans (``12.3MB``)."""
+    sign = "-" if num_bytes < 0 else ""
+    num_bytes = abs(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1000:
+            return "{}{:.1f}{}".format(sign, num_bytes, unit)
+        num_bytes /= 1000.0
+    return "{}{:.1f}GB".format(sign, num_bytes)
+
+
+def get_budgets(cfg):
+    """Read the ``build: budget:`` section of the config, sizes in bytes."""
+    budget = (cfg.get("build") or {}).get("budget") or {}
+    unknown = set(budget) - set(BUDGET_KEYS)
+    if unknown:
+        raise ValueError(
+            "Unknown budget keys: {}".format(", ".join(sorted(unknown)))
+        )
+    return {
+        "compressed_size": parse_size(budget.get("compressed_size")),
+        "uncompressed_size": parse_size(budget.get("uncompressed_size")),
+        "file_count": budget.get("file_count"),
+        "import_time": budget.get("import_time"),
+    }
+
+
+def bundle_report(path_to_zip_file):
+    """Summarize a bundle: sizes, file count and per-package breakdown.
+
+    Packages are the top level entries of the archive, so a dependency
+    installed as ``requests/`` plus ``requests-2.0.dist-info/`` shows up as
+    two rows.
+    """
+    packages = defaultdict(lambda: {"files": 0, "size": 0, "compressed": 0})
+    uncompressed_size = 0
+    file_count = 0
+    with zipfile.ZipFile(path_to_zip_file) as zfh:
+        for info in zfh.infolist():
+            if info.is_dir():
+                continue
+            top_level = info.filename.split("/", 1)[0]
+            package = packages[top_level]
+            package["files"] += 1
+            package["size"] += info.file_size
+            package["compressed"] += info.compress_size
+            uncompressed_size += info.file_size
+            file_count += 1
+    return {
+        "compressed_size": os.path.getsize(path_to_zip_file),
+        "uncompressed_size": uncompressed_size,
+        "file_count": file_count,
+        "packages": dict(packages),
+    }
+
+
+def measure_import_time(path, module_name, runs=3, runtime_path=None):
+    """Time a cold import of `module_name` from `path` in a fresh process.
+
+    The interpreter runs with ``-I -S``, so only `path`, `runtime_path` (the
+    packages the Lambda runtime provides, searched after `path`) and the
+    standard library are importable, as on Lambda; the build environment's
+    other packages can't stand in for missing or slower bundled ones. The
+    fastest of `runs` imports is returned to smooth out disk cache and
+    scheduler noise.
+
+    :raises BudgetExceeded:
+        When `module_name` can't be imported from `path`.
+    """
+    timings = []
+    for _ in range(runs):
+        try:
+            output = subprocess.check_output(
+                [
+                    sys.executable,
+                    "-I",
+                    "-S",
+                    "-c",
+                    IMPORT_TIME_SCRIPT,
+                    path,
+                    module_name,
+                ]
+                + ([runtime_path] if runtime_path else []),
+                cwd=path,
+                stderr=subprocess.PIPE,
+            )
+        except subprocess.CalledProcessError as e:
+            lines = e.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise BudgetExceeded(
+                "Can't measure import_time: importing {} from the bundle "
+                "failed: {}".format(
+                    module_name, lines[-1] if lines else e.returncode
+                )
+            )
+        timings.append(float(output.decode("utf-8").strip().splitlines()[-1]))
+    return min(timings)
+
+
+def load_last_report(path_to_dist):
+    path = os.path.join(path_to_dist, REPORT_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_report(path_to_dist, report):
+    with open(os.path.join(path_to_dist, REPORT_FILENAME), "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+
+
+def _delta(current, previous):
+    if previous is None:
+        return ""
+    return " ({})".format(format_size(current - previous))
+
+
+def format_report(report, previous=None):
+    """Render the per-package size breakdown, largest packages first."""
+    previous_packages = (previous or {}).get("packages", {})
+    lines = [
+        "{:<40} {:>7} {:>12} {:>12}".format(
+            "package",
+            "files",
+            "size",
+            "zipped",
+        )
+    ]
+    rows = sorted(
+        report["packages"].items(),
+        key=lambda item: -item[1]["size"],
+    )
+    for name, package in rows:
+        old = previous_packages.get(name, {}).get("size")
+        if previous is not None and old is None:
+            old = 0
+        lines.append(
+            "{:<40} {:>7} {:>12} {:>12}{}".format(
+                name,
+                package["files"],
+                format_size(package["size"]),
+                format_size(package["compressed"]),
+                _delta(package["size"], old),
+            )
+        )
+    for name in sorted(set(previous_packages) - set(report["packages"])):
+        lines.append(
+            "{:<40} {:>7} {:>12} {:>12} (removed)".format(
+                name,
+                0,
+                format_size(0),
+                format_size(0),
+            )
+        )
+    summary = "total: {} files, {} unzipped, {} zipped".format(
+        report["file_count"],
+        format_size(report["uncompressed_size"]),
+        format_size(report["compressed_size"]),
+    )
+    if previous is not None:
+        summary += ", {} unzipped since last build".format(
+            format_size(
+                report["uncompressed_size"] - previous["uncompressed_size"]
+            )
+        )
+    if report.get("import_time") is not None:
+        summary += ", handler import {:.3f}s".format(report["import_time"])
+    lines.append(summary)
+    return "\n".join(lines)
+
+
+def _format_value(key, value):
+    if key.endswith("_size"):
+        return format_size(value)
+    if key == "import_time":
+        return "{:.3f}s".format(value)
+    return str(value)
+
+
+def check_budgets(report, budgets, previous=None):
+    """Raise :class:`BudgetExceeded` if `report` is over any budget.
+
+    The error message lists every exceeded budget and, when a previous build
+    is known, the packages that grew the most since then.
+    """
+    exceeded = []
+    for key in BUDGET_KEYS:
+        limit = budgets.get(key)
+        value = report.get(key)
+        if limit is None or value is None or value <= limit:
+            continue
+        exceeded.append(
+            "{} is {} (budget {})".format(
+                key,
+                _format_value(key, value),
+                _format_value(key, limit),
+            )
+        )
+    if not exceeded:
+        return
+
+    message = ["Bundle exceeds its budget:"]
+    message.extend("  " + line for line in exceeded)
+    if previous is not None:
+        previous_packages = previous.get("packages", {})
+        growth = sorted(
+            (
+                package["size"]
+                - previous_packages.get(name, {}).get("size", 0),
+                name,
+            )
+            for name, package in report["packages"].items()
+        )
+        growth = [(delta, name) for delta, name in reversed(growth) if delta]
+        if growth:
+            message.append("Largest changes since the last build:")
+            message.extend(
+                "  {:<40} {}".format(name, format_size(delta))
+                for delta, name in growth[:10]
+            )
+    raise BudgetExceeded("\n".join(message))
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Shift an alias to a new version in steps, rolling back on regressions.
+
+With ``canary`` in the config, a deploy that moves an alias first routes a
+share of the alias' traffic to the new version (weighted alias routing),
+waits, and compares the ``Duration`` p95 and error rate the two versions
+reported to CloudWatch meanwhile. Each step of ``canary: steps`` repeats
+this with a larger share; when the new version's p95 is more than
+``max_p95_regression`` slower than the old one's, or its error rate is more
+than ``max_error_rate_increase`` higher, the alias goes back to the old
+version and the deploy fails. So does a step in which the new version got
+fewer than ``min_invocations`` invocations or reported no duration at all:
+no evidence is not a pass.
+
+CloudWatch delivers datapoints a while after the fact, so each step waits
+``metrics_delay`` more seconds after its ``interval`` before reading the
+metrics of that interval.
+"""
+import math
+import time
+from datetime import datetime
+from datetime import timezone
+
+NAMESPACE = "AWS/Lambda"
+
+
+class CanaryFailed(Exception):
+    pass
+
+
+def get_canary_settings(cfg):
+    """Read the ``canary`` settings; None when canary deploys are off."""
+    canary_cfg = cfg.get("canary")
+    if not canary_cfg:
+        return None
+    steps = canary_cfg.get("steps") or [10, 50]
+    if any(not 0 < float(step) < 100 for step in steps):
+        raise ValueError("canary steps are percentages between 0 and 100")
+    settings = {
+        "steps": sorted(float(step) for step in steps),
+        "interval": int(canary_cfg.get("interval", 300)),
+        "max_p95_regression": float(
+            canary_cfg.get("max_p95_regression", 0.2)
+        ),
+        "max_error_rate_increase": float(
+            canary_cfg.get("max_error_rate_increase", 0.01)
+        ),
+        "min_invocations": int(canary_cfg.get("min_invocations", 10)),
+        "metrics_delay": int(canary_cfg.get("metrics_delay", 120)),
+    }
+    if settings["min_invocations"] < 1:
+        raise ValueError("canary min_invocations must be at least 1")
+    return settings
+
+
+def route(client, function_name, alias, version, canary=None, weight=0):
+    """Point `alias` at `version`, sending `weight` percent to `canary`."""
+    weights = {canary: weight / 100.0} if canary and weight else {}
+    return client.update_alias(
+        FunctionName=function_name,
+        Name=alias,
+        FunctionVersion=version,
+        RoutingConfig={"AdditionalVersionWeights": weights},
+    )
+
+
+def _query(query_id, function_name, alias, version, metric, stat, period):
+    return {
+        "Id": query_id,
+        "MetricStat": {
+            "Metric": {
+                "Namespace": NAMESPACE,
+                "MetricName": metric,
+                "Dimensions": [
+                    {"Name": "FunctionName", "Value": function_name},
+                    {
+                        "Name": "Resource",
+                        "Value": "{}:{}".format(function_name, alias),
+                    },
+                    {"Name": "ExecutedVersion", "Value": version},
+                ],
+            },
+            "Period": period,
+            "Stat": stat,
+        },
+        "ReturnData": True,
+    }
+
+
+def get_version_metrics(
+    cloudwatch, function_name, alias, versions, start, end
+):
+    """Read p95 duration, errors and invocations per executed version.
+
+    :param float start:
+        The start of the window, in seconds since the epoch.
+    :returns:
+        ``{version: {"p95": ms or None, "errors": n, "invocations": n}}``.
+        The p95 is the highest of the window's periods.
+    """
+    # One period covering the whole window, in whole minutes.
+    period = max(60, int(math.ceil((end - start) / 60.0)) * 60)
+    queries = []
+    for index, version in enumerate(versions):
+        for metric, stat, name in (
+            ("Duration", "p95", "p95"),
+            ("Errors", "Sum", "errors"),
+            ("Invocations", "Sum", "invocations"),
+        ):
+            queries.append(
+                _query(
+                    "{}_{}".format(name, index),
+                    function_name,
+                    alias,
+                    version,
+                    metric,
+                    stat,
+                    period,
+                )
+            )
+
+    values = {}
+    kwargs = {
+        "MetricDataQueries": queries,
+        "StartTime": datetime.fromtimestamp(start, timezone.utc),
+        "EndTime": datetime.fromtimestamp(end, timezone.utc),
+    }
+    while True:
+        response = cloudwatch.get_metric_data(**kwargs)
+        for result in response.get("MetricDataResults", []):
+            values.setdefault(result["Id"], []).extend(result["Values"])
+        if not response.get("NextToken"):
+            break
+        kwargs["NextToken"] = response["NextToken"]
+
+    metrics = {}
+    for index, version in enumerate(versions):
+        p95 = values.get("p95_{}".format(index))
+        metrics[version] = {
+            "p95": max(p95) if p95 else None,
+            "errors": sum(values.get("errors_{}".format(index), [])),
+            "invocations": sum(
+                values.get("invocations_{}".format(index), [])
+            ),
+        }
+    return metrics
+
+
+def error_rate(metrics):
+    if not metrics["invocations"]:
+        return 0.0
+    return metrics["errors"] / float(metrics["invocations"])
+
+
+def compare(baseline, candidate, settings):
+    """Return why `candidate` regressed against `baseline`, or None."""
+    if candidate["invocations"] < settings["min_invocations"]:
+        return "only {} invocations of the new version (need {})".format(
+            int(candidate["invocations"]), settings["min_invocations"]
+        )
+    if candidate["p95"] is None:
+        return "no Duration datapoints for the new version yet"
+    if baseline["p95"]:
+        limit = baseline["p95"] * (1 + settings["max_p95_regression"])
+        if candidate["p95"] > limit:
+            return "p95 duration {:.1f}ms over {:.1f}ms (+{:.0%})".format(
+                candidate["p95"], limit, settings["max_p95_regression"],
+            )
+    increase = error_rate(candidate) - error_rate(baseline)
+    if increase > settings["max_error_rate_increase"]:
+        return "error rate {:.2%} vs {:.2%}".format(
+            error_rate(candidate), error_rate(baseline)
+        )
+    return None
+
+
+def format_step(weight, version, previous, metrics):
+    def describe(v):
+        m = metrics[v]
+        p95 = "-" if m["p95"] is None else "{:.1f}ms".format(m["p95"])
+        return "v{} p95 {} errors {}/{}".format(
+            v, p95, int(m["errors"]), int(m["invocations"])
+        )
+
+    return "Canary {:g}%: {} vs {}".format(
+        weight, describe(version), describe(previous)
+    )
+
+
+def run_canary(
+    client,
+    cloudwatch,
+    function_name,
+    alias,
+    previous,
+    version,
+    settings,
+    sleep=time.sleep,
+    clock=time.time,
+):
+    """Shift `alias` from `previous` to `version` in steps.
+
+    Leaves the alias routing `previous` with the last step's weight on
+    `version`; the caller moves it to `version` once this returns.
+
+    :returns:
+        The metrics of each step, as ``(weight, metrics)`` pairs.
+    :raises CanaryFailed:
+        When `version` regressed; the alias is back on `previous`.
+    """
+    steps = []
+    for weight in settings["steps"]:
+        route(client, function_name, alias, previous, version, weight)
+        started = clock()
+        sleep(settings["interval"] + settings["metrics_delay"])
+        metrics = get_version_metrics(
+            cloudwatch,
+            function_name,
+            alias,
+            [version, previous],
+            started,
+            started + settings["interval"],
+        )
+        steps.append((weight, metrics))
+        print(format_step(weight, version, previous, metrics))
+        reason = compare(metrics[previous], metrics[version], settings)
+        if reason is not None:
+            route(client, function_name, alias, previous)
+            raise CanaryFailed(
+                "Rolled {}:{} back to version {}: {}".format(
+                    function_name, alias, previous, reason
+                )
+            )
+    return steps
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""Work out which installed distributions a function needs at runtime.
+
+Starts from the dependencies the project declares (``pyproject.toml``,
+``setup.cfg`` or a requirements file) and follows the ``Requires-Dist``
+metadata of the distributions installed in the build environment, instead of
+shipping everything ``pip freeze`` lists.
+"""
+import configparser
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from importlib import metadata
+from tempfile import mkdtemp
+
+from .budget import format_size
+
+try:
+    from packaging.requirements import InvalidRequirement
+    from packaging.requirements import Requirement
+except ImportError:  # pragma: no cover
+    from pip._vendor.packaging.requirements import InvalidRequirement
+    from pip._vendor.packaging.requirements import Requirement
+
+CLOSURE_REQUIREMENTS_FILENAME = ".runtime-requirements.txt"
+
+# Shipped with the Lambda Python runtimes (boto3 and its dependencies).
+RUNTIME_PROVIDED = (
+    "boto3",
+    "botocore",
+    "s3transfer",
+    "jmespath",
+)
+
+# Never needed by a running function. ``setuptools`` isn't one of them: it
+# ships ``pkg_resources`` and is kept when something in the closure needs it.
+DEV_TOOLS = (
+    "python-lambda",
+    "pip",
+    "wheel",
+    "pytest",
+    "coverage",
+    "tox",
+    "nox",
+    "black",
+    "flake8",
+    "pylint",
+    "mypy",
+    "isort",
+    "pre-commit",
+    "twine",
+    "ipython",
+)
+
+# Never bundled by a ``pip freeze`` build either (``pip freeze`` leaves out
+# pip, setuptools, wheel and distribute; python-lambda is filtered out), so
+# leaving them out saves nothing.
+FREEZE_EXCLUDED = (
+    "pip",
+    "setuptools",
+    "wheel",
+    "distribute",
+    "python-lambda",
+)
+
+
+def get_closure_settings(cfg):
+    """Read the ``build: dependencies`` and ``runtime_provided`` settings."""
+    build_cfg = cfg.get("build") or {}
+    mode = build_cfg.get("dependencies") or "freeze"
+    if mode not in ("freeze", "closure"):
+        raise ValueError(
+            "build: dependencies must be freeze or closure, not {!r}".format(
+                mode
+            )
+        )
+    runtime_provided = build_cfg.get("runtime_provided")
+    if runtime_provided is None:
+        runtime_provided = RUNTIME_PROVIDED
+    elif isinstance(runtime_provided, str):
+        runtime_provided = [
+            name.strip()
+            for name in runtime_provided.split(",")
+            if name.strip()
+        ]
+    return {
+        "enabled": mode == "closure",
+        "runtime_provided": tuple(runtime_provided),
+    }
+
+
+def normalize(name):
+    """Canonical distribution name (PEP 503)."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _requirement_lines(text):
+    for line in text.splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def read_requirements(path, included=None):
+    """The requirements in a requirements file and the files it includes.
+
+    :param list included:
+        The files read so far; `path` and its includes are appended.
+    :raises ValueError:
+        On options other than ``-r``/``--requirement`` (``-e``, ``-c``,
+        ``--index-url``, ...). Distributions an editable install or another
+        index would bring in can't be found in the build environment, and
+        the pinned install would ignore them.
+    """
+    if included is None:
+        included = []
+    path = os.path.abspath(path)
+    if path in included:
+        return []
+    included.append(path)
+    with open(path) as fh:
+        text = fh.read()
+    requirements = []
+    for line in _requirement_lines(text):
+        if not line.startswith("-"):
+            requirements.append(line)
+            continue
+        include = re.match(r"^(?:-r|--requirement)[\s=]*(\S+)$", line)
+        if include is None:
+            raise ValueError(
+                "Unsupported line in {}: {!r}; `dependencies: closure` only "
+                "reads requirements and -r includes".format(path, line)
+            )
+        requirements.extend(
+            read_requirements(
+                os.path.join(os.path.dirname(path), include.group(1)),
+                included,
+            )
+        )
+    return requirements
+
+
+def read_pyproject(path):
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            return None
+    with open(path, "rb") as fh:
+        data = tomllib.load(fh)
+    return data.get("project", {}).get("dependencies")
+
+
+def read_setup_cfg(path):
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    if not parser.has_option("options", "install_requires"):
+        return None
+    return list(
+        _requirement_lines(parser.get("options", "install_requires"))
+    )
+
+
+# Where a project declares its dependencies, in order of precedence. Plain
+# requirements files have no reader; they're read with `read_requirements`.
+DECLARATIONS = (
+    ("pyproject.toml", read_pyproject),
+    ("setup.cfg", read_setup_cfg),
+    ("requirements.txt", None),
+)
+
+
+def declared_dependencies(src, requirements=None):
+    """Return ``(source, [requirement strings])`` for the project.
+
+    `requirements` (a requirements file) wins; otherwise the first of
+    ``pyproject.toml``, ``setup.cfg`` and ``requirements.txt`` in `src`
+    that declares dependencies is used. Requirements files are read with
+    :func:`read_requirements`.
+    """
+    if requirements:
+        return requirements, read_requirements(requirements)
+    for filename, reader in DECLARATIONS:
+        path = os.path.join(src, filename)
+        if not os.path.exists(path):
+            continue
+        if reader is None:
+            return path, read_requirements(path)
+        dependencies = reader(path)
+        if dependencies is not None:
+            return path, dependencies
+    return None, []
+
+
+def requirement_sources(src, requirements=None):
+    """Files :func:`declared_dependencies` reads, or would if they existed.
+
+    ``-r`` includes are listed too; a change to any of the files can change
+    the closure.
+    """
+    if requirements:
+        candidates = [(requirements, None)]
+    else:
+        candidates = [
+            (os.path.join(src, filename), reader)
+            for filename, reader in DECLARATIONS
+        ]
+    sources = []
+    for path, reader in candidates:
+        path = os.path.abspath(path)
+        if reader is not None or not os.path.exists(path):
+            sources.append(path)
+            continue
+        try:
+            read_requirements(path, sources)
+        except (OSError, ValueError):
+            # Resolving reports it; the files read so far are still listed.
+            pass
+    return sources
+
+
+def _dist_size(dist):
+    size = 0
+    for path in dist.files or ():
+        if path.size is not None:
+            size += path.size
+            continue
+        try:
+            size += os.path.getsize(dist.locate_file(path))
+        except OSError:
+            pass
+    return size
+
+
+def installed_distributions():
+    """The distributions of the build environment, by normalized name."""
+    distributions = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            distributions.setdefault(normalize(name), dist)
+    return distributions
+
+
+class DependencyClosure:
+    """The runtime dependencies of a project and what was left out.
+
+    :param list declared:
+        Requirement strings the project declares.
+    :param runtime_provided:
+        Distributions the Lambda runtime already has.
+    :param distributions:
+        Maps normalized names to installed distributions; defaults to the
+        build environment.
+    """
+
+    def __init__(
+        self, declared, runtime_provided=RUNTIME_PROVIDED, distributions=None,
+    ):
+        if distributions is None:
+            distributions = installed_distributions()
+        self.distributions = distributions
+        self.runtime_provided = set(normalize(n) for n in runtime_provided)
+        self.dev_tools = set(normalize(n) for n in DEV_TOOLS)
+        self.freeze_excluded = set(normalize(n) for n in FREEZE_EXCLUDED)
+        self.included = {}
+        self.missing = []
+        self._resolve(declared)
+
+    def _resolve(self, declared):
+        queue = []
+        for line in declared:
+            try:
+                queue.append((Requirement(line), ()))
+            except InvalidRequirement:
+                self.missing.append(line)
+        while queue:
+            requirement, extras = queue.pop(0)
+            if requirement.marker is not None and not any(
+                requirement.marker.evaluate({"extra": extra})
+                for extra in extras or ("",)
+            ):
+                continue
+            name = normalize(requirement.name)
+            if name in self.runtime_provided or name in self.dev_tools:
+                continue
+            dist = self.distributions.get(name)
+            if dist is None:
+                if str(requirement) not in self.missing:
+                    self.missing.append(str(requirement))
+                continue
+            new_extras = set(requirement.extras) - self.included.get(
+                name, set()
+            )
+            if name in self.included and not new_extras:
+                continue
+            self.included.setdefault(name, set()).update(requirement.extras)
+            for line in dist.requires or ():
+                queue.append((Requirement(line), tuple(requirement.extras)))
+
+    def pins(self):
+        """``name==version`` lines for everything in the closure.
+
+        Declared requirements that aren't installed in the build environment
+        are passed through unpinned.
+        """
+        lines = [
+            "{}=={}".format(
+                self.distributions[name].metadata["Name"],
+                self.distributions[name].version,
+            )
+            for name in sorted(self.included)
+        ]
+        return lines + self.missing
+
+    def dropped(self):
+        """Installed distributions a ``pip freeze`` build would have added.
+
+        :returns:
+            A list of ``(name, reason, size in bytes)``, largest first.
+        """
+        dropped = []
+        for name, dist in self.distributions.items():
+            if name in self.included or name in self.freeze_excluded:
+                continue
+            if name in self.runtime_provided:
+                reason = "provided by the runtime"
+            elif name in self.dev_tools:
+                reason = "development tool"
+            else:
+                reason = "not required"
+            dropped.append((dist.metadata["Name"], reason, _dist_size(dist)))
+        return sorted(dropped, key=lambda item: (-item[2], item[0]))
+
+    def included_size(self):
+        return sum(
+            _dist_size(self.distributions[name]) for name in self.included
+        )
+
+
+@contextmanager
+def runtime_provided_path(
+    runtime_provided=RUNTIME_PROVIDED, distributions=None
+):
+    """A directory with the build environment's copies of the runtime's own
+    packages, and nothing else, for ``sys.path`` after the bundle.
+
+    On Lambda, boto3 and its dependencies come from the runtime, not the
+    bundle, so an interpreter that only sees the bundle can't import them.
+    The distributions `runtime_provided` require are included too: the
+    runtime ships those as well.
+    """
+    if distributions is None:
+        distributions = installed_distributions()
+    closure = DependencyClosure(
+        runtime_provided, runtime_provided=(), distributions=distributions
+    )
+    path = mkdtemp(prefix="aws-lambda-runtime")
+    try:
+        for name in sorted(closure.included):
+            dist = distributions[name]
+            for top_level in sorted(
+                set(f.parts[0] for f in dist.files or ())
+                - {"..", "__pycache__"}
+            ):
+                link = os.path.join(path, top_level)
+                if not os.path.lexists(link):
+                    os.symlink(str(dist.locate_file(top_level)), link)
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def format_closure(closure, source, limit=10):
+    """Summarize a closure: what's shipped, what was dropped and why."""
+    dropped = closure.dropped()
+    saved = sum(size for _, _, size in dropped)
+    lines = [
+        "Runtime dependencies from {}: {} packages ({})".format(
+            source or "nothing declared",
+            len(closure.included),
+            format_size(closure.included_size()),
+        ),
+        "Dropped {} installed packages ({} saved)".format(
+            len(dropped), format_size(saved)
+        ),
+    ]
+    for name, reason, size in dropped[:limit]:
+        lines.append(
+            "  {:<30} {:>10}  {}".format(name, format_size(size), reason)
+        )
+    if len(dropped) > limit:
+        lines.append("  ... and {} more".format(len(dropped) - limit))
+    for requirement in closure.missing:
+        lines.append(
+            "Not installed locally, installing unpinned: {}".format(
+                requirement
+            )
+        )
+    return "\n".join(lines)
@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
 import datetime as dt
+import math
 import os
 import re
+import shutil
+import signal
+import stat
+import threading
 import time
 import zipfile
+from contextlib import contextmanager
+
+# Fixed timestamp for archive members so unchanged files produce a
+# byte-identical archive.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
 
 
 def mkdir(path):
@@ -20,14 +30,35 @@ def read(path, loader=None, binary_file=False):
 
 
 def archive(src, dest, filename):
+    """Zip `src` so the same files always produce a byte-identical bundle.
+
+    Entries are written in sorted order with a fixed timestamp and
+    normalized permissions (see :func:`add_to_archive`).
+    """
     output = os.path.join(dest, filename)
-    zfh = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zfh:
+        for root, dirs, files in os.walk(src):
+            dirs.sort()
+            for file in sorted(files):
+                path = os.path.join(root, file)
+                add_to_archive(zfh, path, os.path.relpath(path, src))
+    return output
+
 
-    for root, _, files in os.walk(src):
-        for file in files:
-            zfh.write(os.path.join(root, file))
-    zfh.close()
-    return os.path.join(dest, filename)
+def add_to_archive(zfh, path, arcname):
+    """Write the file at `path` without its mtime, owner or exact mode.
+
+    Only the executable bit survives: members are ``0755`` or ``0644``.
+    """
+    info = zipfile.ZipInfo(
+        arcname.replace(os.sep, "/"), date_time=ZIP_DATE_TIME
+    )
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.file_size = os.path.getsize(path)
+    mode = 0o755 if os.stat(path).st_mode & 0o111 else 0o644
+    info.external_attr = (stat.S_IFREG | mode) << 16
+    with open(path, "rb") as src, zfh.open(info, "w") as dest:
+        shutil.copyfileobj(src, dest, 1024 * 8)
 
 
 def timestamp(fmt="%Y-%m-%d-%H%M%S"):
@@ -35,6 +66,15 @@ def timestamp(fmt="%Y-%m-%d-%H%M%S"):
     return now.strftime(fmt)
 
 
+def percentile(values, pct):
+    """Return the `pct` percentile of `values` (nearest-rank method)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
 def get_environment_variable_value(val):
     env_val = val
     if val is not None and isinstance(val, str):
@@ -44,6 +84,16 @@ def get_environment_variable_value(val):
     return env_val
 
 
+def get_function_name(cfg):
+    """The function name, which ``LAMBDA_FUNCTION_NAME`` overrides."""
+    return os.environ.get("LAMBDA_FUNCTION_NAME") or cfg.get("function_name")
+
+
+def get_bucket_name(cfg):
+    """The artifact bucket, which ``S3_BUCKET_NAME`` overrides."""
+    return os.environ.get("S3_BUCKET_NAME") or cfg.get("bucket_name")
+
+
 class LambdaContext:
     def current_milli_time(x):
         return int(round(time.time() * 1000))
@@ -67,3 +117,36 @@ class LambdaContext:
         self.client_context = None
         self.timeout_millis = timeoutSeconds * 1000
         self.start_time_millis = self.current_milli_time()
+
+
+class LambdaTimeoutError(Exception):
+    """Raised when a local invocation runs past the function's timeout."""
+
+
+@contextmanager
+def enforce_timeout(seconds):
+    """Interrupt the block after `seconds`, like Lambda stops a function.
+
+    Relies on ``SIGALRM``, so it's only enforced in the main thread of a
+    POSIX process; elsewhere the block runs without a limit.
+    """
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise LambdaTimeoutError(
+            "Task timed out after {:.2f} seconds".format(seconds)
+        )
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""Write the bundle as an OCI image layout, without a container daemon.
+
+The image adds two layers on top of the Lambda Python base image: the
+installed dependencies, then the project sources, both under
+``/var/task``. Code-only changes therefore produce one small new layer, and
+since the layers are written reproducibly (sorted entries, fixed timestamps
+and ownership, normalized modes, gzip without a timestamp) an unchanged
+layer keeps its digest and registries don't receive it again.
+
+The base image is only referenced by name unless ``build: image_base_layout``
+points at a local OCI layout of it (e.g. made with ``skopeo copy
+docker://public.ecr.aws/lambda/python:3.12 oci:base``); its layers and
+config are then merged in and the result is a complete image.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+from tempfile import mkstemp
+
+from .budget import format_size
+
+OCI_LAYOUT_VERSION = "1.0.0"
+MANIFEST_MEDIA_TYPE = "application/vnd.oci.image.manifest.v1+json"
+INDEX_MEDIA_TYPE = "application/vnd.oci.image.index.v1+json"
+DOCKER_LIST_MEDIA_TYPE = (
+    "application/vnd.docker.distribution.manifest.list.v2+json"
+)
+CONFIG_MEDIA_TYPE = "application/vnd.oci.image.config.v1+json"
+LAYER_MEDIA_TYPE = "application/vnd.oci.image.layer.v1.tar+gzip"
+
+BASE_NAME_ANNOTATION = "org.opencontainers.image.base.name"
+REF_NAME_ANNOTATION = "org.opencontainers.image.ref.name"
+
+TASK_ROOT = "var/task"
+ENTRYPOINT = ["/lambda-entrypoint.sh"]
+# The image config's ``created`` is fixed so identical layers produce an
+# identical manifest.
+CREATED = "1970-01-01T00:00:00Z"
+ARCHITECTURES = {"x86_64": "amd64", "arm64": "arm64"}
+
+
+def get_image_settings(cfg):
+    """Read the ``build: image_*`` settings."""
+    build_cfg = cfg.get("build") or {}
+    runtime = cfg.get("runtime") or "python3.8"
+    default_base = "public.ecr.aws/lambda/python:{}".format(
+        runtime.replace("python", "", 1)
+    )
+    architecture = cfg.get("architecture") or "x86_64"
+    return {
+        "base": build_cfg.get("image_base") or default_base,
+        "base_layout": build_cfg.get("image_base_layout"),
+        "tag": build_cfg.get("image_tag") or "latest",
+        "architecture": ARCHITECTURES.get(architecture, architecture),
+    }
+
+
+def _digest(data):
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def _tar_info(arcname, mode, size=0, directory=False):
+    info = tarfile.TarInfo(arcname)
+    info.type = tarfile.DIRTYPE if directory else tarfile.REGTYPE
+    info.mode = mode
+    info.size = size
+    info.mtime = 0
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def _skip(source, arcname):
+    """Whether to leave `source` out of a layer.
+
+    Hash-based bytecode (what ``_install_packages`` compiles) is kept, so
+    the image starts as fast as the zip bundle; timestamp-based bytecode
+    embeds build-time mtimes and would change the layer on every build.
+    """
+    if not arcname.endswith(".pyc"):
+        return False
+    with open(source, "rb") as fh:
+        header = fh.read(8)
+    # PEP 552: bit 0 of the flags after the magic number marks hash-based.
+    return not int.from_bytes(header[4:8], "little") & 1
+
+
+class _HashingWriter:
+    """A write-only file object that hashes what passes through it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def digest(self):
+        return "sha256:" + self.sha256.hexdigest()
+
+
+def make_layer(files, fileobj):
+    """Write a reproducible gzipped tar layer to `fileobj`.
+
+    The layer is streamed, one file at a time, so memory use doesn't grow
+    with the size of the dependencies.
+
+    :param files:
+        ``(source path, path in the image)`` pairs; parent directories are
+        added as needed. Timestamp-based bytecode is left out.
+    :returns:
+        The layer's ``(digest, diff_id, size)``.
+    """
+    entries = {}
+    for source, arcname in files:
+        arcname = arcname.strip("/")
+        if _skip(source, arcname):
+            continue
+        entries[arcname] = source
+        parent = os.path.dirname(arcname)
+        while parent and parent not in entries:
+            entries[parent] = None
+            parent = os.path.dirname(parent)
+
+    blob = _HashingWriter(fileobj)
+    with gzip.GzipFile(
+        filename="", mode="wb", fileobj=blob, compresslevel=6, mtime=0
+    ) as gz:
+        tar_data = _HashingWriter(gz)
+        with tarfile.open(
+            fileobj=tar_data, mode="w|", format=tarfile.PAX_FORMAT
+        ) as tar:
+            for arcname in sorted(entries):
+                source = entries[arcname]
+                if source is None:
+                    tar.addfile(_tar_info(arcname, 0o755, directory=True))
+                    continue
+                mode = 0o755 if os.access(source, os.X_OK) else 0o644
+                with open(source, "rb") as fh:
+                    size = os.fstat(fh.fileno()).st_size
+                    tar.addfile(_tar_info(arcname, mode, size), fh)
+    return blob.digest(), tar_data.digest(), blob.size
+
+
+def walk_tree(path, prefix):
+    """``(source path, path in the image)`` for every file below `path`."""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            relpath = os.path.relpath(full_path, path).replace(os.sep, "/")
+            yield full_path, "{}/{}".format(prefix, relpath)
+
+
+class ImageLayout:
+    """An OCI image layout directory whose blobs are reused across builds."""
+
+    def __init__(self, path):
+        self.path = path
+        self.blobs = os.path.join(path, "blobs", "sha256")
+
+    def blob_path(self, digest):
+        return os.path.join(self.blobs, digest.split(":", 1)[1])
+
+    def has_blob(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def write_blob(self, data):
+        """Store `data`; returns ``(digest, whether it was new)``."""
+        digest = _digest(data)
+        if self.has_blob(digest):
+            return digest, False
+        os.makedirs(self.blobs, exist_ok=True)
+        tmp_path = self.blob_path(digest) + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, self.blob_path(digest))
+        return digest, True
+
+    def write_layer(self, files):
+        """Store a layer made from `files` (see :func:`make_layer`).
+
+        :returns:
+            ``(digest, diff_id, size, whether it was new)``.
+        """
+        os.makedirs(self.blobs, exist_ok=True)
+        fd, tmp_path = mkstemp(dir=self.blobs, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                digest, diff_id, size = make_layer(files, fh)
+            new = not self.has_blob(digest)
+            if new:
+                os.replace(tmp_path, self.blob_path(digest))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest, diff_id, size, new
+
+    def copy_blob(self, other, digest):
+        if self.has_blob(digest):
+            return
+        os.makedirs(self.blobs, exist_ok=True)
+        try:
+            os.link(other.blob_path(digest), self.blob_path(digest))
+        except OSError:
+            shutil.copyfile(other.blob_path(digest), self.blob_path(digest))
+
+    def read_json(self, digest):
+        with open(self.blob_path(digest), "rb") as fh:
+            return json.loads(fh.read().decode("utf-8"))
+
+    def index(self):
+        with open(os.path.join(self.path, "index.json")) as fh:
+            return json.load(fh)
+
+    def write_index(self, manifest_descriptor):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "oci-layout"), "w") as fh:
+            json.dump({"imageLayoutVersion": OCI_LAYOUT_VERSION}, fh)
+        index = {
+            "schemaVersion": 2,
+            "mediaType": INDEX_MEDIA_TYPE,
+            "manifests": [manifest_descriptor],
+        }
+        with open(os.path.join(self.path, "index.json"), "wb") as fh:
+            fh.write(_canonical_json(index))
+
+    def collect_garbage(self, keep):
+        """Delete blobs that aren't in `keep`; returns the bytes freed."""
+        freed = 0
+        if not os.path.isdir(self.blobs):
+            return freed
+        keep = set(digest.split(":", 1)[1] for digest in keep)
+        for filename in os.listdir(self.blobs):
+            if filename not in keep:
+                path = os.path.join(self.blobs, filename)
+                freed += os.path.getsize(path)
+                os.remove(path)
+        return freed
+
+
+def _canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def load_base(path, architecture):
+    """Return ``(layout, manifest, config)`` of a local base image layout.
+
+    Multi-platform indexes are narrowed down to `architecture` on Linux.
+    """
+    layout = ImageLayout(path)
+    descriptor = layout.index()["manifests"][0]
+    index_types = (INDEX_MEDIA_TYPE, DOCKER_LIST_MEDIA_TYPE)
+    while descriptor.get("mediaType") in index_types:
+        candidates = layout.read_json(descriptor["digest"])["manifests"]
+        matching = [
+            m
+            for m in candidates
+            if m.get("platform", {}).get("architecture") == architecture
+            and m.get("platform", {}).get("os", "linux") == "linux"
+        ]
+        if not matching:
+            raise ValueError(
+                "The base image at {} has no linux/{} manifest".format(
+                    path, architecture
+                )
+            )
+        descriptor = matching[0]
+    manifest = layout.read_json(descriptor["digest"])
+    config = layout.read_json(manifest["config"]["digest"])
+    return layout, manifest, config
+
+
+def default_config(architecture):
+    """An image config matching the Lambda base images' defaults."""
+    return {
+        "architecture": architecture,
+        "os": "linux",
+        "config": {
+            "Env": [
+                "LANG=en_US.UTF-8",
+                "TZ=:/etc/localtime",
+                "PATH=/var/lang/bin:/usr/local/bin:/usr/bin/:/bin:/opt/bin",
+                "LD_LIBRARY_PATH=/var/lang/lib:/lib64:/usr/lib64:/var/runtime"
+                ":/var/runtime/lib:/var/task:/var/task/lib:/opt/lib",
+                "LAMBDA_TASK_ROOT=/var/task",
+                "LAMBDA_RUNTIME_DIR=/var/runtime",
+            ],
+            "Entrypoint": ENTRYPOINT,
+            "WorkingDir": "/" + TASK_ROOT,
+        },
+        "rootfs": {"type": "layers", "diff_ids": []},
+        "history": [],
+    }
+
+
+def build_image(path, dependencies_dir, source_files, handler, settings):
+    """Write the image to the OCI layout at `path`.
+
+    :param str dependencies_dir:
+        Where the dependencies were installed.
+    :param list source_files:
+        ``(source path, relative path)`` pairs of the project sources.
+    :param str handler:
+        The function handler, the image's ``CMD``.
+    :param dict settings:
+        From :func:`get_image_settings`.
+    :returns:
+        A dict with the manifest ``digest`` and, per layer, its ``name``,
+        ``digest``, ``size`` and whether it's ``new``.
+    """
+    layout = ImageLayout(path)
+    if settings["base_layout"]:
+        base_layout, base_manifest, config = load_base(
+            settings["base_layout"], settings["architecture"]
+        )
+        layers = list(base_manifest["layers"])
+        for descriptor in layers + [base_manifest["config"]]:
+            layout.copy_blob(base_layout, descriptor["digest"])
+    else:
+        config = default_config(settings["architecture"])
+        layers = []
+
+    config = dict(config, created=CREATED)
+    config["config"] = dict(config.get("config") or {}, Cmd=[handler])
+    config["rootfs"] = dict(config["rootfs"])
+    config["rootfs"]["diff_ids"] = list(config["rootfs"]["diff_ids"])
+    config["history"] = list(config.get("history") or [])
+
+    new_layers = (
+        ("dependencies", walk_tree(dependencies_dir, TASK_ROOT)),
+        (
+            "code",
+            (
+                (source, "{}/{}".format(TASK_ROOT, relpath))
+                for source, relpath in source_files
+            ),
+        ),
+    )
+    result_layers = []
+    for name, files in new_layers:
+        digest, diff_id, size, new = layout.write_layer(files)
+        layers.append(
+            {"mediaType": LAYER_MEDIA_TYPE, "digest": digest, "size": size}
+        )
+        config["rootfs"]["diff_ids"].append(diff_id)
+        config["history"].append(
+            {"created": CREATED, "created_by": "python-lambda: " + name}
+        )
+        result_layers.append(
+            {"name": name, "digest": digest, "size": size, "new": new}
+        )
+
+    config_blob = _canonical_json(config)
+    config_digest, _ = layout.write_blob(config_blob)
+    manifest = {
+        "schemaVersion": 2,
+        "mediaType": MANIFEST_MEDIA_TYPE,
+        "config": {
+            "mediaType": CONFIG_MEDIA_TYPE,
+            "digest": config_digest,
+            "size": len(config_blob),
+        },
+        "layers": layers,
+        "annotations": {BASE_NAME_ANNOTATION: settings["base"]},
+    }
+    manifest_blob = _canonical_json(manifest)
+    manifest_digest, _ = layout.write_blob(manifest_blob)
+    layout.write_index(
+        {
+            "mediaType": MANIFEST_MEDIA_TYPE,
+            "digest": manifest_digest,
+            "size": len(manifest_blob),
+            "platform": {
+                "architecture": settings["architecture"],
+                "os": "linux",
+            },
+            "annotations": {REF_NAME_ANNOTATION: settings["tag"]},
+        }
+    )
+    layout.collect_garbage(
+        [manifest_digest, config_digest] + [d["digest"] for d in layers]
+    )
+    return {
+        "digest": manifest_digest,
+        "base": settings["base"],
+        "complete": bool(settings["base_layout"]),
+        "layers": result_layers,
+    }
+
+
+def format_image(path, result):
+    lines = ["Image {} at {}".format(result["digest"], path)]
+    for layer in result["layers"]:
+        lines.append(
+            "  {:<14} {}  {:>10}  {}".format(
+                layer["name"],
+                layer["digest"][:19],
+                format_size(layer["size"]),
+                "new" if layer["new"] else "unchanged",
+            )
+        )
+    if not result["complete"]:
+        lines.append(
+            "  on top of {} (not included, see build: image_base_layout)"
+            "".format(result["base"])
+        )
+    return "\n".join(lines)
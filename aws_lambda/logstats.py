@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""Aggregate the ``REPORT`` lines of a deployed function's CloudWatch Logs.
+
+Log events are read page by page and folded into per-version counters and
+bounded histograms (:class:`~aws_lambda.reports.Histogram`), so memory doesn't
+grow with the number of events in the window. The version comes from the
+log stream name (``2024/05/01/[7]0123abcd...``); ``Task timed out`` lines
+count as timeouts along with reports that have ``Status: timeout``.
+"""
+import re
+import time
+
+from .helpers import get_function_name
+from .reports import Histogram
+from .reports import parse_report
+
+FILTER_PATTERN = '?"REPORT RequestId" ?"Task timed out"'
+STREAM_VERSION_PATTERN = re.compile(r"\[(?P<version>[^\]]+)\]")
+TIMED_OUT_PATTERN = re.compile(
+    r"(?P<request_id>[0-9a-f-]{36}) Task timed out"
+)
+WINDOW_PATTERN = re.compile(r"^(?P<amount>\d+)(?P<unit>[smhd])$")
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(value):
+    """Turn ``30m``, ``6h`` or ``2d`` into seconds."""
+    match = WINDOW_PATTERN.match(str(value).strip())
+    if match is None:
+        raise ValueError(
+            "Expected a time window like 30m, 6h or 2d, got {!r}".format(
+                value
+            )
+        )
+    return int(match.group("amount")) * WINDOW_UNITS[match.group("unit")]
+
+
+def get_log_group(cfg):
+    return "/aws/lambda/{}".format(get_function_name(cfg))
+
+
+def stream_version(log_stream_name):
+    match = STREAM_VERSION_PATTERN.search(log_stream_name or "")
+    return match.group("version") if match else "unknown"
+
+
+def iter_log_events(client, log_group, start, end, page_size=None):
+    """Yield the matching log events of `log_group`, one page at a time.
+
+    :param float start:
+        The start of the window, in seconds since the epoch.
+    """
+    kwargs = {
+        "logGroupName": log_group,
+        "startTime": int(start * 1000),
+        "endTime": int(end * 1000),
+        "filterPattern": FILTER_PATTERN,
+    }
+    if page_size:
+        kwargs["PaginationConfig"] = {"PageSize": page_size}
+    for page in client.get_paginator("filter_log_events").paginate(**kwargs):
+        for event in page.get("events", []):
+            yield event
+
+
+class VersionStats:
+    """Counters and histograms for the invocations of one version."""
+
+    def __init__(self):
+        self.invocations = 0
+        self.cold_starts = 0
+        self.timed_out = set()
+        self.memory_size = None
+        self.durations = Histogram()
+        self.billed_durations = Histogram()
+        self.init_durations = Histogram()
+        self.max_memory_used = Histogram()
+
+    def add_report(self, report):
+        self.invocations += 1
+        self.durations.add(report.get("duration"))
+        self.billed_durations.add(report.get("billed_duration"))
+        self.max_memory_used.add(report.get("max_memory_used"))
+        if report.get("memory_size"):
+            self.memory_size = report["memory_size"]
+        if report["init_duration"] is not None:
+            self.cold_starts += 1
+            self.init_durations.add(report["init_duration"])
+        if report["status"] == "timeout":
+            self.timed_out.add(report["request_id"])
+
+    def update(self, other):
+        """Add the counts of `other`, e.g. to total all versions."""
+        self.invocations += other.invocations
+        self.cold_starts += other.cold_starts
+        self.timed_out |= other.timed_out
+        self.memory_size = self.memory_size or other.memory_size
+        self.durations.update(other.durations)
+        self.billed_durations.update(other.billed_durations)
+        self.init_durations.update(other.init_durations)
+        self.max_memory_used.update(other.max_memory_used)
+
+    def as_dict(self):
+        invocations = self.invocations
+        max_memory_used = self.max_memory_used.summary()
+        result = {
+            "invocations": invocations,
+            "cold_starts": self.cold_starts,
+            "cold_start_rate": (
+                self.cold_starts / float(invocations) if invocations else None
+            ),
+            "timeouts": len(self.timed_out),
+            "memory_size": self.memory_size,
+            "duration": self.durations.summary(),
+            "billed_duration": self.billed_durations.summary(),
+            "init_duration": self.init_durations.summary(),
+            "max_memory_used": max_memory_used,
+            "memory_utilization": None,
+        }
+        if self.memory_size and max_memory_used["count"]:
+            result["memory_utilization"] = (
+                max_memory_used["max"] / self.memory_size
+            )
+        return result
+
+
+def aggregate_events(events):
+    """Fold log events into :class:`VersionStats` keyed by version."""
+    versions = {}
+    for event in events:
+        version = stream_version(event.get("logStreamName"))
+        stats = versions.get(version)
+        if stats is None:
+            stats = versions[version] = VersionStats()
+        message = event.get("message", "")
+        report = parse_report(message)
+        if report is not None:
+            stats.add_report(report)
+            continue
+        timed_out = TIMED_OUT_PATTERN.search(message)
+        if timed_out is not None:
+            stats.timed_out.add(timed_out.group("request_id"))
+    return versions
+
+
+def _version_key(version):
+    return (not version.isdigit(), int(version) if version.isdigit() else 0)
+
+
+def collect_stats(
+    client, cfg, window="1h", until=None, page_size=None, clock=time.time
+):
+    """Read and aggregate the function's reports for the last `window`.
+
+    :returns:
+        A JSON serializable dict with the window, the configured memory and
+        timeout, and the stats of each version (and ``all`` of them).
+    """
+    end = clock() if until is None else until
+    start = end - parse_window(window)
+    log_group = get_log_group(cfg)
+    versions = aggregate_events(
+        iter_log_events(client, log_group, start, end, page_size)
+    )
+    total = VersionStats()
+    for stats in versions.values():
+        total.update(stats)
+    return {
+        "log_group": log_group,
+        "start": start,
+        "end": end,
+        "memory_size": cfg.get("memory_size"),
+        "timeout": cfg.get("timeout"),
+        "versions": {
+            version: versions[version].as_dict()
+            for version in sorted(versions, key=_version_key)
+        },
+        "all": total.as_dict(),
+    }
+
+
+def _ms(value):
+    return "-" if value is None else "{:.1f}".format(value)
+
+
+def _pct(value):
+    return "-" if value is None else "{:.1%}".format(value)
+
+
+def format_stats(result):
+    """Render :func:`collect_stats` output as a table with config hints."""
+    columns = "{:<10}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}{:>9}"
+    lines = [
+        "{} over {:.0f} minutes".format(
+            result["log_group"], (result["end"] - result["start"]) / 60.0
+        ),
+        columns.format(
+            "version",
+            "invoc.",
+            "cold",
+            "init p50",
+            "p50",
+            "p95",
+            "p99",
+            "max",
+            "memory",
+            "timeouts",
+        ),
+    ]
+    rows = list(result["versions"].items())
+    if len(rows) > 1:
+        rows.append(("all", result["all"]))
+    for version, stats in rows:
+        lines.append(
+            columns.format(
+                version,
+                stats["invocations"],
+                _pct(stats["cold_start_rate"]),
+                _ms(stats["init_duration"].get("p50")),
+                _ms(stats["duration"].get("p50")),
+                _ms(stats["duration"].get("p95")),
+                _ms(stats["duration"].get("p99")),
+                _ms(stats["duration"].get("max")),
+                _pct(stats["memory_utilization"]),
+                stats["timeouts"],
+            )
+        )
+    total = result["all"]
+    if not total["invocations"]:
+        lines.append("No REPORT lines in this window.")
+        return "\n".join(lines)
+
+    memory_size = result["memory_size"] or total["memory_size"]
+    if memory_size and total["max_memory_used"]["count"]:
+        lines.append(
+            "memory_size {}MB: peak use {:.0f}MB, p99 {:.0f}MB".format(
+                memory_size,
+                total["max_memory_used"]["max"],
+                total["max_memory_used"]["p99"],
+            )
+        )
+    if result["timeout"]:
+        lines.append(
+            "timeout {}s: p99 duration {:.2f}s, max {:.2f}s, {} timeouts"
+            "".format(
+                result["timeout"],
+                total["duration"]["p99"] / 1000.0,
+                total["duration"]["max"] / 1000.0,
+                total["timeouts"],
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Pack pure-Python dependencies into an archive loaded with ``zipimport``.
+
+The bundle keeps the handler, the project sources, native extensions and
+dependency metadata unpacked; every other dependency goes into a single
+deflated archive at the root of the bundle. A generated bootstrap module puts
+the archive on ``sys.path`` right after the bundle directory and re-exports
+the handler, so the deployed handler becomes ``lambda_bootstrap.<function>``.
+
+``zipimport`` never writes bytecode, so the archive carries a ``.pyc`` next
+to each ``.py`` (the legacy layout ``zipimport`` looks for), compiled by the
+interpreter running the build. When that interpreter doesn't match the
+function's runtime, ``zipimport`` falls back to compiling the source.
+"""
+import importlib.util
+import marshal
+import os
+import shutil
+import struct
+import zipfile
+
+from .budget import format_size
+from .helpers import ZIP_DATE_TIME
+
+BOOTSTRAP_MODULE = "lambda_bootstrap"
+DEPENDENCIES_ARCHIVE = "_dependencies.zip"
+
+# Files a package may contain and still be imported from an archive. Anything
+# else (data files, shared libraries) is usually opened through the file
+# system relative to ``__file__``, which doesn't work inside a zip.
+SOURCE_EXTENSIONS = (".py", ".pyi", ".pyc")
+SOURCE_FILENAMES = ("py.typed",)
+NATIVE_EXTENSIONS = (".so", ".pyd", ".dll", ".dylib")
+METADATA_SUFFIXES = (".dist-info", ".egg-info", ".data")
+
+BOOTSTRAP_TEMPLATE = '''\
+# Generated by python-lambda. Puts the dependency archive on sys.path and
+# exposes the handler.
+import os
+import sys
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_archive = os.path.join(_here, {archive!r})
+if _archive not in sys.path:
+    sys.path.insert(
+        sys.path.index(_here) + 1 if _here in sys.path else 0, _archive
+    )
+
+from {module} import {function}  # noqa: E402,F401
+'''
+
+
+def get_zipimport_settings(cfg):
+    """Read the ``build: zipimport_*`` settings."""
+    build_cfg = cfg.get("build") or {}
+    exclude = build_cfg.get("zipimport_exclude") or []
+    if isinstance(exclude, str):
+        exclude = [e.strip() for e in exclude.split(",") if e.strip()]
+    return {
+        "enabled": bool(build_cfg.get("zipimport_dependencies")),
+        "exclude": set(exclude),
+    }
+
+
+def get_deployed_handler(cfg):
+    """The handler Lambda should call, accounting for the bootstrap shim."""
+    handler = cfg.get("handler")
+    if not get_zipimport_settings(cfg)["enabled"]:
+        return handler
+    _, function = handler.split(".")
+    return "{}.{}".format(BOOTSTRAP_MODULE, function)
+
+
+def _walk(path):
+    """Yield the files below `path` relative to it, in a stable order."""
+    if os.path.isfile(path):
+        yield os.path.basename(path), path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            yield os.path.relpath(full_path, os.path.dirname(path)), full_path
+
+
+def classify(path, name):
+    """Tell whether the top-level entry `name` can be imported from a zip.
+
+    :returns:
+        None when it can, otherwise the reason it has to stay unpacked.
+    """
+    if name.endswith(METADATA_SUFFIXES) or name == "__pycache__":
+        return "metadata"
+    if name.startswith(".") or name == "bin":
+        return "not importable"
+    for relpath, _ in _walk(os.path.join(path, name)):
+        if "__pycache__" in relpath.split(os.sep):
+            continue
+        filename = os.path.basename(relpath)
+        if filename.endswith(NATIVE_EXTENSIONS):
+            return "native extension"
+        if not (
+            filename.endswith(SOURCE_EXTENSIONS)
+            or filename in SOURCE_FILENAMES
+        ):
+            return "data files"
+    return None
+
+
+def tree_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, files in os.walk(path)
+        for filename in files
+    )
+
+
+def _compile(source, relpath):
+    """Compile to an unchecked hash-based pyc (PEP 552).
+
+    Timestamp-based pycs would be checked against the archive member's DOS
+    timestamp, which ``zipimport`` interprets in the local time zone.
+    """
+    code = compile(source, relpath, "exec", dont_inherit=True)
+    return b"".join(
+        [
+            importlib.util.MAGIC_NUMBER,
+            struct.pack("<I", 0b01),
+            importlib.util.source_hash(source),
+            marshal.dumps(code),
+        ]
+    )
+
+
+def pack_dependencies(path, names, handler, exclude=()):
+    """Move the zip-safe entries `names` of `path` into the archive.
+
+    :param str path:
+        The build directory.
+    :param list names:
+        The top-level entries installed as dependencies.
+    :param str handler:
+        The configured handler (``module.function``).
+    :param exclude:
+        Top-level names to keep unpacked regardless.
+    :returns:
+        A dict with the ``packed`` names, the ``unpacked`` ones mapped to
+        the reason, and the number of ``files`` in the archive.
+    """
+    packed = []
+    unpacked = {}
+    for name in sorted(names):
+        reason = "excluded" if name in exclude else classify(path, name)
+        if reason is None:
+            packed.append(name)
+        elif reason != "metadata":
+            unpacked[name] = reason
+
+    files = 0
+    archive_path = os.path.join(path, DEPENDENCIES_ARCHIVE)
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zfh:
+        for name in packed:
+            for relpath, full_path in _walk(os.path.join(path, name)):
+                parts = relpath.split(os.sep)
+                if "__pycache__" in parts or relpath.endswith(".pyc"):
+                    continue
+                arcname = "/".join(parts)
+                with open(full_path, "rb") as fh:
+                    data = fh.read()
+                _write(zfh, arcname, data)
+                files += 1
+                if arcname.endswith(".py"):
+                    try:
+                        bytecode = _compile(data, arcname)
+                    except (SyntaxError, ValueError):
+                        continue
+                    _write(zfh, arcname + "c", bytecode)
+                    files += 1
+            _remove(os.path.join(path, name))
+            if name.endswith(".py"):
+                _remove_bytecode(path, name[:-3])
+
+    module, function = handler.split(".")
+    with open(os.path.join(path, BOOTSTRAP_MODULE + ".py"), "w") as fh:
+        fh.write(
+            BOOTSTRAP_TEMPLATE.format(
+                archive=DEPENDENCIES_ARCHIVE, module=module, function=function,
+            )
+        )
+    return {"packed": packed, "unpacked": unpacked, "files": files}
+
+
+def _write(zfh, arcname, data):
+    info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    zfh.writestr(info, data)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def _remove_bytecode(path, module):
+    """Drop the cached bytecode of a top-level module that was packed."""
+    cache = os.path.join(path, "__pycache__")
+    if not os.path.isdir(cache):
+        return
+    for filename in os.listdir(cache):
+        if filename.split(".", 1)[0] == module:
+            os.remove(os.path.join(cache, filename))
+    if not os.listdir(cache):
+        os.rmdir(cache)
+
+
+def format_comparison(result):
+    """Describe what packing saved, for the build report."""
+    lines = [
+        "zipimport: {} files from {} packages in {}".format(
+            result["files"], len(result["packed"]), DEPENDENCIES_ARCHIVE,
+        ),
+        "  unzipped footprint: {} -> {}".format(
+            format_size(result["size_before"]),
+            format_size(result["size_after"]),
+        ),
+    ]
+    if result.get("import_time_before") is not None:
+        lines.append(
+            "  handler import time: {:.3f}s -> {:.3f}s".format(
+                result["import_time_before"], result["import_time_after"],
+            )
+        )
+    for name, reason in sorted(result["unpacked"].items()):
+        lines.append("  left unpacked: {} ({})".format(name, reason))
+    return "\n".join(lines)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Move an alias to a newly published version without a cold-start spike.
+
+After a deploy publishes a version, the steps are: optionally prewarm the
+version with concurrent invocations and, when the config asks for
+provisioned concurrency, provision environments on the version and wait
+until they are ``READY``. Only then is the alias pointed at the version, so
+its traffic never lands on cold environments; the provisioned concurrency
+of the version the alias left is removed afterwards.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .benchmark import invoke_remote
+from .canary import CanaryFailed
+from .canary import get_canary_settings
+from .canary import run_canary
+
+READY = "READY"
+FAILED = "FAILED"
+
+
+class ProvisioningFailed(Exception):
+    pass
+
+
+def get_release_settings(cfg):
+    """Read the alias, provisioned concurrency and prewarm settings.
+
+    ``provisioned_concurrency`` is None when the config doesn't mention it,
+    in which case an existing setting on the alias is left alone.
+    """
+    provisioned = cfg.get("provisioned_concurrency")
+    settings = {
+        "alias": cfg.get("alias"),
+        "provisioned_concurrency": (
+            None if provisioned is None else max(0, int(provisioned))
+        ),
+        "prewarm": max(0, int(cfg.get("prewarm", 0) or 0)),
+        "prewarm_payload": cfg.get("prewarm_payload", "{}"),
+        "canary": get_canary_settings(cfg),
+    }
+    if not isinstance(settings["prewarm_payload"], str):
+        settings["prewarm_payload"] = json.dumps(settings["prewarm_payload"])
+    if settings["provisioned_concurrency"] and not settings["alias"]:
+        raise ValueError(
+            "provisioned_concurrency requires an alias in the config"
+        )
+    if settings["canary"] and not settings["alias"]:
+        raise ValueError("canary requires an alias in the config")
+    return settings
+
+
+def wait_for_version(client, function_name, version):
+    """Block until a published version can be invoked."""
+    waiter = client.get_waiter("published_version_active")
+    waiter.wait(FunctionName=function_name, Qualifier=version)
+
+
+def prewarm(client, function_name, version, invocations, payload="{}"):
+    """Invoke a version `invocations` times at once.
+
+    Concurrent invocations can't share an execution environment, so each
+    one initializes (and keeps warm for a while) an environment of its own.
+
+    :returns:
+        The errors reported by the invocations.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    with ThreadPoolExecutor(max_workers=invocations) as executor:
+        results = list(
+            executor.map(
+                lambda _: invoke_remote(
+                    client, function_name, payload, qualifier=version
+                ),
+                range(invocations),
+            )
+        )
+    return [r["error"] for r in results if r["error"]]
+
+
+def get_alias_version(client, function_name, alias):
+    """The version `alias` points at, None when there's no such alias."""
+    try:
+        response = client.get_alias(FunctionName=function_name, Name=alias)
+    except client.exceptions.ResourceNotFoundException:
+        return None
+    return response["FunctionVersion"]
+
+
+def point_alias(client, function_name, alias, version):
+    """Create `alias` or move it to `version`, with all of its traffic."""
+    try:
+        client.get_alias(FunctionName=function_name, Name=alias)
+    except client.exceptions.ResourceNotFoundException:
+        return client.create_alias(
+            FunctionName=function_name, Name=alias, FunctionVersion=version,
+        )
+    return client.update_alias(
+        FunctionName=function_name,
+        Name=alias,
+        FunctionVersion=version,
+        RoutingConfig={"AdditionalVersionWeights": {}},
+    )
+
+
+def set_provisioned_concurrency(client, function_name, qualifier, count):
+    """Apply provisioned concurrency to a version or alias; 0 removes it."""
+    if count:
+        client.put_provisioned_concurrency_config(
+            FunctionName=function_name,
+            Qualifier=qualifier,
+            ProvisionedConcurrentExecutions=count,
+        )
+        return True
+    try:
+        client.delete_provisioned_concurrency_config(
+            FunctionName=function_name, Qualifier=qualifier,
+        )
+    except client.exceptions.ResourceNotFoundException:
+        pass
+    return False
+
+
+def wait_for_provisioned_concurrency(
+    client,
+    function_name,
+    qualifier,
+    timeout=900,
+    interval=5,
+    sleep=time.sleep,
+    clock=time.time,
+):
+    """Poll the provisioned concurrency of a version or alias until it's
+    ``READY``.
+
+    :raises ProvisioningFailed:
+        When provisioning fails or doesn't finish within `timeout` seconds.
+    """
+    deadline = clock() + timeout
+    while True:
+        config = client.get_provisioned_concurrency_config(
+            FunctionName=function_name, Qualifier=qualifier,
+        )
+        status = config.get("Status")
+        if status == READY:
+            return config
+        if status == FAILED:
+            raise ProvisioningFailed(
+                "Provisioned concurrency for {}:{} failed: {}".format(
+                    function_name, qualifier, config.get("StatusReason", ""),
+                )
+            )
+        if clock() >= deadline:
+            raise ProvisioningFailed(
+                "Provisioned concurrency for {}:{} is not ready after "
+                "{}s ({} of {} environments)".format(
+                    function_name,
+                    qualifier,
+                    timeout,
+                    config.get("AvailableProvisionedConcurrentExecutions"),
+                    config.get("RequestedProvisionedConcurrentExecutions"),
+                )
+            )
+        sleep(interval)
+
+
+def release(
+    client,
+    function_name,
+    version,
+    settings,
+    started=None,
+    sleep=time.sleep,
+    clock=time.time,
+    cloudwatch=None,
+):
+    """Prewarm `version`, wait for its provisioned concurrency and move
+    the alias to it.
+
+    :param float started:
+        When the deploy started, by `clock`; timings are relative to it.
+    :param cloudwatch:
+        A CloudWatch client, to compare the versions during a canary.
+    :returns:
+        Seconds from `started` to the end of each step, keyed by step name.
+    :raises CanaryFailed:
+        When the canary rolled the alias back.
+    """
+    start = clock() if started is None else started
+    timings = {"publish": clock() - start}
+    wait_for_version(client, function_name, version)
+    if settings["prewarm"]:
+        errors = prewarm(
+            client,
+            function_name,
+            version,
+            settings["prewarm"],
+            settings["prewarm_payload"],
+        )
+        for error in errors[:3]:
+            print("Prewarm invocation failed: {}".format(error))
+        timings["prewarm"] = clock() - start
+
+    alias = settings["alias"]
+    if alias:
+        previous = get_alias_version(client, function_name, alias)
+        count = settings["provisioned_concurrency"]
+        if count:
+            set_provisioned_concurrency(client, function_name, version, count)
+            print(
+                "Waiting for {} provisioned environments on version {}".format(
+                    count, version
+                )
+            )
+            wait_for_provisioned_concurrency(
+                client, function_name, version, sleep=sleep, clock=clock,
+            )
+            timings["provisioned_concurrency"] = clock() - start
+        if settings["canary"] and previous not in (None, version):
+            try:
+                run_canary(
+                    client,
+                    cloudwatch,
+                    function_name,
+                    alias,
+                    previous,
+                    version,
+                    settings["canary"],
+                    sleep=sleep,
+                    clock=clock,
+                )
+            except CanaryFailed:
+                if count:
+                    set_provisioned_concurrency(
+                        client, function_name, version, 0
+                    )
+                raise
+            timings["canary"] = clock() - start
+        point_alias(client, function_name, alias, version)
+        timings["alias"] = clock() - start
+        if count is not None:
+            # Provisioned concurrency lives on the version the alias points
+            # at; drop what the previous version (or, from older deploys,
+            # the alias itself) still holds.
+            for qualifier in (previous, alias):
+                if qualifier not in (None, version):
+                    set_provisioned_concurrency(
+                        client, function_name, qualifier, 0
+                    )
+
+    timings["ready"] = clock() - start
+    return timings
+
+
+def format_release(function_name, version, settings, timings):
+    target = "{}:{}".format(function_name, version)
+    if settings["alias"]:
+        target = "{} (alias {})".format(target, settings["alias"])
+    steps = ", ".join(
+        "{} {:.1f}s".format(step.replace("_", " "), seconds)
+        for step, seconds in sorted(timings.items(), key=lambda i: i[1])
+        if step != "ready"
+    )
+    line = "{} ready in {:.1f}s".format(target, timings["ready"])
+    if steps:
+        line += " ({})".format(steps)
+    return line
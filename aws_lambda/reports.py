@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Parse and summarize the ``REPORT`` lines Lambda logs per invocation.
+
+A report line looks like::
+
+    REPORT RequestId: 8f5...  Duration: 12.34 ms  Billed Duration: 13 ms
+    Memory Size: 128 MB  Max Memory Used: 70 MB  Init Duration: 230.10 ms
+
+``Init Duration`` is only present for cold starts.
+"""
+import math
+import re
+from collections import Counter
+
+from .helpers import percentile
+
+REPORT_PREFIX = "REPORT RequestId:"
+REQUEST_ID_PATTERN = re.compile(r"RequestId:\s*(?P<request_id>[\w-]+)")
+FIELD_PATTERN = re.compile(
+    r"(?P<name>[A-Z][A-Za-z ]+?):\s*(?P<value>[\d.]+)\s*(?:ms|MB)"
+)
+STATUS_PATTERN = re.compile(r"Status:\s*(?P<status>\w+)")
+
+FIELDS = {
+    "Duration": "duration",
+    "Billed Duration": "billed_duration",
+    "Memory Size": "memory_size",
+    "Max Memory Used": "max_memory_used",
+    "Init Duration": "init_duration",
+    "Restore Duration": "restore_duration",
+}
+
+
+def parse_report(line):
+    """Parse one ``REPORT`` line; returns None for any other line.
+
+    Durations are in milliseconds and memory in MB. ``init_duration`` is
+    None for warm invocations.
+    """
+    if REPORT_PREFIX not in line:
+        return None
+    match = REQUEST_ID_PATTERN.search(line)
+    report = {
+        "request_id": match.group("request_id") if match else None,
+        "init_duration": None,
+        "status": None,
+    }
+    for field in FIELD_PATTERN.finditer(line):
+        key = FIELDS.get(field.group("name").strip())
+        if key is not None:
+            report[key] = float(field.group("value"))
+    status = STATUS_PATTERN.search(line)
+    if status is not None:
+        report["status"] = status.group("status")
+    return report
+
+
+def find_report(log_text):
+    """Return the last ``REPORT`` line in a block of log output, parsed."""
+    for line in reversed(log_text.splitlines()):
+        report = parse_report(line)
+        if report is not None:
+            return report
+    return None
+
+
+def summarize(values):
+    """Count, mean and percentiles of a list of numbers."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "min": min(values),
+        "mean": sum(values) / float(len(values)),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def format_summaries(rows):
+    """Render ``(label, summary)`` pairs as a percentile table."""
+    columns = ("count", "min", "mean", "p50", "p90", "p99", "max")
+    lines = [
+        "{:<22}".format("")
+        + "".join("{:>10}".format(column) for column in columns)
+    ]
+    for label, summary in rows:
+        cells = []
+        for column in columns:
+            value = summary.get(column)
+            if value is None:
+                cells.append("{:>10}".format("-"))
+            elif column == "count":
+                cells.append("{:>10}".format(value))
+            else:
+                cells.append("{:>10.2f}".format(value))
+        lines.append("{:<22}".format(label) + "".join(cells))
+    return "\n".join(lines)
+
+
+class Histogram:
+    """A bounded-memory :func:`summarize` for a stream of numbers.
+
+    Values are counted in logarithmic buckets ``precision`` wide, so memory
+    depends on the range of the values, not their number: a few thousand
+    buckets at most for Lambda's durations. Percentiles are within
+    ``precision / 2`` of the exact value; count, min, mean and max are
+    exact.
+    """
+
+    def __init__(self, precision=0.01):
+        self.log_base = math.log1p(precision)
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bound(self, value):
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+        self._bound(value)
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[int(math.floor(math.log(value) / self.log_base))] += 1
+
+    def update(self, other):
+        """Add everything `other` (with the same precision) has counted."""
+        if other.count:
+            self._bound(other.min)
+            self._bound(other.max)
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct):
+        """The `pct` percentile (nearest-rank), None when empty."""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(pct / 100.0 * self.count)))
+        seen = self.zeros
+        if rank <= seen:
+            return 0.0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if rank <= seen:
+                # The middle of the bucket, on a log scale.
+                value = math.exp((bucket + 0.5) * self.log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        """The same dict :func:`summarize` returns."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.total / float(self.count),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Helpers for code running inside the function.
+
+An execution environment ("container") serves many invocations one after the
+other, and everything created at module level survives between them. This
+module makes that reuse explicit: results memoized for the container's
+lifetime, boto3 clients and HTTP sessions created once and shared, and
+counters the handler can log to see how often the warm path is taken. It also
+helps batch handlers stop before the function times out::
+
+    from aws_lambda.runtime import client, memoize, stats
+
+    @memoize(ttl=300)
+    def load_settings(name):
+        return client("ssm").get_parameter(Name=name)["Parameter"]["Value"]
+
+    def handler(event, context):
+        settings = load_settings("/my-app/settings")
+        ...
+        print(stats())
+
+Set ``build: include_runtime: true`` to ship this module in the bundle. It
+depends on nothing but the standard library; boto3 and requests are imported
+the first time a client or session is requested.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from collections import OrderedDict
+
+_lock = threading.RLock()
+_started = time.time()
+_caches = {}
+_clients = {}
+_sessions = {}
+_counters = {"clients_created": 0, "clients_reused": 0}
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Hit/miss counters of one memoized function."""
+
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.size = 0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "size": self.size,
+        }
+
+
+def _make_key(args, kwargs):
+    if kwargs:
+        return args + (_MISSING,) + tuple(sorted(kwargs.items()))
+    return args
+
+
+def memoize(ttl=None, maxsize=128, clock=time.monotonic):
+    """Cache a function's results for the lifetime of the container.
+
+    :param float ttl:
+        Seconds a result stays valid; None keeps it until it's evicted.
+    :param int maxsize:
+        The number of results kept, least recently used first out; None
+        means unbounded.
+    :param callable clock:
+        Returns the current time in seconds.
+
+    Arguments must be hashable. Exceptions aren't cached. The wrapper has
+    ``cache_info()`` and ``cache_clear()``.
+    """
+
+    def decorator(fn):
+        name = "{}.{}".format(fn.__module__, fn.__qualname__)
+        cache = OrderedDict()
+        cache_stats = CacheStats(name, maxsize, ttl)
+        lock = threading.RLock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs)
+            now = clock()
+            with lock:
+                entry = cache.get(key, _MISSING)
+                if entry is not _MISSING:
+                    value, expires = entry
+                    if expires is None or now < expires:
+                        cache.move_to_end(key)
+                        cache_stats.hits += 1
+                        return value
+                    del cache[key]
+                    cache_stats.expired += 1
+                cache_stats.misses += 1
+            value = fn(*args, **kwargs)
+            with lock:
+                cache[key] = (value, None if ttl is None else now + ttl)
+                cache.move_to_end(key)
+                while maxsize is not None and len(cache) > maxsize:
+                    cache.popitem(last=False)
+                    cache_stats.evicted += 1
+                cache_stats.size = len(cache)
+            return value
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                cache_stats.size = 0
+
+        cache_stats.clear = cache_clear
+        wrapper.cache_info = cache_stats.as_dict
+        wrapper.cache_clear = cache_clear
+        with _lock:
+            _caches[name] = cache_stats
+        return wrapper
+
+    return decorator
+
+
+def client(service, region_name=None, **kwargs):
+    """Return a boto3 client, created on first use and reused afterwards.
+
+    Clients are keyed by service, region and the remaining keyword arguments
+    (which are passed to ``boto3.client``); they are thread safe.
+    """
+    key = (service, region_name, tuple(sorted(kwargs.items())))
+    with _lock:
+        existing = _clients.get(key)
+        if existing is not None:
+            _counters["clients_reused"] += 1
+            return existing
+        import boto3
+
+        created = boto3.client(service, region_name=region_name, **kwargs)
+        _clients[key] = created
+        _counters["clients_created"] += 1
+        return created
+
+
+def http_session(name="default"):
+    """Return a pooled HTTP session that keeps connections alive.
+
+    A ``requests.Session`` when requests is installed, otherwise a
+    ``urllib3.PoolManager`` (urllib3 ships with boto3).
+    """
+    with _lock:
+        existing = _sessions.get(name)
+        if existing is not None:
+            _counters["clients_reused"] += 1
+            return existing
+        try:
+            import requests
+
+            session = requests.Session()
+        except ImportError:
+            import urllib3
+
+            session = urllib3.PoolManager()
+        _sessions[name] = session
+        _counters["clients_created"] += 1
+        return session
+
+
+def stats():
+    """Counters for this container, as a JSON serializable dict."""
+    with _lock:
+        return {
+            "container_age": round(time.time() - _started, 3),
+            "caches": {
+                name: cache_stats.as_dict()
+                for name, cache_stats in sorted(_caches.items())
+            },
+            "clients": {
+                "created": _counters["clients_created"],
+                "reused": _counters["clients_reused"],
+            },
+        }
+
+
+def reset():
+    """Forget cached results, clients and counters, as in a new container."""
+    global _started
+    with _lock:
+        _started = time.time()
+        _clients.clear()
+        _sessions.clear()
+        _counters.update(clients_created=0, clients_reused=0)
+        for cache_stats in _caches.values():
+            cache_stats.clear()
+            cache_stats.hits = cache_stats.misses = 0
+            cache_stats.expired = cache_stats.evicted = 0
+
+
+class DeadlineIterator:
+    """Yield items while the next one is expected to finish in time.
+
+    Before each item, the time left (from the context's
+    ``get_remaining_time_in_millis``) minus `margin_ms` is compared with the
+    estimated time per item, the slowest of the last `window` items. Once
+    an item no longer fits, iteration stops and :meth:`unprocessed` hands
+    back everything that wasn't yielded, e.g. to report it as failed::
+
+        items = until_deadline(event["Records"], context)
+        for record in items:
+            process(record)
+        return items.batch_item_failures(lambda r: r["messageId"])
+
+    Works with the runtime's context object and the local
+    :class:`~aws_lambda.helpers.LambdaContext` alike.
+
+    :param iterable items:
+        The items to process.
+    :param context:
+        The Lambda context.
+    :param int margin_ms:
+        Time to leave for returning the response and cleaning up.
+    :param float initial_estimate_ms:
+        The time expected for the first item, before any was measured.
+    :param int window:
+        How many recent items the estimate is based on.
+    """
+
+    def __init__(
+        self,
+        items,
+        context,
+        margin_ms=1000,
+        initial_estimate_ms=0,
+        window=10,
+        clock=time.monotonic,
+    ):
+        self._items = iter(items)
+        self._pending = []
+        self._context = context
+        self._clock = clock
+        self._durations = deque(maxlen=window)
+        self._started = None
+        self.margin_ms = margin_ms
+        self.initial_estimate_ms = initial_estimate_ms
+        self.processed = 0
+        self.stopped = False
+
+    @property
+    def estimate_ms(self):
+        """The time the next item is expected to take."""
+        if not self._durations:
+            return self.initial_estimate_ms
+        return max(self._durations)
+
+    def remaining_ms(self):
+        return self._context.get_remaining_time_in_millis() - self.margin_ms
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        now = self._clock()
+        if self._started is not None:
+            self._durations.append((now - self._started) * 1000.0)
+            self.processed += 1
+            self._started = None
+        if self.stopped:
+            raise StopIteration
+        item = next(self._items)
+        if self.remaining_ms() <= self.estimate_ms:
+            self.stopped = True
+            self._pending.append(item)
+            raise StopIteration
+        self._started = self._clock()
+        return item
+
+    def unprocessed(self):
+        """The items that weren't yielded, as a list.
+
+        Consumes the rest of the underlying iterable.
+        """
+        self._pending.extend(self._items)
+        return list(self._pending)
+
+    def batch_item_failures(self, identifier):
+        """A partial batch response listing the unprocessed items.
+
+        :param callable identifier:
+            Returns the item identifier of a record, such as its SQS
+            ``messageId`` or Kinesis ``sequenceNumber``.
+        """
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": identifier(item)}
+                for item in self.unprocessed()
+            ]
+        }
+
+
+def until_deadline(items, context, margin_ms=1000, **kwargs):
+    """Iterate over `items` until the function is about to time out.
+
+    See :class:`DeadlineIterator`.
+    """
+    return DeadlineIterator(items, context, margin_ms=margin_ms, **kwargs)
+
+
+def is_active():
+    """Whether the handler has used any of the helpers in this process."""
+    with _lock:
+        return bool(_caches or _clients or _sessions)
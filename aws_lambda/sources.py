@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Collect the project sources that go into a bundle.
+
+Sources are the regular files at the top of the project plus the directories
+listed in ``build: source_directories``. Anything matched by the gitignore
+style patterns in ``.lambdaignore`` or ``build: ignore`` is left out, and
+ignored directories are pruned before they are walked.
+"""
+import os
+import re
+
+IGNORE_FILENAME = ".lambdaignore"
+
+# Never worth shipping; `.lambdaignore` can re-include them with `!pattern`.
+DEFAULT_IGNORE_PATTERNS = [
+    ".DS_Store",
+    ".git/",
+    ".hg/",
+    ".svn/",
+    "__pycache__/",
+    "*.py[cod]",
+    ".pytest_cache/",
+    ".mypy_cache/",
+    ".tox/",
+    ".venv/",
+    "node_modules/",
+    "*.egg-info/",
+    IGNORE_FILENAME,
+]
+
+
+def _translate(pattern):
+    """Translate one gitignore pattern (without `!` or trailing `/`)."""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    i, n = 0, len(pattern)
+    regex = []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            regex.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif c == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif c == "?":
+            regex.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                regex.append(re.escape(c))
+                i += 1
+                continue
+            chars = pattern[i + 1:end]
+            if chars[0] in "!^":
+                chars = "^" + chars[1:]
+            regex.append("[{}]".format(chars.replace("\\", "\\\\")))
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            regex.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(c))
+            i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return "{}{}".format(prefix, "".join(regex))
+
+
+class IgnoreMatcher:
+    """A compiled set of gitignore style patterns.
+
+    Paths are relative to the project root and use ``/`` as separator. As in
+    git, the last matching pattern wins, ``!`` negates, a trailing ``/``
+    only matches directories and a pattern containing a ``/`` is anchored
+    to the root.
+    """
+
+    def __init__(self, patterns=()):
+        self.rules = []
+        for line in patterns:
+            line = line.rstrip("\n")
+            if line.endswith(" ") and not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate or line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            regex = re.compile("^{}$".format(_translate(line)))
+            self.rules.append((regex, negate, dir_only))
+
+        # Without negations the answer doesn't depend on rule order, so all
+        # rules collapse into one regex per kind of path.
+        self._combined = not any(negate for _, negate, _ in self.rules)
+        if self._combined:
+            self._files = self._combine(
+                rx for rx, _, dir_only in self.rules if not dir_only
+            )
+            self._dirs = self._combine(rx for rx, _, _ in self.rules)
+
+    @staticmethod
+    def _combine(regexes):
+        patterns = [rx.pattern for rx in regexes]
+        if not patterns:
+            return None
+        return re.compile("|".join("(?:{})".format(p) for p in patterns))
+
+    @classmethod
+    def from_project(cls, src, extra_patterns=()):
+        """Build the matcher for a project: defaults, config, `.lambdaignore`.
+
+        Later sources take precedence, so `.lambdaignore` can re-include
+        something excluded by default.
+        """
+        patterns = list(DEFAULT_IGNORE_PATTERNS)
+        patterns.extend(extra_patterns)
+        path = os.path.join(src, IGNORE_FILENAME)
+        if os.path.exists(path):
+            with open(path) as fh:
+                patterns.extend(fh.read().splitlines())
+        return cls(patterns)
+
+    def match(self, path, is_dir=False):
+        """Return whether the relative `path` is ignored."""
+        if self._combined:
+            regex = self._dirs if is_dir else self._files
+            return regex is not None and regex.match(path) is not None
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path):
+                return not negate
+        return False
+
+
+class SourceCollection:
+    """The files selected for a bundle and what was left out."""
+
+    def __init__(self):
+        self.files = []
+        self.directories = []
+        self.excluded_files = []
+        self.excluded_bytes = 0
+        self.pruned_directories = []
+
+    def summary(self):
+        return (
+            "Excluded {} files ({} bytes) and pruned {} directories".format(
+                len(self.excluded_files),
+                self.excluded_bytes,
+                len(self.pruned_directories),
+            )
+        )
+
+
+def _exclude_file(collection, entry, relpath):
+    collection.excluded_files.append(relpath)
+    try:
+        collection.excluded_bytes += entry.stat().st_size
+    except OSError:
+        pass
+
+
+def collect_sources(src, source_directories=(), matcher=None, exclude=()):
+    """Select the project files to bundle.
+
+    :param str src:
+        The path to your Lambda ready project.
+    :param list source_directories:
+        Top level directories whose contents are bundled.
+    :param IgnoreMatcher matcher:
+        Patterns of files and directories to leave out.
+    :param list exclude:
+        Top level file names that are never bundled (e.g. the config file).
+    :returns:
+        A :class:`SourceCollection` whose ``files`` are
+        ``(absolute path, path relative to src)`` pairs.
+    """
+    matcher = matcher or IgnoreMatcher()
+    collection = SourceCollection()
+    source_directories = set(d for d in source_directories if d)
+    stack = []
+    with os.scandir(src) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.is_dir():
+                if entry.name not in source_directories:
+                    continue
+                if matcher.match(entry.name, is_dir=True):
+                    collection.pruned_directories.append(entry.name)
+                    continue
+                collection.directories.append(entry.name)
+                stack.append((entry.path, entry.name))
+            elif entry.is_file():
+                if entry.name in exclude:
+                    continue
+                if matcher.match(entry.name):
+                    _exclude_file(collection, entry, entry.name)
+                    continue
+                collection.files.append((entry.path, entry.name))
+
+    while stack:
+        path, relpath = stack.pop()
+        with os.scandir(path) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                entry_relpath = "{}/{}".format(relpath, entry.name)
+                if entry.is_dir():
+                    if matcher.match(entry_relpath, is_dir=True):
+                        collection.pruned_directories.append(entry_relpath)
+                    else:
+                        stack.append((entry.path, entry_relpath))
+                elif entry.is_file():
+                    if matcher.match(entry_relpath):
+                        _exclude_file(collection, entry, entry_relpath)
+                    else:
+                        collection.files.append((entry.path, entry_relpath))
+    return collection
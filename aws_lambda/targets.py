@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Deploy one build to several regions and stages at once.
+
+``targets`` in the config lists where the function is deployed::
+
+    targets:
+      - region: us-east-1
+        stage: prod
+      - region: eu-west-1
+        stage: prod
+        bucket_name: my-artifacts-eu-west-1
+        memory_size: 1024
+        environment_variables:
+          LOG_LEVEL: warning
+
+Every other key of a target overrides the top-level setting of the same
+name; ``environment_variables`` and ``tags`` are merged key by key. A
+``stage`` is appended to the function name (``<function_name>-<stage>``)
+unless the target sets its own ``function_name``.
+
+``LAMBDA_FUNCTION_NAME`` and ``S3_BUCKET_NAME``, which override the function
+and bucket of a single deploy, can't be combined with targets.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MERGED_KEYS = ("environment_variables", "tags")
+TARGET_KEYS = ("name", "stage")
+# Environment variables that would send every target to one function or
+# bucket.
+SINGLE_TARGET_OVERRIDES = ("LAMBDA_FUNCTION_NAME", "S3_BUCKET_NAME")
+
+OK = "ok"
+FAILED = "failed"
+
+
+class DeployFailed(Exception):
+    pass
+
+
+def get_targets(cfg, names=None):
+    """Return ``(name, config)`` for every target, in config order.
+
+    Targets without a ``name`` are named ``<stage>-<region>``.
+
+    :param dict cfg:
+        The parsed config file.
+    :param names:
+        Only return the targets with these names.
+    :raises ValueError:
+        When a name in `names` isn't a target, two targets share a name or
+        ``LAMBDA_FUNCTION_NAME`` or ``S3_BUCKET_NAME`` is set.
+    """
+    overrides = [key for key in SINGLE_TARGET_OVERRIDES if os.environ.get(key)]
+    if overrides:
+        raise ValueError(
+            "{} can't be used with targets; set function_name or "
+            "bucket_name on the targets instead".format(
+                " and ".join(overrides)
+            )
+        )
+    base = {k: v for k, v in cfg.items() if k != "targets"}
+    targets = []
+    for target in cfg.get("targets") or []:
+        target_cfg = dict(base)
+        for key, value in target.items():
+            if key in TARGET_KEYS:
+                continue
+            if key in MERGED_KEYS and isinstance(value, dict):
+                value = dict(base.get(key) or {}, **value)
+            target_cfg[key] = value
+        if target.get("stage") and "function_name" not in target:
+            target_cfg["function_name"] = "{}-{}".format(
+                base.get("function_name"), target["stage"]
+            )
+        name = target.get("name") or "-".join(
+            str(part)
+            for part in (target.get("stage"), target_cfg.get("region"))
+            if part
+        )
+        targets.append((name, target_cfg))
+
+    seen = [name for name, _ in targets]
+    duplicates = sorted(set(n for n in seen if seen.count(n) > 1))
+    if duplicates:
+        raise ValueError(
+            "Target names must be unique, found {} more than once".format(
+                ", ".join(duplicates)
+            )
+        )
+    if names:
+        unknown = sorted(set(names) - set(seen))
+        if unknown:
+            raise ValueError(
+                "Unknown target {}; the config defines {}".format(
+                    ", ".join(unknown), ", ".join(seen)
+                )
+            )
+        targets = [t for t in targets if t[0] in names]
+    return targets
+
+
+def run_targets(targets, deploy_target, max_workers=None, clock=time.time):
+    """Call ``deploy_target(name, cfg)`` for every target concurrently.
+
+    A failing target doesn't stop the others.
+
+    :returns:
+        One dict per target, in order, with its ``name``, ``region``,
+        ``function_name``, ``status``, ``seconds`` and ``error``.
+    """
+
+    def run(target):
+        name, target_cfg = target
+        started = clock()
+        result = {
+            "name": name,
+            "region": target_cfg.get("region"),
+            "function_name": target_cfg.get("function_name"),
+            "status": OK,
+            "error": None,
+        }
+        try:
+            deploy_target(name, target_cfg)
+        except Exception as e:
+            result.update(status=FAILED, error="{!r}".format(e))
+        result["seconds"] = clock() - started
+        return result
+
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets)) as pool:
+        return list(pool.map(run, targets))
+
+
+def format_targets(results):
+    lines = [
+        "{:<24} {:<16} {:<32} {:>8}  {}".format(
+            "target", "region", "function", "seconds", "status"
+        )
+    ]
+    for result in results:
+        status = result["status"]
+        if result["error"]:
+            status = "{}: {}".format(status, result["error"])
+        lines.append(
+            "{:<24} {:<16} {:<32} {:>8.1f}  {}".format(
+                result["name"],
+                result["region"] or "-",
+                result["function_name"] or "-",
+                result["seconds"],
+                status,
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Rebuild and re-run (or redeploy) a function whenever its sources change.
+
+Dependencies are installed and zipped once and cached under
+``<dist_directory>/.cache`` keyed by the requirements; each change only
+copies that archive and appends the project sources to it, so the time from
+saving a file to running the new code is a fraction of a full ``build``.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import shutil
+import struct
+import sys
+import time
+import zipfile
+from tempfile import mkdtemp
+
+from .helpers import add_to_archive
+from .helpers import archive
+from .helpers import mkdir
+from .helpers import read
+from .packing import get_zipimport_settings
+from .packing import pack_dependencies
+
+# inotify(7) constants.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Block until something changes in a set of directories (Linux only)."""
+
+    def __init__(self, directories):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError("inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        for directory in directories:
+            self.add(directory)
+
+    def add(self, directory):
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), WATCH_MASK,
+        )
+        if wd >= 0:
+            self.directories[wd] = directory
+
+    def wait(self, timeout=None):
+        """Return True if any change happened within `timeout` seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            # New directories inside a watched tree need their own watch.
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                parent = self.directories.get(wd)
+                if parent is not None:
+                    self.add(os.path.join(parent, os.fsdecode(name)))
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback that compares snapshots every `interval` seconds."""
+
+    def __init__(self, snapshot, interval=0.5):
+        self.snapshot = snapshot
+        self.interval = interval
+        self.last = snapshot()
+
+    def wait(self, timeout=None):
+        """Return True if any change happened within `timeout` seconds."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            current = self.snapshot()
+            if current != self.last:
+                self.last = current
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def wait_for_changes(watcher, debounce=0.3):
+    """Block until a change, then until `debounce` seconds pass quietly."""
+    watcher.wait()
+    while watcher.wait(timeout=debounce):
+        pass
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class IncrementalBundle:
+    """A bundle kept up to date from cached dependencies and changed sources.
+
+    :param str src:
+        The path to your Lambda ready project.
+    :param dict cfg:
+        The parsed config file.
+    :param str path_to_zip_file:
+        Where the bundle is written.
+    :param callable collect:
+        Returns the project's :class:`~aws_lambda.sources.SourceCollection`.
+    :param callable install:
+        Installs the dependencies into a directory.
+    :param str requirements:
+        The requirements file; dependencies are rebuilt when it changes.
+    :param callable resolve:
+        Returns the ``(requirements file, no_deps)`` to install, e.g. a
+        pinned dependency closure. Called on the first refresh and again
+        whenever one of the files `requirement_sources` returns changes.
+        Without it, `requirements` is installed as is.
+    :param callable requirement_sources:
+        Returns the files `resolve` reads.
+    """
+
+    def __init__(
+        self,
+        src,
+        cfg,
+        path_to_zip_file,
+        collect,
+        install,
+        requirements=None,
+        local_package=None,
+        resolve=None,
+        requirement_sources=None,
+    ):
+        self.src = src
+        self.path_to_zip_file = path_to_zip_file
+        self.collect = collect
+        self.install = install
+        self.requirements = requirements
+        self.no_deps = False
+        self.local_package = local_package or ()
+        self.resolve = resolve
+        self.requirement_sources = requirement_sources or (lambda: [])
+        self.sources_signatures = None
+        self.cache_directory = os.path.join(
+            src, cfg.get("dist_directory", "dist"), ".cache",
+        )
+        self.handler = cfg.get("handler")
+        self.zipimport = get_zipimport_settings(cfg)
+        self.dependencies_key = None
+        self.signatures = {}
+        self.files = []
+
+    def _key_for_dependencies(self):
+        digest = hashlib.sha256(sys.version.encode("utf-8"))
+        if self.requirements and os.path.exists(self.requirements):
+            digest.update(read(self.requirements, binary_file=True))
+        for package in self.local_package:
+            digest.update(package.encode("utf-8"))
+        if self.zipimport["enabled"]:
+            digest.update(self.handler.encode("utf-8"))
+            digest.update(repr(sorted(self.zipimport["exclude"])).encode())
+        return digest.hexdigest()[:16]
+
+    def dependencies_archive(self):
+        return os.path.join(
+            self.cache_directory,
+            "dependencies-{}.zip".format(self.dependencies_key),
+        )
+
+    def _build_dependencies(self):
+        path = self.dependencies_archive()
+        if os.path.exists(path):
+            print("Reusing cached dependencies {}".format(path))
+            return
+        mkdir(self.cache_directory)
+        path_to_temp = mkdtemp(prefix="aws-lambda")
+        cwd = os.getcwd()
+        try:
+            self.install(
+                path_to_temp,
+                requirements=self.requirements,
+                local_package=self.local_package,
+                no_deps=self.no_deps,
+            )
+            if self.zipimport["enabled"]:
+                pack_dependencies(
+                    path_to_temp,
+                    os.listdir(path_to_temp),
+                    self.handler,
+                    self.zipimport["exclude"],
+                )
+            os.chdir(path_to_temp)
+            archive("./", self.cache_directory, os.path.basename(path))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(path_to_temp, ignore_errors=True)
+
+    def _requirement_files(self):
+        files = list(self.requirement_sources())
+        if self.requirements:
+            files.append(self.requirements)
+        return files
+
+    def _signatures(self, paths):
+        signatures = []
+        for path in paths:
+            try:
+                signatures.append((path, file_signature(path)))
+            except OSError:
+                signatures.append((path, None))
+        return signatures
+
+    def snapshot(self):
+        """Signatures of every bundled file plus the requirement files."""
+        collection = self.collect()
+        snapshot = {}
+        for path, relpath in collection.files:
+            try:
+                snapshot[relpath] = (path, file_signature(path))
+            except OSError:
+                continue
+        snapshot[None] = (None, self._signatures(self._requirement_files()))
+        return snapshot
+
+    def watched_directories(self):
+        directories = {self.src}
+        for path, _ in self.files:
+            directories.add(os.path.dirname(path))
+        for path in self._requirement_files():
+            directories.add(os.path.dirname(os.path.abspath(path)))
+        return sorted(directories)
+
+    def refresh(self):
+        """Bring the bundle up to date.
+
+        :returns:
+            The relative paths of the entries that changed (``None`` stands
+            for the dependencies), or an empty list if nothing did.
+        """
+        changed = []
+        if self.resolve is not None:
+            signatures = self._signatures(self.requirement_sources())
+            if signatures != self.sources_signatures:
+                self.sources_signatures = signatures
+                self.requirements, self.no_deps = self.resolve()
+        key = self._key_for_dependencies()
+        if key != self.dependencies_key:
+            self.dependencies_key = key
+            self._build_dependencies()
+            changed.append(None)
+
+        snapshot = self.snapshot()
+        snapshot.pop(None, None)
+        signatures = {
+            relpath: signature for relpath, (_, signature) in snapshot.items()
+        }
+        changed.extend(
+            relpath
+            for relpath in sorted(set(signatures) | set(self.signatures))
+            if signatures.get(relpath) != self.signatures.get(relpath)
+        )
+        if not changed:
+            return changed
+
+        self.signatures = signatures
+        self.files = [
+            (path, relpath) for relpath, (path, _) in snapshot.items()
+        ]
+        # The dependency archive is copied byte for byte; only the (small)
+        # project sources are compressed again.
+        mkdir(os.path.dirname(self.path_to_zip_file))
+        shutil.copyfile(self.dependencies_archive(), self.path_to_zip_file)
+        with zipfile.ZipFile(
+            self.path_to_zip_file, "a", zipfile.ZIP_DEFLATED
+        ) as zfh:
+            for path, relpath in sorted(self.files, key=lambda f: f[1]):
+                add_to_archive(zfh, path, relpath)
+        return changed
+
+
+def make_watcher(bundle, polling=False, interval=0.5):
+    """Use inotify where available and fall back to polling."""
+    if not polling:
+        try:
+            return InotifyWatcher(bundle.watched_directories())
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(bundle.snapshot, interval=interval)
+
+
+def unload_project_modules(src):
+    """Forget modules imported from `src` so the next invoke sees edits."""
+    src = os.path.abspath(src) + os.sep
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None) or ""
+        if os.path.abspath(filename).startswith(src):
+            del sys.modules[name]
+
+
+def describe_changes(changed):
+    names = ["dependencies" if c is None else c for c in changed]
+    if len(names) > 5:
+        names = names[:5] + ["and {} more".format(len(names) - 5)]
+    return ", ".join(names)
+
+
+def watch(bundle, on_change, polling=False, interval=0.5, debounce=0.3):
+    """Run `on_change(path_to_zip_file)` after every rebuild of `bundle`.
+
+    Blocks until interrupted.
+    """
+    start = time.time()
+    bundle.refresh()
+    print("Built {} in {:.2f}s".format(
+        bundle.path_to_zip_file, time.time() - start,
+    ))
+    on_change(bundle.path_to_zip_file)
+
+    watcher = make_watcher(bundle, polling=polling, interval=interval)
+    print("Watching {} for changes ({})".format(
+        bundle.src, type(watcher).__name__,
+    ))
+    try:
+        while True:
+            wait_for_changes(watcher, debounce=debounce)
+            start = time.time()
+            changed = bundle.refresh()
+            if not changed:
+                continue
+            print("Rebuilt {} in {:.2f}s".format(
+                describe_changes(changed), time.time() - start,
+            ))
+            if isinstance(watcher, InotifyWatcher):
+                for directory in bundle.watched_directories():
+                    if directory not in watcher.directories.values():
+                        watcher.add(directory)
+            on_change(bundle.path_to_zip_file)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
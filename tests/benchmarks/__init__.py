@@ -0,0 +1,15 @@
+import os
+from contextlib import contextmanager
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+@contextmanager
+def in_directory(path):
+    """``build`` changes the working directory; always restore it."""
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark suite for python-lambda.
+
+Run it from the project root::
+
+    python -m tests.benchmarks                 # compare against baselines
+    python -m tests.benchmarks --update        # record new baselines
+    python -m tests.benchmarks -k archive      # only matching scenarios
+
+Every scenario works on synthetic projects and dependency sets generated in a
+scratch directory, installs dependencies from locally built wheels and routes
+AWS calls to the in-memory stand-ins in ``tests.standins``, so no network
+access or credentials are needed. Timings are machine dependent; regenerate
+the baselines on the reference machine when the hardware changes.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aws_lambda import aws_lambda
+from aws_lambda.helpers import archive
+from tests.benchmarks import BASELINES
+from tests.benchmarks import in_directory
+from tests.benchmarks import synthetic
+from tests.standins import FakeAWS
+
+SCENARIOS = []
+TIME_SLACK = 0.25
+
+
+def scenario(repeat=3):
+    """Register a benchmark; the decorated function returns a runner."""
+
+    def register(fn):
+        SCENARIOS.append((fn.__name__, fn, repeat))
+        return fn
+
+    return register
+
+
+def _empty_requirements(workdir):
+    path = os.path.join(workdir, "requirements-empty.txt")
+    open(path, "w").close()
+    return path
+
+
+@scenario()
+def archive_many_small_files(workdir):
+    src = synthetic.make_tree(os.path.join(workdir, "src"), small_files=5000)
+    dist = os.path.join(workdir, "dist")
+    os.makedirs(dist)
+
+    def run():
+        with in_directory(src):
+            archive("./", dist, "bundle.zip")
+
+    return run
+
+
+@scenario()
+def archive_huge_files(workdir):
+    src = synthetic.make_tree(
+        os.path.join(workdir, "src"),
+        huge_files=3,
+        huge_size=32 * 1024 * 1024,
+    )
+    dist = os.path.join(workdir, "dist")
+    os.makedirs(dist)
+
+    def run():
+        with in_directory(src):
+            archive("./", dist, "bundle.zip")
+
+    return run
+
+
+@scenario(repeat=1)
+def pip_install_to_target(workdir):
+    requirements = synthetic.make_dependency_set(
+        os.path.join(workdir, "wheels")
+    )
+    target = os.path.join(workdir, "target")
+
+    def run():
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+        aws_lambda.pip_install_to_target(target, requirements=requirements)
+
+    return run
+
+
+@scenario(repeat=1)
+def build_with_dependencies(workdir):
+    src = synthetic.make_project(
+        os.path.join(workdir, "project"),
+        small_files=2000,
+        huge_files=1,
+    )
+    requirements = synthetic.make_dependency_set(
+        os.path.join(workdir, "wheels")
+    )
+
+    def run():
+        with in_directory(src):
+            aws_lambda.build(src, requirements=requirements)
+
+    return run
+
+
+def _deploy_runner(workdir, deploy_fn, redeploy):
+    src = synthetic.make_project(
+        os.path.join(workdir, "project"),
+        small_files=200,
+    )
+    requirements = _empty_requirements(workdir)
+
+    def run():
+        aws = FakeAWS()
+        with aws.patch(), in_directory(src):
+            deploy_fn(src, requirements=requirements)
+            if redeploy:
+                aws.calls = []
+                aws.clients_created = 0
+                deploy_fn(src, requirements=requirements)
+        return {
+            "api_calls": aws.call_counts(),
+            "clients_created": aws.clients_created,
+        }
+
+    return run
+
+
+@scenario()
+def deploy_create(workdir):
+    return _deploy_runner(workdir, aws_lambda.deploy, redeploy=False)
+
+
+@scenario()
+def deploy_update(workdir):
+    return _deploy_runner(workdir, aws_lambda.deploy, redeploy=True)
+
+
+@scenario()
+def deploy_s3_create(workdir):
+    return _deploy_runner(workdir, aws_lambda.deploy_s3, redeploy=False)
+
+
+@scenario()
+def deploy_s3_update(workdir):
+    return _deploy_runner(workdir, aws_lambda.deploy_s3, redeploy=True)
+
+
+def measure(run, repeat):
+    """Time `run` (best of `repeat`) and record its peak memory use.
+
+    Memory is measured in a separate pass because tracemalloc slows down
+    allocation-heavy code too much to time it at the same time.
+    """
+    timings = []
+    extra = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = run() or {}
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "seconds": round(min(timings), 4),
+        "peak_python_memory_bytes": peak,
+    }
+    result.update(extra)
+    return result
+
+
+def compare(name, result, baseline, time_tolerance, memory_tolerance):
+    """Return a list of human readable regressions for one scenario.
+
+    Timings get a fixed slack on top of the relative tolerance so that
+    scenarios finishing in a few milliseconds don't flap on scheduler noise.
+    """
+    problems = []
+    if baseline is None:
+        return problems
+    limits = (
+        ("seconds", time_tolerance, TIME_SLACK),
+        ("peak_python_memory_bytes", memory_tolerance, 0),
+    )
+    for key, tolerance, slack in limits:
+        if key not in baseline:
+            continue
+        if result[key] > baseline[key] * tolerance + slack:
+            problems.append(
+                "{}: {} {} exceeds baseline {} (x{})".format(
+                    name,
+                    key,
+                    result[key],
+                    baseline[key],
+                    tolerance,
+                )
+            )
+    for key in ("api_calls", "clients_created"):
+        if key in baseline and result.get(key) != baseline[key]:
+            problems.append(
+                "{}: {} changed from {} to {}".format(
+                    name,
+                    key,
+                    baseline[key],
+                    result.get(key),
+                )
+            )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks")
+    parser.add_argument("-k", dest="keyword", help="Only run matching names.")
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Write results as baselines.",
+    )
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--memory-tolerance", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as fh:
+            baselines = json.load(fh)
+
+    results = {}
+    problems = []
+    workroot = tempfile.mkdtemp(prefix="python-lambda-bench")
+    # `build` leaves its staging directories behind; keep them in the
+    # scratch directory so they are removed with it.
+    default_tempdir = tempfile.tempdir
+    tempfile.tempdir = os.path.join(workroot, "tmp")
+    os.makedirs(tempfile.tempdir)
+    try:
+        for name, factory, repeat in SCENARIOS:
+            if args.keyword and args.keyword not in name:
+                continue
+            workdir = os.path.join(workroot, name)
+            os.makedirs(workdir)
+            result = measure(factory(workdir), repeat)
+            results[name] = result
+            print(
+                "{:<28} {:>9.3f}s {:>10.1f}MB".format(
+                    name,
+                    result["seconds"],
+                    result["peak_python_memory_bytes"] / 1024.0 / 1024.0,
+                )
+            )
+            problems.extend(
+                compare(
+                    name,
+                    result,
+                    baselines.get(name),
+                    args.time_tolerance,
+                    args.memory_tolerance,
+                )
+            )
+            shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        tempfile.tempdir = default_tempdir
+        shutil.rmtree(workroot, ignore_errors=True)
+
+    if args.update:
+        baselines.update(results)
+        with open(BASELINES, "w") as fh:
+            json.dump(baselines, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print("Baselines written to {}".format(BASELINES))
+        return 0
+
+    for problem in problems:
+        print("REGRESSION {}".format(problem))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
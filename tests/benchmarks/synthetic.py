@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Generators for synthetic Lambda projects and dependency sets."""
+
+import base64
+import hashlib
+import os
+import random
+import zipfile
+
+HANDLER_SOURCE = """\
+def handler(event, context):
+    return event
+"""
+
+CONFIG_TEMPLATE = """\
+region: us-east-1
+function_name: {function_name}
+handler: service.handler
+runtime: python3.8
+role: lambda_basic_execution
+bucket_name: benchmark-bucket
+s3_key_prefix: dist/
+timeout: 15
+memory_size: 512
+environment_variables:
+    env_1: foo
+tags:
+    team: benchmarks
+build:
+  source_directories: lib
+"""
+
+
+def _payload(size, compressible, rng):
+    if compressible:
+        line = b"x = 'python-lambda synthetic source line'\n"
+        return (line * (size // len(line) + 1))[:size]
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+
+def write_file(path, size, compressible=True, rng=None):
+    rng = rng or random.Random(path)
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "wb") as fh:
+        fh.write(_payload(size, compressible, rng))
+    return path
+
+
+def make_tree(
+    root,
+    small_files=0,
+    small_size=1024,
+    huge_files=0,
+    huge_size=16 * 1024 * 1024,
+    fanout=50,
+):
+    """Populate `root` with many small files and a few huge ones.
+
+    Small files are spread over sub-directories of at most `fanout` entries
+    to resemble a real package tree; huge files are incompressible so they
+    exercise the deflate path at its worst.
+    """
+    rng = random.Random(root)
+    for i in range(small_files):
+        path = os.path.join(
+            root,
+            "pkg{}".format(i // fanout),
+            "mod{}.py".format(i),
+        )
+        write_file(path, small_size, compressible=True, rng=rng)
+    for i in range(huge_files):
+        path = os.path.join(root, "blobs", "blob{}.bin".format(i))
+        write_file(path, huge_size, compressible=False, rng=rng)
+    return root
+
+
+def make_project(
+    root,
+    function_name="benchmark",
+    small_files=0,
+    huge_files=0,
+    huge_size=16 * 1024 * 1024,
+):
+    """Create a Lambda project with a handler, config and `lib` sources."""
+    if not os.path.exists(root):
+        os.makedirs(root)
+    with open(os.path.join(root, "service.py"), "w") as fh:
+        fh.write(HANDLER_SOURCE)
+    with open(os.path.join(root, "config.yaml"), "w") as fh:
+        fh.write(CONFIG_TEMPLATE.format(function_name=function_name))
+    with open(os.path.join(root, "event.json"), "w") as fh:
+        fh.write('{"pi": 3.14, "e": 2.718}\n')
+    make_tree(
+        os.path.join(root, "lib"),
+        small_files=small_files,
+        huge_files=huge_files,
+        huge_size=huge_size,
+    )
+    return root
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def make_wheel(dest, name, files, version="1.0"):
+    """Build an installable wheel from a mapping of archive name to bytes.
+
+    Wheels are written directly with :mod:`zipfile` so pip can install them
+    offline, without a build backend or an index.
+    """
+    if not os.path.exists(dest):
+        os.makedirs(dest)
+    dist_info = "{}-{}.dist-info".format(name, version)
+    metadata = {
+        dist_info
+        + "/METADATA": (
+            "Metadata-Version: 2.1\nName: {}\nVersion: {}\n".format(
+                name,
+                version,
+            ).encode()
+        ),
+        dist_info
+        + "/WHEEL": (
+            "Wheel-Version: 1.0\nGenerator: python-lambda-benchmarks\n"
+            "Root-Is-Purelib: true\nTag: py3-none-any\n"
+        ).encode(),
+        dist_info + "/top_level.txt": "{}\n".format(name).encode(),
+    }
+    entries = dict(files)
+    entries.update(metadata)
+    record = "".join(
+        "{},{},{}\n".format(arcname, _record_hash(data), len(data))
+        for arcname, data in sorted(entries.items())
+    )
+    record += "{}/RECORD,,\n".format(dist_info)
+    path = os.path.join(dest, "{}-{}-py3-none-any.whl".format(name, version))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zfh:
+        for arcname, data in sorted(entries.items()):
+            zfh.writestr(arcname, data)
+        zfh.writestr(dist_info + "/RECORD", record)
+    return path
+
+
+def make_dependency_set(
+    dest,
+    small_files=500,
+    huge_size=8 * 1024 * 1024,
+    native_libs=4,
+    native_size=2 * 1024 * 1024,
+):
+    """Write three wheels (many small files, a huge file, native libs).
+
+    Returns the path to a requirements file listing the wheels so it can be
+    passed straight to ``pip_install_to_target``.
+    """
+    rng = random.Random(dest)
+    small = {
+        "bench_small/__init__.py": b"",
+    }
+    for i in range(small_files):
+        small["bench_small/sub{}/mod{}.py".format(i // 50, i)] = _payload(
+            1024,
+            True,
+            rng,
+        )
+    for sub in {name.rsplit("/", 1)[0] for name in small}:
+        small.setdefault(sub + "/__init__.py", b"")
+    huge = {
+        "bench_huge/__init__.py": b"",
+        "bench_huge/model.bin": _payload(huge_size, False, rng),
+    }
+    native = {"bench_native/__init__.py": b""}
+    for i in range(native_libs):
+        native["bench_native/_ext{}.so".format(i)] = b"\x7fELF" + _payload(
+            native_size,
+            False,
+            rng,
+        )
+    wheels = [
+        make_wheel(dest, "bench_small", small),
+        make_wheel(dest, "bench_huge", huge),
+        make_wheel(dest, "bench_native", native),
+    ]
+    requirements = os.path.join(dest, "requirements.txt")
+    with open(requirements, "w") as fh:
+        fh.write("\n".join(wheels) + "\n")
+    return requirements
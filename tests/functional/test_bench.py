@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from botocore.exceptions import ClientError
+
+from aws_lambda.benchmark import bench_local
+from aws_lambda.benchmark import bench_remote
+from aws_lambda.benchmark import format_bench
+from tests.standins import FakeAWS
+
+LAMBDA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "scripts",
+    "lambda",
+)
+
+
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS()
+        self.client = self.aws.get_client("lambda")
+        self.client.create_function(
+            FunctionName="benchmark",
+            Runtime="python3.8",
+            Role="arn:aws:iam::123456789012:role/lambda",
+            Handler="service.handler",
+            Code={"ZipFile": b"zip"},
+            Publish=True,
+        )
+        self.aws.calls = []
+
+    def test_remote_cold_and_warm_starts(self):
+        self.aws.durations = [10.0, 20.0, 30.0, 40.0]
+        result = bench_remote(
+            self.client, "benchmark", "{}", invocations=8, concurrency=4,
+        )
+        self.assertEqual(self.aws.call_counts(), {"lambda.invoke": 8})
+        self.assertEqual(result["invocations"], 8)
+        self.assertEqual(result["cold_starts"], 1)
+        self.assertEqual(result["init_duration"]["max"], 250.0)
+        self.assertEqual(result["warm_duration"]["count"], 7)
+        self.assertEqual(result["duration"]["p50"], 20.0)
+        self.assertEqual(result["duration"]["max"], 40.0)
+        self.assertEqual(result["versions"], ["$LATEST"])
+        self.assertIn("init duration (ms)", format_bench(result))
+
+    def test_remote_qualifier_and_errors(self):
+        self.aws.function_error = "boom"
+        result = bench_remote(
+            self.client, "benchmark", "{}", invocations=2, qualifier="1",
+        )
+        self.assertEqual(result["versions"], ["1"])
+        self.assertEqual(len(result["errors"]), 2)
+        self.assertIn("boom", result["errors"][0])
+
+    def test_remote_api_errors_are_recorded(self):
+        invoke = self.client.invoke
+        calls = []
+
+        def throttled(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise ClientError(
+                    {
+                        "Error": {
+                            "Code": "TooManyRequestsException",
+                            "Message": "Rate exceeded",
+                        }
+                    },
+                    "Invoke",
+                )
+            return invoke(**kwargs)
+
+        self.client.invoke = throttled
+        result = bench_remote(self.client, "benchmark", "{}", invocations=4)
+        self.assertEqual(result["invocations"], 4)
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertIn("TooManyRequestsException", result["errors"][0])
+        self.assertEqual(result["client_latency"]["count"], 3)
+        self.assertEqual(result["duration"]["count"], 3)
+
+    def test_local(self):
+        calls = []
+        result = bench_local(
+            lambda event, context: calls.append(event),
+            {"a": 1},
+            lambda: None,
+            invocations=5,
+        )
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(result["warm_latency"]["count"], 4)
+        self.assertIsNotNone(result["cold_latency"])
+        self.assertNotIn("cold starts", format_bench(result))
+
+    def test_cli_needs_at_least_one_invocation(self):
+        for option in ("--invocations", "--concurrency"):
+            for value in ("0", "-1"):
+                with self.subTest(option=option, value=value):
+                    process = subprocess.run(
+                        [sys.executable, LAMBDA, "bench", option, value],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                    )
+                    self.assertEqual(process.returncode, 2)
+                    self.assertIn(b">=1", process.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
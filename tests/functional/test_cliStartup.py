@@ -0,0 +1,116 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+LAMBDA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "scripts",
+    "lambda",
+)
+
+# Imported by commands that talk to AWS or read config.yaml only.
+AWS_MODULES = {"boto3", "botocore", "s3transfer"}
+CONFIG_MODULES = {"yaml"}
+
+# Seconds spent importing modules, as reported by `-X importtime`. Generous
+# enough for a slow CI machine; importing boto3 alone blows through them.
+STARTUP_BUDGETS = {"help": 0.2, "invoke": 0.4}
+
+COMMANDS = (
+    "init",
+    "invoke",
+    "batch",
+    "bench",
+    "stats",
+    "deploy",
+    "upload",
+    "deploy-s3",
+    "build",
+    "cleanup",
+    "prune",
+    "watch",
+)
+
+
+def import_times(args, cwd):
+    """Run the CLI and return {top-level package: cumulative seconds}."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", LAMBDA] + args,
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    packages = {}
+    for line in process.stderr.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("  "):
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(cumulative) / 1e6
+    return packages
+
+
+class TestCliStartup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp(prefix="python-lambda-test")
+        subprocess.run(
+            [sys.executable, LAMBDA, "init"],
+            cwd=cls.workdir,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def assertStartup(self, args, forbidden, budget):
+        packages = import_times(args, self.workdir)
+        self.assertFalse(
+            forbidden & set(packages),
+            "lambda {} imported {}".format(
+                " ".join(args), ", ".join(sorted(forbidden & set(packages)))
+            ),
+        )
+        self.assertLess(
+            sum(packages.values()),
+            budget,
+            "lambda {} spent {:.3f}s importing: {}".format(
+                " ".join(args),
+                sum(packages.values()),
+                ", ".join(
+                    "{} {:.3f}s".format(name, seconds)
+                    for name, seconds in sorted(
+                        packages.items(), key=lambda item: -item[1]
+                    )[:5]
+                ),
+            ),
+        )
+
+    def test_help(self):
+        self.assertStartup(
+            ["--help"], AWS_MODULES | CONFIG_MODULES, STARTUP_BUDGETS["help"]
+        )
+
+    def test_command_help(self):
+        for command in COMMANDS:
+            with self.subTest(command=command):
+                self.assertStartup(
+                    [command, "--help"],
+                    AWS_MODULES | CONFIG_MODULES,
+                    STARTUP_BUDGETS["help"],
+                )
+
+    def test_local_invoke(self):
+        self.assertStartup(["invoke"], AWS_MODULES, STARTUP_BUDGETS["invoke"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from aws_lambda import aws_lambda
+from tests.benchmarks import BASELINES
+from tests.benchmarks import in_directory
+from tests.benchmarks import synthetic
+from tests.standins import FakeAWS
+from tests.standins import FakeS3
+
+
+class TestDeployApiCalls(unittest.TestCase):
+    """Deploys against the local stand-ins must not add AWS round trips."""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="python-lambda-test")
+        self.src = synthetic.make_project(
+            os.path.join(self.workdir, "project"),
+            small_files=10,
+        )
+        self.requirements = os.path.join(self.workdir, "requirements.txt")
+        open(self.requirements, "w").close()
+        with open(BASELINES) as fh:
+            self.baselines = json.load(fh)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _deploy(self, deploy_fn, times):
+        aws = FakeAWS()
+        with aws.patch(), in_directory(self.src):
+            for _ in range(times):
+                aws.calls = []
+                aws.clients_created = 0
+                deploy_fn(self.src, requirements=self.requirements)
+        return aws
+
+    def assertMatchesBaseline(self, name, aws):
+        baseline = self.baselines[name]
+        self.assertEqual(aws.call_counts(), baseline["api_calls"])
+        self.assertEqual(aws.clients_created, baseline["clients_created"])
+
+    def test_deploy_create(self):
+        aws = self._deploy(aws_lambda.deploy, 1)
+        self.assertMatchesBaseline("deploy_create", aws)
+        self.assertIn("benchmark", aws.functions)
+
+    def test_deploy_update(self):
+        aws = self._deploy(aws_lambda.deploy, 2)
+        self.assertMatchesBaseline("deploy_update", aws)
+
+    def test_deploy_s3_create(self):
+        aws = self._deploy(aws_lambda.deploy_s3, 1)
+        self.assertMatchesBaseline("deploy_s3_create", aws)
+        self.assertEqual(len(aws.buckets["benchmark-bucket"]), 1)
+
+    def test_deploy_s3_update(self):
+        aws = self._deploy(aws_lambda.deploy_s3, 2)
+        self.assertMatchesBaseline("deploy_s3_update", aws)
+
+    def test_function_name_override(self):
+        with mock.patch.dict(os.environ, {"LAMBDA_FUNCTION_NAME": "other"}):
+            aws = self._deploy(aws_lambda.deploy, 2)
+        self.assertMatchesBaseline("deploy_update", aws)
+        self.assertEqual(list(aws.functions), ["other"])
+
+    def test_update_function_code_only(self):
+        aws = self._deploy(aws_lambda.deploy, 1)
+        aws.calls = []
+        cfg = aws_lambda.read_cfg(
+            os.path.join(self.src, "config.yaml"), None
+        )
+        path_to_zip_file = os.path.join(self.workdir, "bundle.zip")
+        with open(path_to_zip_file, "wb") as fh:
+            fh.write(b"new code")
+        with aws.patch():
+            aws_lambda.update_function_code(cfg, path_to_zip_file)
+        self.assertEqual(
+            aws.call_counts(),
+            {
+                "lambda.update_function_code": 1,
+                "lambda.waiter.function_updated": 1,
+            },
+        )
+        self.assertEqual(
+            aws.functions["benchmark"]["Versions"][0]["CodeSize"], 8
+        )
+
+
+class TestS3Artifacts(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="python-lambda-test")
+        self.src = synthetic.make_project(
+            os.path.join(self.workdir, "project"), small_files=3,
+        )
+        self.requirements = os.path.join(self.workdir, "requirements.txt")
+        open(self.requirements, "w").close()
+        self.aws = FakeAWS()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def deploy_s3(self):
+        with self.aws.patch(), in_directory(self.src):
+            aws_lambda.deploy_s3(self.src, requirements=self.requirements)
+
+    def prune(self, **kwargs):
+        with self.aws.patch(), in_directory(self.src):
+            return aws_lambda.prune_artifacts(self.src, **kwargs)
+
+    def objects(self):
+        return self.aws.buckets["benchmark-bucket"]
+
+    def test_same_artifact_is_uploaded_once(self):
+        self.deploy_s3()
+        self.deploy_s3()
+        self.assertEqual(self.aws.call_counts()["s3.put_object"], 1)
+        ((key, body),) = self.objects().items()
+        self.assertEqual(
+            key, "dist/{}.zip".format(hashlib.sha256(body).hexdigest())
+        )
+        latest = self.aws.functions["benchmark"]["Versions"][0]
+        self.assertEqual(latest["CodeSize"], len(body))
+
+    def test_forbidden_head_uploads(self):
+        # What S3 answers for a missing key without s3:ListBucket.
+        forbidden = ClientError(
+            {"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject"
+        )
+        with mock.patch.object(FakeS3, "head_object", side_effect=forbidden):
+            self.deploy_s3()
+            self.deploy_s3()
+        self.assertEqual(self.aws.call_counts()["s3.put_object"], 2)
+        self.assertEqual(len(self.objects()), 1)
+
+    def test_rebuilds_with_dependencies_are_identical(self):
+        wheel = synthetic.make_wheel(
+            os.path.join(self.workdir, "wheels"),
+            "tinydep",
+            {"tinydep/__init__.py": b"VALUE = 1\n"},
+        )
+        with open(self.requirements, "w") as fh:
+            fh.write(wheel + "\n")
+
+        digests = []
+        for _ in range(2):
+            with in_directory(self.src):
+                path_to_zip_file = aws_lambda.build(
+                    self.src, requirements=self.requirements
+                )
+            with open(path_to_zip_file, "rb") as fh:
+                digests.append(hashlib.sha256(fh.read()).hexdigest())
+            os.remove(path_to_zip_file)
+        self.assertEqual(digests[0], digests[1])
+
+        self.deploy_s3()
+        self.deploy_s3()
+        self.assertEqual(self.aws.call_counts()["s3.put_object"], 1)
+
+    def test_prune_keeps_referenced_artifacts(self):
+        self.deploy_s3()
+        with open(os.path.join(self.src, "service.py"), "a") as fh:
+            fh.write("# changed\n")
+        self.deploy_s3()
+        self.objects()["dist/notes.txt"] = b"not an artifact"
+        self.assertEqual(len(self.objects()), 3)
+        self.assertEqual(self.prune(), [])
+
+        with self.aws.patch():
+            aws_lambda.get_client(
+                "lambda", None, None, None
+            ).delete_function(FunctionName="benchmark", Qualifier="1")
+        self.assertEqual(len(self.prune(dry_run=True)), 1)
+        self.assertEqual(len(self.objects()), 3)
+        (stale,) = self.prune()
+        self.assertNotIn(stale, self.objects())
+        self.assertEqual(len(self.objects()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+from aws_lambda.artifact import find_latest_bundle
+from aws_lambda.artifact import InvocationFailed
+from aws_lambda.aws_lambda import invoke
+from aws_lambda.helpers import LambdaTimeoutError
+
+CONFIG = """\
+function_name: bundled
+handler: service.handler
+timeout: {timeout}
+environment_variables:
+  GREETING: hello
+"""
+
+SERVICE = """\
+import os
+import sys
+
+import helper
+
+
+def handler(event, context):
+    print("log line")
+    if event.get("sleep"):
+        import time
+        time.sleep(event["sleep"])
+    return {
+        "greeting": os.environ["GREETING"] + " " + helper.NAME,
+        "task_root": os.environ["LAMBDA_TASK_ROOT"],
+        "path": sys.path,
+        "remaining": context.get_remaining_time_in_millis(),
+    }
+"""
+
+
+class TestInvokeFromDist(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp(prefix="aws-lambda-test")
+        self.addCleanup(shutil.rmtree, self.src)
+        self.write_config(timeout=3)
+        with open(os.path.join(self.src, "event.json"), "w") as fh:
+            json.dump({}, fh)
+        # Only the project directory has `unbundled`; the bundle can't
+        # import it.
+        with open(os.path.join(self.src, "unbundled.py"), "w") as fh:
+            fh.write("NAME = 'project'\n")
+        self.dist = os.path.join(self.src, "dist")
+        os.mkdir(self.dist)
+        self.bundle = self.make_bundle(
+            "2024-05-01-120000-bundled.zip",
+            {"service.py": SERVICE, "helper.py": "NAME = 'bundle'\n"},
+        )
+
+    def write_config(self, timeout):
+        with open(os.path.join(self.src, "config.yaml"), "w") as fh:
+            fh.write(CONFIG.format(timeout=timeout))
+
+    def make_bundle(self, name, files):
+        path = os.path.join(self.dist, name)
+        with zipfile.ZipFile(path, "w") as zfh:
+            for arcname, content in files.items():
+                zfh.writestr(arcname, content)
+        return path
+
+    def invoke(self, **kwargs):
+        with redirect_stdout(StringIO()) as out:
+            outcome = invoke(self.src, from_dist=True, **kwargs)
+        return outcome, out.getvalue()
+
+    def test_runs_the_latest_bundle_in_isolation(self):
+        self.make_bundle("2024-04-30-120000-bundled.zip", {})
+        self.make_bundle("bundled-watch.zip", {})
+        self.assertEqual(
+            find_latest_bundle(self.dist, "bundled"), self.bundle
+        )
+
+        outcome, out = self.invoke()
+        result = outcome["result"]
+        self.assertEqual(result["greeting"], "hello bundle")
+        self.assertEqual(result["path"][0], result["task_root"])
+        self.assertNotIn(self.src, result["path"])
+        self.assertFalse(any("site-packages" in p for p in result["path"]))
+        self.assertFalse(os.path.exists(result["task_root"]))
+        self.assertLessEqual(result["remaining"], 3000)
+        self.assertEqual(outcome["output"], "log line")
+        self.assertEqual(outcome["files"], 2)
+        for timing in ("extract_time", "import_time", "handler_time"):
+            self.assertGreaterEqual(outcome[timing], 0)
+        self.assertIn("extract: ", out)
+        self.assertIn("import: ", out)
+
+    def test_missing_dependency_fails_on_import(self):
+        bundle = self.make_bundle(
+            "2024-05-02-120000-bundled.zip",
+            {"service.py": "import unbundled\n"},
+        )
+        with self.assertRaises(InvocationFailed) as raised:
+            self.invoke(bundle=bundle)
+        self.assertIn("Importing service", str(raised.exception))
+        self.assertIn("unbundled", str(raised.exception))
+
+    def test_runtime_provided_packages_follow_the_bundle(self):
+        bundle = self.make_bundle(
+            "2024-05-02-120000-bundled.zip",
+            {
+                "service.py": (
+                    "import boto3\nimport jmespath\n\n\n"
+                    "def handler(event, context):\n"
+                    "    return [boto3.__name__, jmespath.NAME]\n"
+                ),
+                # The bundle's own copy wins over the runtime's.
+                "jmespath/__init__.py": "NAME = 'bundle'\n",
+            },
+        )
+        outcome, _ = self.invoke(bundle=bundle)
+        self.assertEqual(outcome["result"], ["boto3", "bundle"])
+
+    def test_timeout(self):
+        # Past the function's timeout but well within the init allowance,
+        # which only applies to the import.
+        self.write_config(timeout=1)
+        with open(os.path.join(self.src, "event.json"), "w") as fh:
+            json.dump({"sleep": 2}, fh)
+        with self.assertRaises(LambdaTimeoutError) as raised:
+            self.invoke()
+        self.assertIn(
+            "Task timed out after 1.00 seconds", str(raised.exception)
+        )
+
+    def test_init_timeout(self):
+        bundle = self.make_bundle(
+            "2024-05-02-120000-bundled.zip",
+            {"service.py": "import time\ntime.sleep(5)\n"},
+        )
+        with mock.patch("aws_lambda.artifact.INIT_TIMEOUT", 0.5):
+            with self.assertRaises(LambdaTimeoutError) as raised:
+                self.invoke(bundle=bundle)
+        self.assertIn("Init timed out", str(raised.exception))
+
+    def test_no_bundle(self):
+        shutil.rmtree(self.dist)
+        with self.assertRaises(ValueError):
+            self.invoke()
@@ -0,0 +1,88 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+from aws_lambda.logstats import collect_stats
+from aws_lambda.logstats import format_stats
+from aws_lambda.logstats import parse_window
+from tests.standins import FakeAWS
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "fixtures", "cloudwatch_report_events.json"
+)
+LOG_GROUP = "/aws/lambda/benchmark"
+
+
+class TestLogStats(unittest.TestCase):
+    def setUp(self):
+        with open(FIXTURE) as fh:
+            events = json.load(fh)["events"]
+        self.aws = FakeAWS()
+        self.aws.log_events[LOG_GROUP] = events
+        self.until = events[-1]["timestamp"] / 1000.0
+        self.cfg = {
+            "function_name": "benchmark",
+            "memory_size": 128,
+            "timeout": 3,
+        }
+
+    def collect(self, **kwargs):
+        return collect_stats(
+            self.aws.get_client("logs"),
+            self.cfg,
+            window="1d",
+            until=self.until,
+            **kwargs
+        )
+
+    def test_stats_by_version(self):
+        result = self.collect(page_size=7)
+        self.assertEqual(list(result["versions"]), ["1", "2"])
+        v1, v2 = result["versions"]["1"], result["versions"]["2"]
+        self.assertEqual(v1["invocations"], 12)
+        self.assertEqual(v1["cold_starts"], 2)
+        self.assertAlmostEqual(v1["cold_start_rate"], 2 / 12.0)
+        self.assertEqual(v1["init_duration"]["count"], 2)
+        self.assertEqual(v1["timeouts"], 0)
+        self.assertEqual(v2["invocations"], 10)
+        self.assertEqual(v2["timeouts"], 1)
+        self.assertEqual(v2["duration"]["max"], 3000.0)
+        self.assertEqual(v2["memory_size"], 128)
+        self.assertLessEqual(v2["memory_utilization"], 80 / 128.0)
+        self.assertEqual(result["all"]["invocations"], 22)
+        self.assertEqual(result["all"]["timeouts"], 1)
+
+        # START/END lines are filtered out, and the events were paged.
+        self.assertEqual(
+            self.aws.call_counts()["logs.filter_log_events"], 4
+        )
+        json.dumps(result)
+
+    def test_function_name_override(self):
+        self.aws.log_events["/aws/lambda/other"] = self.aws.log_events.pop(
+            LOG_GROUP
+        )
+        with mock.patch.dict(os.environ, {"LAMBDA_FUNCTION_NAME": "other"}):
+            result = self.collect()
+        self.assertEqual(result["log_group"], "/aws/lambda/other")
+        self.assertEqual(result["all"]["invocations"], 22)
+
+    def test_window(self):
+        self.assertEqual(parse_window("90m"), 5400)
+        with self.assertRaises(ValueError):
+            parse_window("1 week")
+        result = collect_stats(
+            self.aws.get_client("logs"),
+            self.cfg,
+            window="1s",
+            until=0,
+        )
+        self.assertEqual(result["versions"], {})
+        self.assertIn("No REPORT lines", format_stats(result))
+
+    def test_table(self):
+        table = format_stats(self.collect())
+        self.assertIn("all", table)
+        self.assertIn("memory_size 128MB", table)
+        self.assertIn("timeout 3s: p99 duration 3.00s", table)
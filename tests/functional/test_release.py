@@ -0,0 +1,293 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from aws_lambda import aws_lambda
+from aws_lambda.canary import CanaryFailed
+from aws_lambda.release import get_release_settings
+from aws_lambda.release import release
+from aws_lambda.release import ProvisioningFailed
+from aws_lambda.release import set_provisioned_concurrency
+from aws_lambda.release import wait_for_provisioned_concurrency
+from tests.benchmarks import in_directory
+from tests.benchmarks import synthetic
+from tests.standins import FakeAWS
+
+LAMBDA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "scripts",
+    "lambda",
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRelease(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="python-lambda-test")
+        self.src = synthetic.make_project(
+            os.path.join(self.workdir, "project"), small_files=3,
+        )
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write("alias: live\nprovisioned_concurrency: 3\nprewarm: 4\n")
+        self.requirements = os.path.join(self.workdir, "requirements.txt")
+        open(self.requirements, "w").close()
+        self.aws = FakeAWS()
+        self.aws.provisioning_polls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def deploy(self):
+        self.aws.calls = []
+        with self.aws.patch(), in_directory(self.src):
+            aws_lambda.deploy(self.src, requirements=self.requirements)
+        return self.aws.functions["benchmark"]
+
+    def test_deploy_moves_alias_after_prewarm(self):
+        fn = self.deploy()
+        self.assertEqual(fn["Aliases"]["live"]["FunctionVersion"], "1")
+        self.assertEqual(fn["ProvisionedConcurrency"]["1"]["Requested"], 3)
+        counts = self.aws.call_counts()
+        self.assertEqual(counts["lambda.invoke"], 4)
+        self.assertEqual(counts["lambda.create_alias"], 1)
+        self.assertEqual(counts["lambda.waiter.published_version_active"], 1)
+        self.assertEqual(
+            [version for _, version, _, _ in self.aws.invocations],
+            ["1"] * 4,
+        )
+
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write("memory_size: 1024\n")
+        fn = self.deploy()
+        self.assertEqual(fn["Aliases"]["live"]["FunctionVersion"], "2")
+        self.assertEqual(self.aws.call_counts()["lambda.update_alias"], 1)
+        calls = [op for _, op in self.aws.calls]
+        self.assertLess(
+            calls.index("invoke"), calls.index("update_alias"),
+        )
+        # The new version's environments are ready before it gets traffic,
+        # and the old version's are released afterwards.
+        self.assertLess(
+            calls.index("get_provisioned_concurrency_config"),
+            calls.index("update_alias"),
+        )
+        self.assertEqual(list(fn["ProvisionedConcurrency"]), ["2"])
+        # The version is published with the updated configuration.
+        self.assertLess(
+            calls.index("update_function_configuration"),
+            calls.index("publish_version"),
+        )
+        self.assertEqual(fn["Versions"][-1]["MemorySize"], 1024)
+
+    def test_invalid_release_settings_fail_before_building(self):
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write("canary:\n  steps: [150]\n")
+        with self.assertRaises(ValueError):
+            self.deploy()
+        self.assertEqual(self.aws.calls, [])
+        self.assertFalse(os.path.exists(os.path.join(self.src, "dist")))
+
+    def test_without_alias_nothing_changes(self):
+        settings = get_release_settings({"prewarm": 0})
+        self.assertIsNone(settings["alias"])
+        self.assertIsNone(settings["provisioned_concurrency"])
+        with self.assertRaises(ValueError):
+            get_release_settings({"provisioned_concurrency": 2})
+
+    def test_wait_for_provisioned_concurrency(self):
+        self.deploy()
+        self.aws.provisioning_polls = 3
+        client = self.aws.get_client("lambda")
+        set_provisioned_concurrency(client, "benchmark", "1", 3)
+        clock = FakeClock()
+        config = wait_for_provisioned_concurrency(
+            client, "benchmark", "1", sleep=clock.sleep, clock=clock,
+        )
+        self.assertEqual(config["Status"], "READY")
+        self.assertEqual(clock.sleeps, [5, 5, 5])
+
+        set_provisioned_concurrency(client, "benchmark", "1", 3)
+        with self.assertRaises(ProvisioningFailed):
+            wait_for_provisioned_concurrency(
+                client,
+                "benchmark",
+                "1",
+                timeout=7,
+                sleep=clock.sleep,
+                clock=clock,
+            )
+
+
+class TestCanary(unittest.TestCase):
+    def setUp(self):
+        self.aws = FakeAWS()
+        self.client = self.aws.get_client("lambda")
+        self.cloudwatch = self.aws.get_client("cloudwatch")
+        self.client.create_function(
+            FunctionName="benchmark",
+            Code={"ZipFile": b"v1"},
+            Publish=True,
+        )
+        self.client.update_function_code(
+            FunctionName="benchmark", ZipFile=b"v2", Publish=True
+        )
+        self.client.create_alias(
+            FunctionName="benchmark", Name="live", FunctionVersion="1"
+        )
+        self.settings = get_release_settings(
+            {
+                "alias": "live",
+                "canary": {
+                    "steps": [10, 50],
+                    "interval": 120,
+                    "max_p95_regression": 0.2,
+                },
+            }
+        )
+        self.aws.metrics["1"] = {
+            "p95": 100.0,
+            "errors": 0,
+            "invocations": 900,
+        }
+        self.clock = FakeClock()
+
+    def release(self):
+        self.aws.calls = []
+        return release(
+            self.client,
+            "benchmark",
+            "2",
+            self.settings,
+            sleep=self.clock.sleep,
+            clock=self.clock,
+            cloudwatch=self.cloudwatch,
+        )
+
+    def test_promotes_after_every_step(self):
+        self.aws.metrics["2"] = {"p95": 110.0, "errors": 0, "invocations": 90}
+        timings = self.release()
+        alias = self.aws.functions["benchmark"]["Aliases"]["live"]
+        self.assertEqual(alias["FunctionVersion"], "2")
+        self.assertEqual(
+            alias["RoutingConfig"], {"AdditionalVersionWeights": {}}
+        )
+        # Each step waits out the interval plus the metrics delay.
+        self.assertEqual(self.clock.sleeps, [240, 240])
+        self.assertEqual(
+            self.aws.call_counts()["cloudwatch.get_metric_data"], 2
+        )
+        self.assertIn("canary", timings)
+
+    def test_rolls_back_on_p95_regression(self):
+        self.aws.metrics["2"] = {"p95": 130.0, "errors": 0, "invocations": 90}
+        with self.assertRaises(CanaryFailed) as raised:
+            self.release()
+        self.assertIn("p95", str(raised.exception))
+        alias = self.aws.functions["benchmark"]["Aliases"]["live"]
+        self.assertEqual(alias["FunctionVersion"], "1")
+        self.assertEqual(
+            alias["RoutingConfig"], {"AdditionalVersionWeights": {}}
+        )
+        # Rolled back after the first step.
+        self.assertEqual(self.clock.sleeps, [240])
+
+    def test_rollback_releases_provisioned_concurrency(self):
+        self.aws.provisioning_polls = 0
+        self.settings["provisioned_concurrency"] = 2
+        self.aws.metrics["2"] = {"p95": 130.0, "errors": 0, "invocations": 90}
+        with self.assertRaises(CanaryFailed):
+            self.release()
+        calls = [op for _, op in self.aws.calls]
+        self.assertLess(
+            calls.index("get_provisioned_concurrency_config"),
+            calls.index("update_alias"),
+        )
+        self.assertEqual(
+            self.aws.functions["benchmark"]["ProvisionedConcurrency"], {}
+        )
+
+    def test_no_traffic_is_not_a_pass(self):
+        with self.assertRaises(CanaryFailed) as raised:
+            self.release()
+        self.assertIn("only 0 invocations", str(raised.exception))
+        alias = self.aws.functions["benchmark"]["Aliases"]["live"]
+        self.assertEqual(alias["FunctionVersion"], "1")
+
+        self.aws.metrics["2"] = {"errors": 0, "invocations": 90}
+        with self.assertRaises(CanaryFailed) as raised:
+            self.release()
+        self.assertIn("no Duration datapoints", str(raised.exception))
+
+        with self.assertRaises(ValueError):
+            get_release_settings(
+                {"alias": "live", "canary": {"min_invocations": 0}}
+            )
+
+    def test_rolls_back_on_errors(self):
+        self.aws.metrics["2"] = {"p95": 90.0, "errors": 9, "invocations": 90}
+        with self.assertRaises(CanaryFailed):
+            self.release()
+
+    def test_first_deploy_skips_the_canary(self):
+        self.aws.functions["benchmark"]["Aliases"].clear()
+        self.release()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertNotIn("cloudwatch.get_metric_data", self.aws.call_counts())
+
+    def test_canary_requires_an_alias(self):
+        with self.assertRaises(ValueError):
+            get_release_settings({"canary": {"steps": [10]}})
+
+
+class TestCliErrors(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp(prefix="python-lambda-test")
+        self.addCleanup(shutil.rmtree, self.src, ignore_errors=True)
+        synthetic.make_project(self.src)
+
+    def run_cli(self, command, config):
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write(config)
+        return subprocess.run(
+            [sys.executable, LAMBDA, command],
+            cwd=self.src,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+    def assertCleanError(self, process, message):
+        stderr = process.stderr.decode("utf-8")
+        self.assertEqual(process.returncode, 1, stderr)
+        self.assertNotIn("Traceback", stderr)
+        self.assertIn("Error: " + message, stderr)
+
+    def test_invalid_release_settings(self):
+        process = self.run_cli("deploy", "provisioned_concurrency: 2\n")
+        self.assertCleanError(
+            process, "provisioned_concurrency requires an alias"
+        )
+
+    def test_invalid_dependencies_mode(self):
+        process = self.run_cli("build", "  dependencies: lock\n")
+        self.assertCleanError(
+            process, "build: dependencies must be freeze or closure"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
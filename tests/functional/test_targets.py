@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from aws_lambda import aws_lambda
+from aws_lambda.targets import DeployFailed
+from aws_lambda.targets import get_targets
+from tests.benchmarks import in_directory
+from tests.benchmarks import synthetic
+from tests.standins import FakeAWS
+
+TARGETS = """\
+targets:
+  - region: us-east-1
+    stage: prod
+  - region: eu-west-1
+    stage: prod
+    bucket_name: benchmark-bucket-eu
+    memory_size: 1024
+    environment_variables:
+      env_2: bar
+  - name: staging
+    function_name: benchmark-staging
+"""
+
+
+class TestTargets(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="python-lambda-test")
+        self.src = synthetic.make_project(
+            os.path.join(self.workdir, "project"), small_files=3,
+        )
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write(TARGETS)
+        self.requirements = os.path.join(self.workdir, "requirements.txt")
+        open(self.requirements, "w").close()
+        self.aws = FakeAWS()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def deploy(self, deploy_fn, **kwargs):
+        self.aws.calls = []
+        with self.aws.patch(), in_directory(self.src):
+            return deploy_fn(
+                self.src, requirements=self.requirements, **kwargs
+            )
+
+    def test_overrides(self):
+        cfg = aws_lambda.read_cfg(
+            os.path.join(self.src, "config.yaml"), None
+        )
+        targets = dict(get_targets(cfg))
+        self.assertEqual(
+            list(targets), ["prod-us-east-1", "prod-eu-west-1", "staging"]
+        )
+        eu = targets["prod-eu-west-1"]
+        self.assertEqual(eu["function_name"], "benchmark-prod")
+        self.assertEqual(eu["memory_size"], 1024)
+        self.assertEqual(
+            eu["environment_variables"], {"env_1": "foo", "env_2": "bar"}
+        )
+        self.assertEqual(targets["staging"]["region"], "us-east-1")
+        self.assertNotIn("targets", eu)
+        with self.assertRaises(ValueError):
+            get_targets(cfg, ["nowhere"])
+
+    def test_deploy_s3_builds_once_and_copies(self):
+        with mock.patch.object(
+            aws_lambda, "build", wraps=aws_lambda.build
+        ) as build:
+            results = self.deploy(aws_lambda.deploy_s3)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual([r["status"] for r in results], ["ok"] * 3)
+
+        calls = self.aws.call_counts()
+        self.assertEqual(calls["s3.put_object"], 1)
+        self.assertEqual(calls["s3.copy_object"], 1)
+        self.assertEqual(
+            self.aws.buckets["benchmark-bucket"],
+            self.aws.buckets["benchmark-bucket-eu"],
+        )
+        us = self.aws.functions_in("us-east-1")
+        eu = self.aws.functions_in("eu-west-1")
+        self.assertEqual(sorted(us), ["benchmark-prod", "benchmark-staging"])
+        self.assertEqual(list(eu), ["benchmark-prod"])
+        self.assertEqual(
+            eu["benchmark-prod"]["Configuration"]["MemorySize"], 1024
+        )
+
+    def test_failed_target_doesnt_stop_the_others(self):
+        deploy_function = aws_lambda.deploy_function
+
+        def flaky(cfg, *args, **kwargs):
+            if cfg["region"] == "eu-west-1":
+                raise RuntimeError("region unavailable")
+            return deploy_function(cfg, *args, **kwargs)
+
+        with mock.patch.object(aws_lambda, "deploy_function", flaky):
+            with self.assertRaises(DeployFailed) as raised:
+                self.deploy(aws_lambda.deploy)
+        self.assertIn("prod-eu-west-1", str(raised.exception))
+        self.assertEqual(
+            sorted(self.aws.functions_in("us-east-1")),
+            ["benchmark-prod", "benchmark-staging"],
+        )
+
+    def test_only_selected_targets(self):
+        results = self.deploy(aws_lambda.deploy, targets=["staging"])
+        self.assertEqual([r["name"] for r in results], ["staging"])
+        self.assertEqual(list(self.aws.functions), ["benchmark-staging"])
+
+    def test_single_target_overrides_are_rejected(self):
+        for key in ("LAMBDA_FUNCTION_NAME", "S3_BUCKET_NAME"):
+            with self.subTest(key=key), mock.patch.dict(
+                os.environ, {key: "elsewhere"}
+            ):
+                with self.assertRaises(ValueError) as raised:
+                    self.deploy(aws_lambda.deploy_s3)
+                self.assertIn(key, str(raised.exception))
+                self.assertEqual(self.aws.calls, [])
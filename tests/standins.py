@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""In-memory stand-ins for the AWS APIs python-lambda talks to.
+
+The stand-ins implement just enough of the Lambda, S3 and STS client surface
+for ``deploy``, ``deploy_s3`` and ``upload`` to run end to end without network
+access, and record every call so tests and benchmarks can count them.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+ACCOUNT_ID = "123456789012"
+
+
+def _client_error(code, message, operation):
+    return ClientError(
+        {"Error": {"Code": code, "Message": message}}, operation
+    )
+
+
+class _Exceptions:
+    """Mimics the ``client.exceptions`` namespace of a boto3 client."""
+
+    ClientError = ClientError
+
+    class ResourceNotFoundException(ClientError):
+        pass
+
+    class ResourceConflictException(ClientError):
+        pass
+
+
+class _Waiter:
+    def __init__(self, aws, name):
+        self.aws = aws
+        self.name = name
+
+    def wait(self, **kwargs):
+        self.aws.record("lambda", "waiter.{}".format(self.name))
+
+
+class FakeAWS:
+    """A tiny account holding Lambda functions, S3 objects and call logs."""
+
+    def __init__(self, region="us-east-1"):
+        self.region = region
+        self.lock = threading.Lock()
+        self.calls = []
+        self.clients_created = 0
+        self.functions = {}
+        self.regions = {self.region: self.functions}
+        self.buckets = {}
+        # Invocation behaviour, see `FakeLambda.invoke`.
+        self.invocations = []
+        self.durations = [10.0]
+        self.init_duration = 250.0
+        self.function_error = None
+        # `get_provisioned_concurrency_config` calls before READY.
+        self.provisioning_polls = 2
+        # CloudWatch metrics per executed version: a dict with ``p95``,
+        # ``errors`` and ``invocations``, see `FakeCloudWatch`.
+        self.metrics = {}
+        # CloudWatch Logs events by log group, see `FakeLogs`.
+        self.log_events = {}
+
+    def functions_in(self, region):
+        """The functions of `region`; ``functions`` holds the default's."""
+        with self.lock:
+            return self.regions.setdefault(region, {})
+
+    def record(self, service, operation):
+        with self.lock:
+            self.calls.append((service, operation))
+
+    def call_counts(self):
+        """Return a mapping of ``service.operation`` to number of calls."""
+        return dict(Counter("{}.{}".format(svc, op) for svc, op in self.calls))
+
+    def get_client(
+        self,
+        client,
+        profile_name=None,
+        aws_access_key_id=None,
+        aws_secret_access_key=None,
+        region=None,
+    ):
+        self.clients_created += 1
+        cls = {
+            "lambda": FakeLambda,
+            "s3": FakeS3,
+            "sts": FakeSTS,
+            "cloudwatch": FakeCloudWatch,
+            "logs": FakeLogs,
+        }[client]
+        return cls(self, region or self.region)
+
+    @contextmanager
+    def patch(self):
+        """Route ``aws_lambda.aws_lambda.get_client`` to this stand-in."""
+        with mock.patch("aws_lambda.aws_lambda.get_client", self.get_client):
+            yield self
+
+
+class _FakeClient:
+    service = None
+
+    def __init__(self, aws, region):
+        self.aws = aws
+        self.region = region
+        self.exceptions = _Exceptions
+
+    def _record(self, operation):
+        self.aws.record(self.service, operation)
+
+
+class FakeSTS(_FakeClient):
+    service = "sts"
+
+    def get_caller_identity(self):
+        self._record("get_caller_identity")
+        return {"Account": ACCOUNT_ID}
+
+
+class FakeLambda(_FakeClient):
+    service = "lambda"
+
+    @property
+    def functions(self):
+        return self.aws.functions_in(self.region)
+
+    def _arn(self, name):
+        return "arn:aws:lambda:{}:{}:function:{}".format(
+            self.region,
+            ACCOUNT_ID,
+            name,
+        )
+
+    def _get(self, name, operation):
+        try:
+            return self.functions[name]
+        except KeyError:
+            raise _Exceptions.ResourceNotFoundException(
+                {
+                    "Error": {
+                        "Code": "ResourceNotFoundException",
+                        "Message": "Function not found: {}".format(
+                            self._arn(name)
+                        ),
+                    }
+                },
+                operation,
+            )
+
+    def _code_from(self, kwargs):
+        if "ZipFile" in kwargs:
+            return kwargs["ZipFile"]
+        bucket = self.aws.buckets[kwargs["S3Bucket"]]
+        return bucket[kwargs["S3Key"]]
+
+    @staticmethod
+    def _code_attributes(code):
+        digest = hashlib.sha256(code).digest()
+        return {
+            "CodeSha256": base64.b64encode(digest).decode("ascii"),
+            "CodeSize": len(code),
+        }
+
+    def _publish(self, fn, code):
+        version = str(len(fn["Versions"]))
+        config = dict(
+            fn["Configuration"], Version=version, **self._code_attributes(code)
+        )
+        fn["Versions"].append(config)
+        return config
+
+    def get_function(self, FunctionName, Qualifier=None):
+        self._record("get_function")
+        fn = self._get(FunctionName, "GetFunction")
+        result = {"Configuration": dict(fn["Configuration"])}
+        if fn["Tags"]:
+            result["Tags"] = dict(fn["Tags"])
+        if fn["Concurrency"]:
+            result["Concurrency"] = {
+                "ReservedConcurrentExecutions": fn["Concurrency"],
+            }
+        return result
+
+    def create_function(self, **kwargs):
+        self._record("create_function")
+        name = kwargs["FunctionName"]
+        if name in self.functions:
+            raise _client_error(
+                "ResourceConflictException",
+                "Function already exist: {}".format(name),
+                "CreateFunction",
+            )
+        code = kwargs["Code"]
+        if "ZipFile" not in code:
+            code = {"S3Bucket": code["S3Bucket"], "S3Key": code["S3Key"]}
+        configuration = {
+            key: value
+            for key, value in kwargs.items()
+            if key not in ("Code", "Tags", "Publish")
+        }
+        configuration.update(
+            FunctionArn=self._arn(name),
+            Version="$LATEST",
+        )
+        fn = {
+            "Configuration": configuration,
+            "Versions": [],
+            "Tags": dict(kwargs.get("Tags", {})),
+            "Concurrency": 0,
+            "Aliases": {},
+            "ProvisionedConcurrency": {},
+        }
+        self.functions[name] = fn
+        latest = self._publish(fn, self._code_from(code))
+        latest["Version"] = "$LATEST"
+        if kwargs.get("Publish"):
+            return self._publish(fn, self._code_from(code))
+        return dict(configuration)
+
+    def update_function_code(self, FunctionName, Publish=False, **kwargs):
+        self._record("update_function_code")
+        fn = self._get(FunctionName, "UpdateFunctionCode")
+        code = self._code_from(kwargs)
+        fn["Versions"][0] = dict(
+            fn["Versions"][0], **self._code_attributes(code)
+        )
+        if Publish:
+            return self._publish(fn, code)
+        return dict(fn["Configuration"])
+
+    def publish_version(self, FunctionName, **kwargs):
+        """Publishes the current code and configuration of ``$LATEST``."""
+        self._record("publish_version")
+        fn = self._get(FunctionName, "PublishVersion")
+        latest = fn["Versions"][0]
+        config = dict(
+            fn["Configuration"],
+            Version=str(len(fn["Versions"])),
+            CodeSha256=latest["CodeSha256"],
+            CodeSize=latest["CodeSize"],
+        )
+        fn["Versions"].append(config)
+        return dict(config)
+
+    def update_function_configuration(self, FunctionName, **kwargs):
+        self._record("update_function_configuration")
+        fn = self._get(FunctionName, "UpdateFunctionConfiguration")
+        fn["Configuration"].update(kwargs)
+        return dict(fn["Configuration"])
+
+    def get_waiter(self, name):
+        return _Waiter(self.aws, name)
+
+    def put_function_concurrency(
+        self, FunctionName, ReservedConcurrentExecutions
+    ):
+        self._record("put_function_concurrency")
+        fn = self._get(FunctionName, "PutFunctionConcurrency")
+        fn["Concurrency"] = ReservedConcurrentExecutions
+
+    def delete_function_concurrency(self, FunctionName):
+        self._record("delete_function_concurrency")
+        self._get(FunctionName, "DeleteFunctionConcurrency")["Concurrency"] = 0
+
+    def _by_arn(self, arn):
+        return self._get(arn.rsplit(":", 1)[-1], "TagResource")
+
+    def tag_resource(self, Resource, Tags):
+        self._record("tag_resource")
+        self._by_arn(Resource)["Tags"].update(Tags)
+
+    def untag_resource(self, Resource, TagKeys):
+        self._record("untag_resource")
+        tags = self._by_arn(Resource)["Tags"]
+        for key in TagKeys:
+            tags.pop(key, None)
+
+    def list_versions_by_function(self, FunctionName, **kwargs):
+        self._record("list_versions_by_function")
+        fn = self._get(FunctionName, "ListVersionsByFunction")
+        return {"Versions": [dict(v) for v in fn["Versions"]]}
+
+    def delete_function(self, FunctionName, Qualifier=None):
+        self._record("delete_function")
+        fn = self._get(FunctionName, "DeleteFunction")
+        if Qualifier is None:
+            del self.functions[FunctionName]
+        else:
+            fn["Versions"] = [
+                v for v in fn["Versions"] if v["Version"] != Qualifier
+            ]
+
+    def _alias(self, fn, name, operation):
+        try:
+            return fn["Aliases"][name]
+        except KeyError:
+            raise _Exceptions.ResourceNotFoundException(
+                {
+                    "Error": {
+                        "Code": "ResourceNotFoundException",
+                        "Message": "Alias not found: {}:{}".format(
+                            fn["Configuration"]["FunctionArn"], name,
+                        ),
+                    }
+                },
+                operation,
+            )
+
+    def get_alias(self, FunctionName, Name):
+        self._record("get_alias")
+        fn = self._get(FunctionName, "GetAlias")
+        return dict(self._alias(fn, Name, "GetAlias"))
+
+    def create_alias(self, FunctionName, Name, FunctionVersion, **kwargs):
+        self._record("create_alias")
+        fn = self._get(FunctionName, "CreateAlias")
+        fn["Aliases"][Name] = {
+            "Name": Name,
+            "FunctionVersion": FunctionVersion,
+            "AliasArn": "{}:{}".format(self._arn(FunctionName), Name),
+        }
+        fn["Aliases"][Name].update(kwargs)
+        return dict(fn["Aliases"][Name])
+
+    def update_alias(self, FunctionName, Name, **kwargs):
+        self._record("update_alias")
+        fn = self._get(FunctionName, "UpdateAlias")
+        alias = self._alias(fn, Name, "UpdateAlias")
+        alias.update(kwargs)
+        if Name in fn["ProvisionedConcurrency"]:
+            # Moving the alias provisions environments for the new version.
+            fn["ProvisionedConcurrency"][Name]["Polls"] = 0
+        return dict(alias)
+
+    def put_provisioned_concurrency_config(
+        self, FunctionName, Qualifier, ProvisionedConcurrentExecutions
+    ):
+        self._record("put_provisioned_concurrency_config")
+        fn = self._get(FunctionName, "PutProvisionedConcurrencyConfig")
+        if not any(v["Version"] == Qualifier for v in fn["Versions"][1:]):
+            self._alias(fn, Qualifier, "PutProvisionedConcurrencyConfig")
+        fn["ProvisionedConcurrency"][Qualifier] = {
+            "Requested": ProvisionedConcurrentExecutions,
+            "Polls": 0,
+        }
+        return {
+            "RequestedProvisionedConcurrentExecutions": (
+                ProvisionedConcurrentExecutions
+            ),
+            "Status": "IN_PROGRESS",
+        }
+
+    def get_provisioned_concurrency_config(self, FunctionName, Qualifier):
+        """Reports ``READY`` after ``FakeAWS.provisioning_polls`` polls."""
+        self._record("get_provisioned_concurrency_config")
+        fn = self._get(FunctionName, "GetProvisionedConcurrencyConfig")
+        try:
+            config = fn["ProvisionedConcurrency"][Qualifier]
+        except KeyError:
+            raise _client_error(
+                "ProvisionedConcurrencyConfigNotFoundException",
+                "No Provisioned Concurrency Config found",
+                "GetProvisionedConcurrencyConfig",
+            )
+        config["Polls"] += 1
+        ready = config["Polls"] > self.aws.provisioning_polls
+        return {
+            "RequestedProvisionedConcurrentExecutions": config["Requested"],
+            "AvailableProvisionedConcurrentExecutions": (
+                config["Requested"] if ready else 0
+            ),
+            "Status": "READY" if ready else "IN_PROGRESS",
+        }
+
+    def delete_provisioned_concurrency_config(self, FunctionName, Qualifier):
+        self._record("delete_provisioned_concurrency_config")
+        fn = self._get(FunctionName, "DeleteProvisionedConcurrencyConfig")
+        fn["ProvisionedConcurrency"].pop(Qualifier, None)
+
+    def _resolve(self, fn, qualifier):
+        qualifier = qualifier or "$LATEST"
+        if qualifier in fn["Aliases"]:
+            qualifier = fn["Aliases"][qualifier]["FunctionVersion"]
+        for version in fn["Versions"]:
+            if version["Version"] == qualifier:
+                return version
+        raise _Exceptions.ResourceNotFoundException(
+            {
+                "Error": {
+                    "Code": "ResourceNotFoundException",
+                    "Message": "Function not found: {}:{}".format(
+                        fn["Configuration"]["FunctionArn"], qualifier,
+                    ),
+                }
+            },
+            "Invoke",
+        )
+
+    def invoke(
+        self,
+        FunctionName,
+        InvocationType="RequestResponse",
+        LogType="None",
+        Payload=b"",
+        Qualifier=None,
+    ):
+        """Echo the payload; the first call per version is a cold start.
+
+        Durations come from ``FakeAWS.durations`` (milliseconds) so tests
+        control what the REPORT lines say.
+        """
+        self._record("invoke")
+        fn = self._get(FunctionName, "Invoke")
+        version = self._resolve(fn, Qualifier)
+        with self.aws.lock:
+            warm = version.setdefault("_warm", [])
+            cold = not warm
+            warm.append(True)
+            duration = self.aws.durations[
+                (len(self.aws.invocations)) % len(self.aws.durations)
+            ]
+            request_id = "req-{}".format(len(self.aws.invocations))
+            self.aws.invocations.append(
+                (FunctionName, version["Version"], cold, duration)
+            )
+        report = (
+            "REPORT RequestId: {}\tDuration: {:.2f} ms\t"
+            "Billed Duration: {} ms\tMemory Size: {} MB\t"
+            "Max Memory Used: 60 MB\t".format(
+                request_id,
+                duration,
+                int(duration) + 1,
+                version.get("MemorySize", 128),
+            )
+        )
+        if cold:
+            report += "Init Duration: {:.2f} ms\t".format(
+                self.aws.init_duration
+            )
+        log = "START RequestId: {0}\nEND RequestId: {0}\n{1}\n".format(
+            request_id, report,
+        )
+        response = {
+            "StatusCode": 200,
+            "ExecutedVersion": version["Version"],
+            "Payload": io.BytesIO(Payload or b"null"),
+        }
+        if LogType == "Tail":
+            response["LogResult"] = base64.b64encode(
+                log.encode("utf-8")
+            ).decode("ascii")
+        if self.aws.function_error:
+            response["FunctionError"] = "Unhandled"
+            response["Payload"] = io.BytesIO(
+                json.dumps({"errorMessage": self.aws.function_error}).encode()
+            )
+        return response
+
+
+class FakeS3(_FakeClient):
+    service = "s3"
+
+    def _bucket(self, name):
+        return self.aws.buckets.setdefault(name, {})
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._record("put_object")
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        self._bucket(Bucket)[Key] = Body
+        return {"ETag": '"{}"'.format(hashlib.md5(Body).hexdigest())}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._record("copy_object")
+        try:
+            body = self._bucket(CopySource["Bucket"])[CopySource["Key"]]
+        except KeyError:
+            raise _client_error("NoSuchKey", "Not Found", "CopyObject")
+        self._bucket(Bucket)[Key] = body
+        return {"CopyObjectResult": {}}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._record("head_object")
+        try:
+            body = self._bucket(Bucket)[Key]
+        except KeyError:
+            raise _client_error("404", "Not Found", "HeadObject")
+        return {"ContentLength": len(body)}
+
+    def list_objects_v2(
+        self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=1000
+    ):
+        self._record("list_objects_v2")
+        keys = sorted(k for k in self._bucket(Bucket) if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        stop = start + MaxKeys
+        page = keys[start:stop]
+        response = {
+            "Contents": [
+                {"Key": k, "Size": len(self._bucket(Bucket)[k])} for k in page
+            ],
+            "IsTruncated": start + MaxKeys < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        self._record("delete_objects")
+        bucket = self._bucket(Bucket)
+        for obj in Delete["Objects"]:
+            bucket.pop(obj["Key"], None)
+        return {}
+
+
+class FakeCloudWatch(_FakeClient):
+    service = "cloudwatch"
+
+    STATS = {
+        "Duration": "p95",
+        "Errors": "errors",
+        "Invocations": "invocations",
+    }
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, **kwargs):
+        """Answer Lambda metric queries from ``FakeAWS.metrics``."""
+        self._record("get_metric_data")
+        results = []
+        for query in MetricDataQueries:
+            metric = query["MetricStat"]["Metric"]
+            dimensions = {d["Name"]: d["Value"] for d in metric["Dimensions"]}
+            version = self.aws.metrics.get(dimensions.get("ExecutedVersion"))
+            value = None
+            if version is not None:
+                value = version.get(self.STATS[metric["MetricName"]])
+            results.append(
+                {
+                    "Id": query["Id"],
+                    "Values": [] if value is None else [value],
+                    "StatusCode": "Complete",
+                }
+            )
+        return {"MetricDataResults": results}
+
+
+class _Paginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        page_size = (PaginationConfig or {}).get("PageSize")
+        while True:
+            response = self.method(limit=page_size, **kwargs)
+            yield response
+            if not response.get("nextToken"):
+                return
+            kwargs["nextToken"] = response["nextToken"]
+
+
+class FakeLogs(_FakeClient):
+    service = "logs"
+
+    def get_paginator(self, name):
+        return _Paginator(getattr(self, name))
+
+    def filter_log_events(
+        self,
+        logGroupName,
+        startTime=0,
+        endTime=None,
+        filterPattern="",
+        nextToken=None,
+        limit=None,
+    ):
+        """Serve ``FakeAWS.log_events``; ``?"term"`` patterns only."""
+        self._record("filter_log_events")
+        terms = re.findall(r'"([^"]*)"', filterPattern)
+        events = [
+            event
+            for event in self.aws.log_events.get(logGroupName, [])
+            if startTime <= event["timestamp"]
+            and (endTime is None or event["timestamp"] <= endTime)
+            and (not terms or any(t in event["message"] for t in terms))
+        ]
+        start = int(nextToken or 0)
+        limit = limit or 10000
+        stop = start + limit
+        response = {"events": events[start:stop]}
+        if stop < len(events):
+            response["nextToken"] = str(stop)
+        return response
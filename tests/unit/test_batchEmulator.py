@@ -0,0 +1,116 @@
+import base64
+import json
+import unittest
+from collections import deque
+
+from aws_lambda.batching import emulate
+from aws_lambda.batching import failed_identifiers
+from aws_lambda.batching import next_batch
+from aws_lambda.batching import Pending
+from aws_lambda.batching import to_dynamodb
+
+
+class FakeClock:
+    """A clock the test handlers advance by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBatchEmulator(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.events = []
+
+    def handler(self, event, context):
+        self.events.append(event)
+        self.clock.now += 0.001 + 0.0001 * len(event["Records"])
+
+    def test_sqs_batches(self):
+        result = emulate(
+            self.handler, list(range(25)), batch_size=10, clock=self.clock,
+        )
+        self.assertEqual(
+            [len(e["Records"]) for e in self.events], [10, 10, 5],
+        )
+        record = self.events[0]["Records"][3]
+        self.assertEqual(record["eventSource"], "aws:sqs")
+        self.assertEqual(record["body"], "3")
+        self.assertEqual(result["succeeded"], 25)
+        self.assertEqual(result["invocations"], 3)
+        self.assertAlmostEqual(result["handler_seconds"], 0.0055)
+
+    def test_kinesis_records_are_base64(self):
+        emulate(self.handler, [{"a": 1}], event_source="kinesis")
+        data = self.events[0]["Records"][0]["kinesis"]["data"]
+        self.assertEqual(json.loads(base64.b64decode(data)), {"a": 1})
+
+    def test_dynamodb_images(self):
+        emulate(self.handler, [{"id": "x", "n": 2}], event_source="dynamodb")
+        image = self.events[0]["Records"][0]["dynamodb"]["NewImage"]
+        self.assertEqual(image, {"id": {"S": "x"}, "n": {"N": "2"}})
+        self.assertEqual(
+            to_dynamodb([True, None]), {"L": [{"BOOL": True}, {"NULL": True}]}
+        )
+
+    def test_sqs_partial_failures_are_requeued(self):
+        def handler(event, context):
+            self.events.append(event)
+            return {
+                "batchItemFailures": [
+                    {"itemIdentifier": r["messageId"]}
+                    for r in event["Records"]
+                    if r["body"] == "1"
+                ]
+            }
+
+        result = emulate(handler, [0, 1, 2], batch_size=3, max_retries=1)
+        self.assertEqual(result["succeeded"], 2)
+        self.assertEqual(result["retried"], 1)
+        self.assertEqual(result["dropped"], 1)
+        self.assertEqual(
+            [r["body"] for r in self.events[1]["Records"]], ["1"],
+        )
+
+    def test_stream_failures_resume_from_checkpoint(self):
+        def handler(event, context):
+            self.events.append(event)
+            if len(self.events) == 1:
+                sequence = event["Records"][1]["kinesis"]["sequenceNumber"]
+                return {"batchItemFailures": [{"itemIdentifier": sequence}]}
+
+        result = emulate(
+            handler, [0, 1, 2], event_source="kinesis", batch_size=3,
+        )
+        self.assertEqual(len(self.events[1]["Records"]), 2)
+        self.assertEqual(result["succeeded"], 3)
+        self.assertEqual(result["retried"], 2)
+
+    def test_exceptions_fail_the_whole_batch(self):
+        def handler(event, context):
+            raise ValueError("boom")
+
+        result = emulate(handler, [0, 1], batch_size=2, max_retries=0)
+        self.assertEqual(result["errors"], 1)
+        self.assertEqual(result["dropped"], 2)
+
+    def test_unknown_identifier_fails_everything(self):
+        response = {"batchItemFailures": [{"itemIdentifier": ""}]}
+        self.assertEqual(failed_identifiers(response, ["a", "b"]), {"a", "b"})
+        self.assertEqual(failed_identifiers(None, ["a"]), set())
+
+    def test_window_closes_partial_batches(self):
+        queue = deque(Pending(i, i, i * 0.1) for i in range(10))
+        batch, closes = next_batch(queue, batch_size=100, window=0.25, now=0)
+        self.assertEqual([p.index for p in batch], [0, 1, 2])
+        self.assertEqual(closes, 0.25)
+        batch, closes = next_batch(queue, batch_size=2, window=5, now=closes)
+        self.assertEqual([p.index for p in batch], [3, 4])
+        self.assertAlmostEqual(closes, 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from aws_lambda import aws_lambda
+from aws_lambda.budget import bundle_report
+from aws_lambda.budget import BudgetExceeded
+from aws_lambda.budget import check_budgets
+from aws_lambda.budget import format_report
+from aws_lambda.budget import get_budgets
+from aws_lambda.budget import measure_import_time
+from aws_lambda.budget import parse_size
+from aws_lambda.budget import REPORT_FILENAME
+from tests.benchmarks import in_directory
+from tests.benchmarks import synthetic
+
+
+class TestBuildBudget(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.workdir, "bundle.zip")
+        with zipfile.ZipFile(self.zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("service.py", "def handler(e, c):\n    return e\n")
+            z.writestr("requests/__init__.py", "x" * 4000)
+            z.writestr("requests/api.py", "y" * 1000)
+            z.writestr("requests-2.0.dist-info/METADATA", "Name: requests")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("50MB"), 50 * 1000 ** 2)
+        self.assertEqual(parse_size("1.5 KiB"), 1536)
+        self.assertEqual(parse_size(1024), 1024)
+        self.assertIsNone(parse_size(None))
+        with self.assertRaises(ValueError):
+            parse_size("ten megs")
+
+    def test_get_budgets_rejects_unknown_keys(self):
+        cfg = {"build": {"budget": {"zipped": "1MB"}}}
+        with self.assertRaises(ValueError):
+            get_budgets(cfg)
+
+    def test_bundle_report_groups_by_top_level_package(self):
+        report = bundle_report(self.zip_path)
+        self.assertEqual(report["file_count"], 4)
+        self.assertEqual(report["packages"]["requests"]["files"], 2)
+        self.assertEqual(report["packages"]["requests"]["size"], 5000)
+        self.assertIn("requests-2.0.dist-info", report["packages"])
+        self.assertEqual(
+            report["compressed_size"], os.path.getsize(self.zip_path)
+        )
+
+    def test_within_budget(self):
+        report = bundle_report(self.zip_path)
+        budgets = get_budgets({"build": {"budget": {"file_count": 4}}})
+        check_budgets(report, budgets)
+
+    def test_exceeded_budget_lists_largest_changes(self):
+        report = bundle_report(self.zip_path)
+        previous = {
+            "uncompressed_size": 100,
+            "packages": {"service.py": {"size": 33}},
+        }
+        budgets = get_budgets(
+            {"build": {"budget": {"uncompressed_size": "1KB"}}}
+        )
+        with self.assertRaises(BudgetExceeded) as ctx:
+            check_budgets(report, budgets, previous)
+        message = str(ctx.exception)
+        self.assertIn("uncompressed_size is 5.0KB (budget 1.0KB)", message)
+        self.assertIn("requests", message)
+        self.assertIn("5.0KB", message)
+
+    def test_format_report_shows_delta(self):
+        report = bundle_report(self.zip_path)
+        previous = {
+            "uncompressed_size": 33,
+            "packages": {"service.py": {"size": 33}, "gone": {"size": 1}},
+        }
+        output = format_report(report, previous)
+        self.assertIn("(removed)", output)
+        self.assertIn("since last build", output)
+
+    def test_measure_import_time(self):
+        with open(os.path.join(self.workdir, "service.py"), "w") as fh:
+            fh.write("import json\n")
+        elapsed = measure_import_time(self.workdir, "service", runs=1)
+        self.assertGreater(elapsed, 0)
+
+    def test_measure_import_time_only_sees_the_bundle(self):
+        # yaml is installed here, but not in the bundle.
+        with open(os.path.join(self.workdir, "service.py"), "w") as fh:
+            fh.write("import yaml\n")
+        with self.assertRaises(BudgetExceeded) as raised:
+            measure_import_time(self.workdir, "service", runs=1)
+        self.assertIn("No module named 'yaml'", str(raised.exception))
+
+
+class TestClosureImportTime(unittest.TestCase):
+    """Closure builds leave boto3 to the runtime; measuring must too."""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.src = synthetic.make_project(os.path.join(self.workdir, "p"))
+        with open(os.path.join(self.src, "service.py"), "w") as fh:
+            fh.write("import boto3\n\n\ndef handler(event, context):\n")
+            fh.write("    return boto3.__name__\n")
+        self.requirements = os.path.join(self.workdir, "requirements.txt")
+        with open(self.requirements, "w") as fh:
+            fh.write("boto3\n")
+
+    def build(self, **build_cfg):
+        with open(os.path.join(self.src, "config.yaml"), "a") as fh:
+            fh.write("  dependencies: closure\n")
+            fh.write("  budget:\n    import_time: 60\n")
+            for key, value in build_cfg.items():
+                fh.write("  {}: {}\n".format(key, value))
+        with in_directory(self.src):
+            path_to_zip_file = aws_lambda.build(
+                self.src, requirements=self.requirements
+            )
+        with zipfile.ZipFile(path_to_zip_file) as zfh:
+            self.assertFalse(
+                [n for n in zfh.namelist() if n.startswith("boto3")]
+            )
+        with open(os.path.join(self.src, "dist", REPORT_FILENAME)) as fh:
+            return json.load(fh)
+
+    def test_import_time_budget(self):
+        self.assertGreater(self.build()["import_time"], 0)
+
+    def test_zipimport(self):
+        report = self.build(zipimport_dependencies="true")
+        self.assertGreater(report["zipimport"]["import_time_before"], 0)
+        self.assertGreater(report["import_time"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
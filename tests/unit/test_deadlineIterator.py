@@ -0,0 +1,99 @@
+import time
+import unittest
+
+from aws_lambda.helpers import enforce_timeout
+from aws_lambda.helpers import LambdaTimeoutError
+from aws_lambda.runtime import until_deadline
+
+
+class FakeContext:
+    """A context whose clock the test advances by hand."""
+
+    def __init__(self, timeout_millis):
+        self.now = 0.0
+        self.deadline = timeout_millis / 1000.0
+
+    def clock(self):
+        return self.now
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - self.now) * 1000)
+
+
+class TestDeadlineIterator(unittest.TestCase):
+    def test_stops_before_the_deadline(self):
+        context = FakeContext(timeout_millis=2000)
+        items = until_deadline(
+            range(100), context, margin_ms=500, clock=context.clock
+        )
+        processed = []
+        for item in items:
+            context.now += 0.2
+            processed.append(item)
+        # 1.5s of budget at 200ms per item.
+        self.assertEqual(processed, list(range(7)))
+        self.assertTrue(items.stopped)
+        self.assertEqual(items.processed, 7)
+        self.assertAlmostEqual(items.estimate_ms, 200)
+        self.assertEqual(items.unprocessed(), list(range(7, 100)))
+
+    def test_estimate_uses_slowest_recent_item(self):
+        context = FakeContext(timeout_millis=1000)
+        items = until_deadline(
+            iter(range(10)), context, margin_ms=0, clock=context.clock,
+        )
+        durations = iter([0.1, 0.4, 0.1])
+        processed = []
+        for item in items:
+            advance(context, durations)
+            processed.append(item)
+        # 0.6s spent, 0.4s left: the next item might take 400ms again.
+        self.assertEqual(processed, [0, 1, 2])
+        self.assertEqual(len(items.unprocessed()), 7)
+
+    def test_everything_fits(self):
+        context = FakeContext(timeout_millis=5000)
+        items = until_deadline([1, 2], context, clock=context.clock)
+        self.assertEqual(list(items), [1, 2])
+        self.assertFalse(items.stopped)
+        self.assertEqual(
+            items.batch_item_failures(str), {"batchItemFailures": []}
+        )
+
+    def test_batch_item_failures(self):
+        context = FakeContext(timeout_millis=1000)
+        records = [{"messageId": "a"}, {"messageId": "b"}]
+        items = until_deadline(
+            records, context, margin_ms=1000, clock=context.clock
+        )
+        self.assertEqual(list(items), [])
+        self.assertEqual(
+            items.batch_item_failures(lambda r: r["messageId"]),
+            {
+                "batchItemFailures": [
+                    {"itemIdentifier": "a"},
+                    {"itemIdentifier": "b"},
+                ]
+            },
+        )
+
+
+def advance(context, durations):
+    context.now += next(durations)
+
+
+class TestEnforceTimeout(unittest.TestCase):
+    def test_slow_block_is_interrupted(self):
+        with self.assertRaises(LambdaTimeoutError):
+            with enforce_timeout(0.05):
+                time.sleep(1)
+
+    def test_fast_block_completes(self):
+        with enforce_timeout(1):
+            pass
+        with enforce_timeout(None):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from aws_lambda.aws_lambda import pip_install_to_target
+from aws_lambda.closure import declared_dependencies
+from aws_lambda.closure import DependencyClosure
+from aws_lambda.closure import format_closure
+from aws_lambda.closure import get_closure_settings
+from aws_lambda.closure import requirement_sources
+
+
+class FakeDistribution(object):
+    def __init__(self, name, version, requires=None):
+        self.metadata = {"Name": name}
+        self.version = version
+        self.requires = requires
+        self.files = []
+
+
+def distributions(*dists):
+    return {d.metadata["Name"].lower(): d for d in dists}
+
+
+class TestDependencyClosure(unittest.TestCase):
+    def setUp(self):
+        self.distributions = distributions(
+            FakeDistribution(
+                "requests",
+                "2.31.0",
+                [
+                    "urllib3<3,>=1.21.1",
+                    "idna<4,>=2.5",
+                    'PySocks!=1.5.7,>=1.5.6; extra == "socks"',
+                ],
+            ),
+            FakeDistribution("urllib3", "2.0.7"),
+            FakeDistribution("idna", "3.4"),
+            FakeDistribution("pysocks", "1.7.1"),
+            FakeDistribution("boto3", "1.28.0", ["botocore<1.32.0"]),
+            FakeDistribution("botocore", "1.31.0"),
+            FakeDistribution("pytest", "7.4.0", ["pluggy"]),
+            FakeDistribution("pluggy", "1.3.0"),
+            FakeDistribution("typing-extensions", "4.8.0"),
+            FakeDistribution("pkg-resources-user", "1.0", ["setuptools"]),
+            FakeDistribution("setuptools", "68.0.0"),
+            FakeDistribution("pip", "23.2.1"),
+        )
+
+    def closure(self, declared):
+        return DependencyClosure(declared, distributions=self.distributions)
+
+    def test_follows_requires_dist(self):
+        closure = self.closure(["requests", "boto3"])
+        self.assertEqual(
+            closure.pins(),
+            ["idna==3.4", "requests==2.31.0", "urllib3==2.0.7"],
+        )
+
+    def test_extras_pull_in_optional_dependencies(self):
+        closure = self.closure(["requests[socks]"])
+        self.assertIn("pysocks==1.7.1", closure.pins())
+
+    def test_markers_are_evaluated(self):
+        closure = self.closure(
+            ['typing-extensions; python_version < "3"', "idna"]
+        )
+        self.assertEqual(closure.pins(), ["idna==3.4"])
+
+    def test_dropped_packages_have_a_reason(self):
+        closure = self.closure(["requests"])
+        reasons = {name: reason for name, reason, _ in closure.dropped()}
+        self.assertEqual(reasons["boto3"], "provided by the runtime")
+        self.assertEqual(reasons["botocore"], "provided by the runtime")
+        self.assertEqual(reasons["pytest"], "development tool")
+        self.assertEqual(reasons["pluggy"], "not required")
+        self.assertNotIn("requests", reasons)
+
+    def test_setuptools_is_kept_when_required(self):
+        self.assertEqual(
+            self.closure(["pkg-resources-user"]).pins(),
+            ["pkg-resources-user==1.0", "setuptools==68.0.0"],
+        )
+        self.assertNotIn("setuptools==68.0.0", self.closure(["idna"]).pins())
+
+    def test_packages_freeze_never_bundled_are_not_savings(self):
+        names = [name for name, _, _ in self.closure(["idna"]).dropped()]
+        self.assertNotIn("pip", names)
+        self.assertNotIn("setuptools", names)
+        self.assertIn("pytest", names)
+
+    def test_missing_requirements_are_passed_through(self):
+        closure = self.closure(["idna", "left-pad==1.0"])
+        self.assertEqual(closure.pins(), ["idna==3.4", "left-pad==1.0"])
+        self.assertIn("left-pad==1.0", format_closure(closure, "x"))
+
+
+class TestDeclaredDependencies(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+
+    def write(self, filename, content):
+        with open(os.path.join(self.src, filename), "w") as fh:
+            fh.write(content)
+
+    def test_setup_cfg(self):
+        self.write(
+            "setup.cfg",
+            "[options]\ninstall_requires =\n    requests\n    six>=1.0\n",
+        )
+        source, declared = declared_dependencies(self.src)
+        self.assertEqual(source, os.path.join(self.src, "setup.cfg"))
+        self.assertEqual(declared, ["requests", "six>=1.0"])
+
+    def test_requirements_file_wins(self):
+        self.write("setup.cfg", "[options]\ninstall_requires = requests\n")
+        self.write("prod.txt", "# runtime\nsix\n")
+        path = os.path.join(self.src, "prod.txt")
+        self.assertEqual(
+            declared_dependencies(self.src, path), (path, ["six"])
+        )
+
+    def test_includes_are_followed(self):
+        os.mkdir(os.path.join(self.src, "requirements"))
+        # Paths are relative to the including file; cycles end.
+        self.write("requirements/base.txt", "idna\n-r ../requirements.txt\n")
+        self.write(
+            "requirements.txt", "six\n--requirement=requirements/base.txt\n"
+        )
+        source, declared = declared_dependencies(self.src)
+        self.assertEqual(source, os.path.join(self.src, "requirements.txt"))
+        self.assertEqual(declared, ["six", "idna"])
+
+    def test_requirement_sources(self):
+        self.write("requirements.txt", "six\n-r more.txt\n")
+        self.write("more.txt", "idna\n")
+        self.assertEqual(
+            requirement_sources(self.src),
+            [
+                os.path.join(self.src, filename)
+                for filename in (
+                    "pyproject.toml",
+                    "setup.cfg",
+                    "requirements.txt",
+                    "more.txt",
+                )
+            ],
+        )
+        path = os.path.join(self.src, "more.txt")
+        self.assertEqual(requirement_sources(self.src, path), [path])
+
+    def test_unsupported_options_are_rejected(self):
+        for line in ("-e .", "--index-url https://example.com", "-c c.txt"):
+            with self.subTest(line=line):
+                self.write("requirements.txt", "six\n{}\n".format(line))
+                with self.assertRaises(ValueError) as raised:
+                    declared_dependencies(self.src)
+                self.assertIn(repr(line), str(raised.exception))
+
+    def test_nothing_declared(self):
+        self.assertEqual(declared_dependencies(self.src), (None, []))
+
+    def test_settings(self):
+        self.assertFalse(get_closure_settings({})["enabled"])
+        settings = get_closure_settings(
+            {"build": {"dependencies": "closure", "runtime_provided": "a, b"}}
+        )
+        self.assertEqual(
+            settings, {"enabled": True, "runtime_provided": ("a", "b")}
+        )
+        with self.assertRaises(ValueError):
+            get_closure_settings({"build": {"dependencies": "lock"}})
+
+
+class TestPinnedInstall(unittest.TestCase):
+    def test_local_packages_keep_their_dependencies(self):
+        target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target)
+        requirements = os.path.join(target, "requirements.txt")
+        with open(requirements, "w") as fh:
+            fh.write("idna==3.4\n")
+        with mock.patch("subprocess.check_call") as check_call, mock.patch(
+            "compileall.compile_dir"
+        ):
+            pip_install_to_target(
+                target,
+                requirements=requirements,
+                local_package="./mylib",
+                no_deps=True,
+            )
+        commands = {
+            call[0][0][4]: call[0][0] for call in check_call.call_args_list
+        }
+        self.assertIn("--no-deps", commands["idna==3.4"])
+        self.assertNotIn("--no-deps", commands["./mylib"])
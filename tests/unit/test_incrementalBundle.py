@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+from aws_lambda.sources import collect_sources
+from aws_lambda.watcher import IncrementalBundle
+from aws_lambda.watcher import InotifyWatcher
+from aws_lambda.watcher import PollingWatcher
+
+
+class TestIncrementalBundle(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        self.mtime = time.time()
+        self.write("service.py", "def handler(event, context):\n    pass\n")
+        self.write("lib/util.py", "VALUE = 1\n")
+        self.requirements = self.write("requirements.txt", "six\n")
+        self.installs = []
+        self.bundle = IncrementalBundle(
+            self.src,
+            {},
+            os.path.join(self.src, "dist", "bundle.zip"),
+            collect=lambda: collect_sources(self.src, ["lib"]),
+            install=self.install,
+            requirements=self.requirements,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+
+    def write(self, relpath, content):
+        path = os.path.join(self.src, relpath)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as fh:
+            fh.write(content)
+        # Bump the mtime so edits show up on coarse-grained filesystems.
+        self.mtime += 1
+        os.utime(path, (self.mtime, self.mtime))
+        return path
+
+    def install(
+        self, path, requirements=None, local_package=None, no_deps=False
+    ):
+        self.installs.append((requirements, no_deps))
+        with open(os.path.join(path, "six.py"), "w") as fh:
+            fh.write("# six\n")
+
+    def names(self):
+        with zipfile.ZipFile(self.bundle.path_to_zip_file) as zfh:
+            return sorted(zfh.namelist())
+
+    def test_first_refresh_builds_everything(self):
+        changed = self.bundle.refresh()
+        self.assertIn(None, changed)
+        self.assertIn("service.py", changed)
+        self.assertEqual(
+            self.names(),
+            ["lib/util.py", "requirements.txt", "service.py", "six.py"],
+        )
+
+    def test_source_change_reuses_dependencies(self):
+        self.bundle.refresh()
+        self.assertEqual(self.bundle.refresh(), [])
+        self.write("lib/util.py", "VALUE = 2\n")
+        self.assertEqual(self.bundle.refresh(), ["lib/util.py"])
+        self.assertEqual(len(self.installs), 1)
+        with zipfile.ZipFile(self.bundle.path_to_zip_file) as zfh:
+            self.assertEqual(zfh.read("lib/util.py"), b"VALUE = 2\n")
+
+    def test_removed_source_is_dropped(self):
+        self.bundle.refresh()
+        os.remove(os.path.join(self.src, "lib", "util.py"))
+        self.assertEqual(self.bundle.refresh(), ["lib/util.py"])
+        self.assertNotIn("lib/util.py", self.names())
+
+    def test_requirements_change_reinstalls(self):
+        self.bundle.refresh()
+        self.write("requirements.txt", "six\nrequests\n")
+        changed = self.bundle.refresh()
+        self.assertIn(None, changed)
+        self.assertEqual(len(self.installs), 2)
+
+    def test_closure_is_resolved_again_when_its_sources_change(self):
+        pyproject = os.path.join(self.src, "pyproject.toml")
+        pins = os.path.join(self.src, "dist", "pins.txt")
+        resolved = []
+
+        def resolve():
+            resolved.append(pins)
+            with open(pins, "w") as fh:
+                fh.write("six=={}.0\n".format(len(resolved)))
+            return pins, True
+
+        os.makedirs(os.path.dirname(pins))
+        bundle = IncrementalBundle(
+            self.src,
+            {},
+            os.path.join(self.src, "dist", "bundle.zip"),
+            collect=lambda: collect_sources(self.src, ["lib"]),
+            install=self.install,
+            resolve=resolve,
+            requirement_sources=lambda: [pyproject],
+        )
+        bundle.refresh()
+        self.assertEqual(self.installs, [(pins, True)])
+        self.assertEqual(bundle.refresh(), [])
+        self.assertEqual(len(resolved), 1)
+
+        self.write("pyproject.toml", "[project]\ndependencies = ['six']\n")
+        self.assertIn(pyproject, dict(bundle.snapshot()[None][1]))
+        self.assertIn(self.src, bundle.watched_directories())
+        self.assertIn(None, bundle.refresh())
+        self.assertEqual(len(resolved), 2)
+        self.assertEqual(self.installs, [(pins, True), (pins, True)])
+
+    def test_dependency_cache_survives_restart(self):
+        self.bundle.refresh()
+        self.bundle.dependencies_key = None
+        self.bundle.refresh()
+        self.assertEqual(len(self.installs), 1)
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_polling_watcher(self):
+        state = {"value": 1}
+        watcher = PollingWatcher(lambda: dict(state), interval=0.01)
+        self.assertFalse(watcher.wait(timeout=0.05))
+        state["value"] = 2
+        self.assertTrue(watcher.wait(timeout=0.05))
+
+    def test_inotify_watcher(self):
+        try:
+            watcher = InotifyWatcher([self.directory])
+        except (OSError, AttributeError):
+            self.skipTest("inotify is not available")
+        try:
+            self.assertFalse(watcher.wait(timeout=0.05))
+            os.mkdir(os.path.join(self.directory, "sub"))
+            self.assertTrue(watcher.wait(timeout=1))
+            with open(os.path.join(self.directory, "sub", "a.py"), "w"):
+                pass
+            self.assertTrue(watcher.wait(timeout=1))
+        finally:
+            watcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import py_compile
+import shutil
+import tarfile
+import tempfile
+import time
+import unittest
+
+from aws_lambda.image import build_image
+from aws_lambda.image import get_image_settings
+from aws_lambda.image import ImageLayout
+from aws_lambda.image import make_layer
+from aws_lambda.image import walk_tree
+
+
+class TestOCIImage(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.deps = os.path.join(self.workdir, "deps")
+        self.write("deps/six.py", "VERSION = 1\n")
+        self.write("deps/__pycache__/six.cpython-38.pyc", "junk")
+        self.write("deps/idna/__init__.py", "")
+        self.write("src/service.py", "def handler(e, c):\n    return e\n")
+        self.layout = os.path.join(self.workdir, "image")
+        self.settings = get_image_settings(
+            {"runtime": "python3.12", "architecture": "arm64"}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def write(self, relpath, content):
+        path = os.path.join(self.workdir, relpath)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as fh:
+            fh.write(content)
+
+    def build(self):
+        sources = [
+            (os.path.join(self.workdir, "src/service.py"), "service.py")
+        ]
+        return build_image(
+            self.layout, self.deps, sources, "service.handler", self.settings
+        )
+
+    def make_layer(self, files):
+        blob = io.BytesIO()
+        result = make_layer(files, blob)
+        return blob.getvalue(), result
+
+    def read(self, layout, digest):
+        with open(layout.blob_path(digest), "rb") as fh:
+            return fh.read()
+
+    def test_settings(self):
+        self.assertEqual(
+            self.settings["base"], "public.ecr.aws/lambda/python:3.12"
+        )
+        self.assertEqual(self.settings["architecture"], "arm64")
+
+    def test_layers_are_reproducible(self):
+        files = [
+            (os.path.join(self.workdir, "deps/six.py"), "var/task/six.py")
+        ]
+        first = self.make_layer(files)
+        os.utime(files[0][0], (time.time() + 60, time.time() + 60))
+        self.assertEqual(self.make_layer(files), first)
+
+        blob, (digest, diff_id, size) = first
+        self.assertEqual(digest, "sha256:" + hashlib.sha256(blob).hexdigest())
+        self.assertEqual(
+            diff_id,
+            "sha256:" + hashlib.sha256(gzip.decompress(blob)).hexdigest(),
+        )
+        self.assertEqual(size, len(blob))
+        with tarfile.open(fileobj=io.BytesIO(gzip.decompress(blob))) as tar:
+            members = tar.getmembers()
+        self.assertEqual(
+            [m.name for m in members], ["var", "var/task", "var/task/six.py"]
+        )
+        self.assertEqual(set(m.mtime for m in members), {0})
+        self.assertEqual(set(m.uid for m in members), {0})
+
+    def test_only_hash_based_bytecode_is_kept(self):
+        deps = os.path.join(self.workdir, "deps")
+        for invalidation_mode in ("timestamp", "checked-hash"):
+            compiled = py_compile.compile(
+                os.path.join(deps, "six.py"),
+                cfile=os.path.join(deps, invalidation_mode + ".pyc"),
+                invalidation_mode=py_compile.PycInvalidationMode[
+                    invalidation_mode.upper().replace("-", "_")
+                ],
+            )
+            self.assertTrue(os.path.exists(compiled))
+        blob, _ = self.make_layer(walk_tree(deps, "var/task"))
+        with tarfile.open(fileobj=io.BytesIO(gzip.decompress(blob))) as tar:
+            names = tar.getnames()
+        self.assertIn("var/task/checked-hash.pyc", names)
+        self.assertNotIn("var/task/timestamp.pyc", names)
+        self.assertNotIn("var/task/__pycache__", names)
+
+    def test_code_change_adds_one_layer(self):
+        first = self.build()
+        self.assertEqual(
+            [(layer["name"], layer["new"]) for layer in first["layers"]],
+            [("dependencies", True), ("code", True)],
+        )
+        self.write("src/service.py", "def handler(e, c):\n    return 1\n")
+        second = self.build()
+        self.assertEqual(
+            [layer["new"] for layer in second["layers"]], [False, True]
+        )
+        self.assertEqual(
+            first["layers"][0]["digest"], second["layers"][0]["digest"]
+        )
+        self.assertNotEqual(first["digest"], second["digest"])
+
+        layout = ImageLayout(self.layout)
+        index = layout.index()
+        self.assertEqual(index["manifests"][0]["digest"], second["digest"])
+        manifest = json.loads(self.read(layout, second["digest"]))
+        config = json.loads(
+            self.read(layout, manifest["config"]["digest"])
+        )
+        self.assertEqual(config["config"]["Cmd"], ["service.handler"])
+        self.assertEqual(config["architecture"], "arm64")
+        self.assertEqual(len(config["rootfs"]["diff_ids"]), 2)
+        # The previous code layer and manifest were collected.
+        self.assertEqual(len(os.listdir(layout.blobs)), 4)
+
+        blob = self.read(layout, manifest["layers"][0]["digest"])
+        with tarfile.open(fileobj=io.BytesIO(gzip.decompress(blob))) as tar:
+            names = tar.getnames()
+        self.assertIn("var/task/idna/__init__.py", names)
+        self.assertNotIn("var/task/__pycache__", names)
+
+    def test_base_layout_is_merged(self):
+        base = ImageLayout(os.path.join(self.workdir, "base"))
+        layer_digest, base_diff_id, _, _ = base.write_layer([])
+        config = {
+            "architecture": "arm64",
+            "os": "linux",
+            "config": {"Entrypoint": ["/lambda-entrypoint.sh"]},
+            "rootfs": {"type": "layers", "diff_ids": [base_diff_id]},
+        }
+        config_blob = json.dumps(config).encode()
+        config_digest, _ = base.write_blob(config_blob)
+        manifest_blob = json.dumps(
+            {
+                "schemaVersion": 2,
+                "config": {"digest": config_digest},
+                "layers": [{"digest": layer_digest}],
+            }
+        ).encode()
+        manifest_digest, _ = base.write_blob(manifest_blob)
+        base.write_index(
+            {
+                "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                "digest": manifest_digest,
+            }
+        )
+        self.settings["base_layout"] = base.path
+
+        result = self.build()
+        self.assertTrue(result["complete"])
+        layout = ImageLayout(self.layout)
+        manifest = json.loads(self.read(layout, result["digest"]))
+        self.assertEqual(len(manifest["layers"]), 3)
+        self.assertEqual(manifest["layers"][0]["digest"], layer_digest)
+        self.assertTrue(layout.has_blob(layer_digest))
+        config = json.loads(self.read(layout, manifest["config"]["digest"]))
+        self.assertEqual(config["rootfs"]["diff_ids"][0], base_diff_id)
+        self.assertEqual(config["config"]["Cmd"], ["service.handler"])
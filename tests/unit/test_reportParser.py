@@ -0,0 +1,84 @@
+import random
+import unittest
+
+from aws_lambda.reports import find_report
+from aws_lambda.reports import Histogram
+from aws_lambda.reports import parse_report
+from aws_lambda.reports import summarize
+
+
+COLD = (
+    "REPORT RequestId: 3f5e1b2a-0000-4c1d-9f6e-1234567890ab\t"
+    "Duration: 12.34 ms\tBilled Duration: 13 ms\tMemory Size: 128 MB\t"
+    "Max Memory Used: 70 MB\tInit Duration: 230.10 ms\t"
+)
+WARM = (
+    "REPORT RequestId: 9a8b7c6d-0000-4c1d-9f6e-1234567890ab\t"
+    "Duration: 1.05 ms\tBilled Duration: 2 ms\tMemory Size: 128 MB\t"
+    "Max Memory Used: 71 MB\tStatus: timeout"
+)
+
+
+class TestReportParser(unittest.TestCase):
+    def test_cold_start(self):
+        report = parse_report(COLD)
+        self.assertEqual(
+            report["request_id"], "3f5e1b2a-0000-4c1d-9f6e-1234567890ab"
+        )
+        self.assertEqual(report["duration"], 12.34)
+        self.assertEqual(report["billed_duration"], 13)
+        self.assertEqual(report["memory_size"], 128)
+        self.assertEqual(report["max_memory_used"], 70)
+        self.assertEqual(report["init_duration"], 230.1)
+
+    def test_warm_start(self):
+        report = parse_report(WARM)
+        self.assertIsNone(report["init_duration"])
+        self.assertEqual(report["status"], "timeout")
+
+    def test_other_lines_are_ignored(self):
+        self.assertIsNone(parse_report("START RequestId: abc Version: 1"))
+        log = "START RequestId: x\nEND RequestId: x\n{}\n".format(WARM)
+        self.assertEqual(find_report(log)["duration"], 1.05)
+        self.assertIsNone(find_report("no report here"))
+
+    def test_summarize(self):
+        summary = summarize([float(n) for n in range(1, 101)] + [None])
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["p50"], 50)
+        self.assertEqual(summary["p99"], 99)
+        self.assertEqual(summary["max"], 100)
+        self.assertEqual(summarize([]), {"count": 0})
+
+    def test_histogram_matches_summarize(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+        values += [0.0, 899999.99]
+        histogram = Histogram()
+        halves = Histogram()
+        for value in values + [None]:
+            histogram.add(value)
+        for value in values[::2]:
+            halves.add(value)
+        other = Histogram()
+        for value in values[1::2]:
+            other.add(value)
+        halves.update(other)
+
+        exact = summarize(values)
+        for summary in (histogram.summary(), halves.summary()):
+            self.assertEqual(summary["count"], exact["count"])
+            for key in ("min", "max"):
+                self.assertEqual(summary[key], exact[key])
+            self.assertAlmostEqual(summary["mean"], exact["mean"])
+            for key in ("p50", "p90", "p95", "p99"):
+                self.assertLessEqual(
+                    abs(summary[key] - exact[key]), exact[key] * 0.005
+                )
+        # Memory depends on the range of the values, not their number.
+        self.assertLess(len(histogram.buckets), 2000)
+        self.assertEqual(Histogram().summary(), {"count": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
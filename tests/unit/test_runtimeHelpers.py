@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from aws_lambda import runtime
+from aws_lambda.aws_lambda import collect_project_sources
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoize(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.clock = FakeClock()
+
+        @runtime.memoize(ttl=10, maxsize=2, clock=self.clock)
+        def lookup(key, scale=1):
+            self.calls.append(key)
+            return key * scale
+
+        self.lookup = lookup
+
+    def tearDown(self):
+        runtime.reset()
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.lookup(2), 2)
+        self.assertEqual(self.lookup(2), 2)
+        self.assertEqual(self.lookup(2, scale=3), 6)
+        self.assertEqual(self.calls, [2, 2])
+        info = self.lookup.cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (1, 2))
+        name = "{}.{}".format(__name__, self.lookup.__qualname__)
+        self.assertEqual(runtime.stats()["caches"][name]["hits"], 1)
+
+    def test_ttl_expires_results(self):
+        self.lookup(1)
+        self.clock.now = 9.9
+        self.lookup(1)
+        self.clock.now = 10
+        self.lookup(1)
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(self.lookup.cache_info()["expired"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.lookup(1)
+        self.lookup(2)
+        self.lookup(1)
+        self.lookup(3)
+        self.lookup(1)
+        self.lookup(2)
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+        self.assertEqual(self.lookup.cache_info()["size"], 2)
+
+    def test_exceptions_are_not_cached(self):
+        @runtime.memoize()
+        def fail():
+            self.calls.append(None)
+            raise ValueError
+
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                fail()
+        self.assertEqual(len(self.calls), 2)
+
+    def test_reset_clears_results(self):
+        self.lookup(1)
+        runtime.reset()
+        self.lookup(1)
+        self.assertEqual(self.calls, [1, 1])
+
+
+class TestClients(unittest.TestCase):
+    def tearDown(self):
+        runtime.reset()
+
+    def test_clients_are_reused(self):
+        with mock.patch("boto3.client") as make_client:
+            make_client.side_effect = lambda *args, **kwargs: object()
+            first = runtime.client("s3", region_name="us-east-1")
+            self.assertIs(runtime.client("s3", region_name="us-east-1"), first)
+            runtime.client("s3", region_name="eu-west-1")
+        self.assertEqual(make_client.call_count, 2)
+        self.assertEqual(
+            runtime.stats()["clients"], {"created": 2, "reused": 1}
+        )
+
+    def test_http_session_is_reused(self):
+        self.assertIs(runtime.http_session(), runtime.http_session())
+
+
+class TestIncludeRuntime(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        open(os.path.join(self.src, "service.py"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+
+    def test_runtime_is_bundled_on_request(self):
+        cfg = {"build": {"source_directories": ""}}
+        files = collect_project_sources(self.src, cfg).files
+        self.assertNotIn("aws_lambda/runtime.py", [f[1] for f in files])
+        cfg["build"]["include_runtime"] = True
+        files = dict(
+            (relpath, path)
+            for path, relpath in collect_project_sources(self.src, cfg).files
+        )
+        self.assertEqual(files["aws_lambda/runtime.py"], runtime.__file__)
+
+
+if __name__ == "__main__":
+    unittest.main()
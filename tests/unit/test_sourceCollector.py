@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from aws_lambda.sources import collect_sources
+from aws_lambda.sources import IgnoreMatcher
+
+
+class TestIgnoreMatcher(unittest.TestCase):
+    def test_basename_patterns_match_at_any_depth(self):
+        matcher = IgnoreMatcher(["*.log", "fixtures/"])
+        self.assertTrue(matcher.match("debug.log"))
+        self.assertTrue(matcher.match("lib/deep/debug.log"))
+        self.assertTrue(matcher.match("lib/fixtures", is_dir=True))
+        self.assertFalse(matcher.match("lib/fixtures"))
+        self.assertFalse(matcher.match("lib/debug.py"))
+
+    def test_patterns_with_slash_are_anchored(self):
+        matcher = IgnoreMatcher(["/build", "lib/tmp/", "docs/**/*.md"])
+        self.assertTrue(matcher.match("build"))
+        self.assertFalse(matcher.match("lib/build"))
+        self.assertTrue(matcher.match("lib/tmp", is_dir=True))
+        self.assertFalse(matcher.match("other/lib/tmp", is_dir=True))
+        self.assertTrue(matcher.match("docs/a/b/readme.md"))
+        self.assertTrue(matcher.match("docs/readme.md"))
+
+    def test_last_match_wins_with_negation(self):
+        matcher = IgnoreMatcher(["*.json", "!event.json", "# comment", ""])
+        self.assertTrue(matcher.match("data.json"))
+        self.assertFalse(matcher.match("event.json"))
+
+    def test_character_classes(self):
+        matcher = IgnoreMatcher(["*.py[cod]", "file[!0-9]"])
+        self.assertTrue(matcher.match("mod.pyc"))
+        self.assertFalse(matcher.match("mod.py"))
+        self.assertTrue(matcher.match("filea"))
+        self.assertFalse(matcher.match("file1"))
+
+
+class TestCollectSources(unittest.TestCase):
+    def setUp(self):
+        self.src = tempfile.mkdtemp()
+        for path in (
+            "service.py",
+            "config.yaml",
+            ".DS_Store",
+            "notes.log",
+            "lib/util.py",
+            "lib/__pycache__/util.cpython-38.pyc",
+            "lib/node_modules/left-pad/index.js",
+            "lib/fixtures/big.json",
+            "other/skip.py",
+        ):
+            full_path = os.path.join(self.src, path)
+            if not os.path.exists(os.path.dirname(full_path)):
+                os.makedirs(os.path.dirname(full_path))
+            with open(full_path, "w") as fh:
+                fh.write("1234")
+        with open(os.path.join(self.src, ".lambdaignore"), "w") as fh:
+            fh.write("fixtures/\n*.log\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.src)
+
+    def test_collect_sources(self):
+        collection = collect_sources(
+            self.src,
+            ["lib"],
+            matcher=IgnoreMatcher.from_project(self.src),
+            exclude=["config.yaml"],
+        )
+        self.assertEqual(
+            sorted(relpath for _, relpath in collection.files),
+            ["lib/util.py", "service.py"],
+        )
+        self.assertEqual(collection.directories, ["lib"])
+        self.assertEqual(
+            sorted(collection.excluded_files),
+            [".DS_Store", ".lambdaignore", "notes.log"],
+        )
+        ignore_file_size = len("fixtures/\n*.log\n")
+        self.assertEqual(collection.excluded_bytes, 8 + ignore_file_size)
+        self.assertEqual(
+            sorted(collection.pruned_directories),
+            ["lib/__pycache__", "lib/fixtures", "lib/node_modules"],
+        )
+
+    def test_config_patterns_extend_defaults(self):
+        matcher = IgnoreMatcher.from_project(self.src, ["util.py"])
+        collection = collect_sources(self.src, ["lib"], matcher=matcher)
+        self.assertNotIn(
+            "lib/util.py", [relpath for _, relpath in collection.files]
+        )
+
+    def test_independent_of_working_directory(self):
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            collection = collect_sources(self.src, ["lib"])
+        finally:
+            os.chdir(cwd)
+        self.assertIn(
+            "service.py", [relpath for _, relpath in collection.files]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
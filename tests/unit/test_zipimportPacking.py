@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from aws_lambda.packing import DEPENDENCIES_ARCHIVE
+from aws_lambda.packing import get_deployed_handler
+from aws_lambda.packing import pack_dependencies
+
+
+class TestZipimportPacking(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.write("pure/__init__.py", "from .core import VALUE\n")
+        self.write("pure/core.py", "VALUE = 42\n")
+        self.write("pure/__pycache__/core.cpython-38.pyc", "")
+        self.write("native/__init__.py", "")
+        self.write("native/_speedups.cpython-38-x86_64-linux-gnu.so", "")
+        self.write("withdata/__init__.py", "")
+        self.write("withdata/zones.json", "{}")
+        self.write("single.py", "NAME = 'single'\n")
+        self.write("__pycache__/single.cpython-38.pyc", "")
+        self.write("pure-1.0.dist-info/METADATA", "Name: pure\n")
+        self.dependencies = os.listdir(self.path)
+        self.write(
+            "service.py",
+            "import pure\nimport single\n\n"
+            "def handler(event, context):\n"
+            "    return pure.VALUE, single.NAME\n",
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, relpath, content):
+        path = os.path.join(self.path, relpath)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as fh:
+            fh.write(content)
+
+    def test_pure_packages_are_packed(self):
+        result = pack_dependencies(
+            self.path, self.dependencies, "service.handler"
+        )
+        self.assertEqual(result["packed"], ["pure", "single.py"])
+        self.assertEqual(
+            result["unpacked"],
+            {"native": "native extension", "withdata": "data files"},
+        )
+        with zipfile.ZipFile(
+            os.path.join(self.path, DEPENDENCIES_ARCHIVE)
+        ) as zfh:
+            self.assertEqual(
+                sorted(zfh.namelist()),
+                [
+                    "pure/__init__.py",
+                    "pure/__init__.pyc",
+                    "pure/core.py",
+                    "pure/core.pyc",
+                    "single.py",
+                    "single.pyc",
+                ],
+            )
+        self.assertEqual(
+            sorted(os.listdir(self.path)),
+            [
+                DEPENDENCIES_ARCHIVE,
+                "lambda_bootstrap.py",
+                "native",
+                "pure-1.0.dist-info",
+                "service.py",
+                "withdata",
+            ],
+        )
+
+    def test_bootstrap_imports_from_archive(self):
+        pack_dependencies(self.path, self.dependencies, "service.handler")
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-I",
+                "-c",
+                "import sys; sys.path.insert(0, sys.argv[1]); "
+                "import lambda_bootstrap, pure; "
+                "print(lambda_bootstrap.handler(None, None)); "
+                "print(type(pure.__loader__).__name__)",
+                self.path,
+            ],
+        )
+        self.assertEqual(
+            output.decode().split(), ["(42,", "'single')", "zipimporter"]
+        )
+
+    def test_excluded_packages_stay_unpacked(self):
+        result = pack_dependencies(
+            self.path, self.dependencies, "service.handler", exclude={"pure"}
+        )
+        self.assertEqual(result["unpacked"]["pure"], "excluded")
+        self.assertTrue(os.path.isdir(os.path.join(self.path, "pure")))
+
+    def test_deployed_handler(self):
+        cfg = {"handler": "service.handler"}
+        self.assertEqual(get_deployed_handler(cfg), "service.handler")
+        cfg["build"] = {"zipimport_dependencies": True}
+        self.assertEqual(
+            get_deployed_handler(cfg), "lambda_bootstrap.handler"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()